@@ -10,6 +10,14 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.resource_blocking import apply_resource_blocking
+from common.replay import configure_proxy
+from common.device_catalog import brand_of, capacity_of, device_type_of
+from common.result_channel import write_excel
+from common.waits import enable_sleep_budget
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -31,7 +39,9 @@ def setup_driver(debug=False):
     chrome_options.add_argument("--window-size=1920,1080")
     chrome_options.add_argument("user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
     
+    configure_proxy(chrome_options)
     driver = webdriver.Chrome(options=chrome_options)
+    apply_resource_blocking(driver, "MY_RV_Source4")
     return driver
 
 def extract_devices_data(driver):
@@ -60,51 +70,9 @@ def extract_devices_data(driver):
                 
                 logger.info(f"Processing: {full_name} - {price_text}")
                 
-                # Extract brand and model
-                brand = "Unknown"
-                name_lower = full_name.lower()
-                
-                if "apple" in name_lower or "iphone" in name_lower or "ipad" in name_lower:
-                    brand = "Apple"
-                elif "samsung" in name_lower:
-                    brand = "Samsung"
-                elif "xiaomi" in name_lower:
-                    brand = "Xiaomi"
-                elif "oppo" in name_lower:
-                    brand = "OPPO"
-                elif "google" in name_lower:
-                    brand = "Google"
-                elif "honor" in name_lower:
-                    brand = "Honor"
-                elif "nothing" in name_lower:
-                    brand = "Nothing"
-                elif "huawei" in name_lower:
-                    brand = "Huawei"
-                elif "sony" in name_lower:
-                    brand = "Sony"
-                elif "realme" in name_lower:
-                    brand = "Realme"
-                elif "vivo" in name_lower:
-                    brand = "Vivo"
-                elif "zte" in name_lower:
-                    brand = "ZTE"
-                elif "nokia" in name_lower:
-                    brand = "Nokia"
-                
-                # Determine device type
-                device_type = "SmartPhone"
-                if any(keyword in name_lower for keyword in ["ipad", "tab", "tablet"]):
-                    device_type = "Tablet"
-                elif any(keyword in name_lower for keyword in ["macbook", "laptop", "notebook"]):
-                    device_type = "Laptop"
-                elif any(keyword in name_lower for keyword in ["watch", "galaxy watch", "apple watch"]):
-                    device_type = "SmartWatch"
-                
-                # Extract capacity if available
-                capacity = ""
-                capacity_match = re.search(r'(\d+\s*[GT]B)', full_name, re.IGNORECASE)
-                if capacity_match:
-                    capacity = capacity_match.group(1).upper()
+                brand = brand_of(full_name)
+                device_type = device_type_of(full_name)
+                capacity = capacity_of(full_name)
                 
                 # Extract price value
                 price_clean = re.sub(r'[^\d.]', '', price_text.split()[-1])
@@ -156,7 +124,7 @@ def save_results(results, filename='MY_RV_Source4.xlsx'):
             existing_df = pd.read_excel(output_path)
             df = pd.concat([existing_df, df], ignore_index=True)
         
-        df.to_excel(output_path, index=False)
+        write_excel(df, output_path)
         logger.info(f"Results saved to {output_path}")
         
     except Exception as e:
@@ -192,4 +160,5 @@ def main():
         logger.info("Driver closed")
 
 if __name__ == "__main__":
+    enable_sleep_budget()
     main()
\ No newline at end of file
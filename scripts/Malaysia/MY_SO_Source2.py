@@ -20,12 +20,23 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
 from webdriver_manager.chrome import ChromeDriverManager
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.dom import extract_elements, extract_hrefs
+from common.resource_blocking import apply_resource_blocking
+from common.replay import configure_proxy
+from common.device_catalog import brand_of, device_type_of
+from common.page_cache import PageCache, cache_path
+from common.result_channel import write_excel
+from common.waits import enable_sleep_budget, wait_for_dom_quiet, wait_for_page_ready
+
 # Parse command line arguments
 parser = argparse.ArgumentParser(description='Scrape device prices from 3cat.my')
 parser.add_argument('-n', '--num_devices', type=int, default=0, 
                     help='Number of devices to scrape. 0 means scrape all devices (default: 0)')
 parser.add_argument('-o', '--output', type=str, default=None,
                     help='Output Excel file path (default: output/MY_SO_Source2.xlsx)')
+parser.add_argument('--incremental', action='store_true',
+                    help='Reuse the last rows of product pages whose content has not changed')
 args = parser.parse_args()
 
 # Setup directories
@@ -88,8 +99,11 @@ def setup_driver():
     # Add a user agent
     options.add_argument("user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
     
+    configure_proxy(options)
+    
     # Create driver directly without ChromeDriverManager
     driver = webdriver.Chrome(options=options)
+    apply_resource_blocking(driver, "MY_SO_Source2")
     driver.set_page_load_timeout(30)
     
     return driver
@@ -127,25 +141,7 @@ def extract_storage_from_text(text):
 
 def extract_brand_from_device(device_name):
     """Extract brand from device name"""
-    known_brands = [
-        "Apple", "Samsung", "Huawei", "Xiaomi", "Oppo", "Vivo", 
-        "Google", "OnePlus", "Sony", "LG", "Motorola", "Nokia", 
-        "Realme", "Asus", "Poco", "Redmi", "Infinix", "Nothing", "Honor"
-    ]
-    
-    for brand in known_brands:
-        if brand.lower() in device_name.lower():
-            return brand
-    
-    # Special cases
-    if "iphone" in device_name.lower() or "ipad" in device_name.lower():
-        return "Apple"
-    if "galaxy" in device_name.lower():
-        return "Samsung"
-    if "pixel" in device_name.lower():
-        return "Google"
-    
-    return "Unknown"  # Default if no brand detected
+    return brand_of(device_name)
 
 def extract_model_from_url(url):
     """Extract model directly from URL for more accurate model names"""
@@ -204,14 +200,7 @@ def extract_model_from_url(url):
 
 def determine_device_type(device_name):
     """Determine device type based on device name"""
-    device_name_lower = device_name.lower()
-    
-    if "watch" in device_name_lower:
-        return "SmartWatch"
-    elif "ipad" in device_name_lower or "tab" in device_name_lower or "tablet" in device_name_lower:
-        return "Tablet"
-    else:
-        return "SmartPhone"
+    return device_type_of(device_name)
 
 def safe_find_element(driver, by, value, timeout=5):
     """Safely find an element with timeout"""
@@ -228,63 +217,54 @@ def find_product_links(driver):
     valid_links = []
     
     # Wait for content to load
-    time.sleep(5)
+    wait_for_dom_quiet(driver, quiet_ms=1000)
     
-    # Method 1: Find all links with '/used' in them
-    links = driver.find_elements(By.TAG_NAME, "a")
+    # Method 1: Find all links with '/used' in them (one script call for the whole page)
+    links = extract_hrefs(driver)
     print(f"Found {len(links)} total links on the page")
     
-    for link in links:
-        try:
-            href = link.get_attribute("href")
-            if not href:
-                continue
-            
-            # Check for product links - look for patterns like /used-* or other product indicators
-            if "/used-" in href and href not in valid_links:
-                valid_links.append(href)
-        except Exception as e:
-            continue
+    for href in links:
+        # Check for product links - look for patterns like /used-* or other product indicators
+        if "/used-" in href and href not in valid_links:
+            valid_links.append(href)
     
     # Method 2: Try to find all product cards and extract links
     try:
         # Find product cards using various selectors
-        product_cards = driver.find_elements(By.CSS_SELECTOR, ".product-card")
+        product_cards = extract_elements(driver, ".product-card", {"href": ("a", "href")})
         if not product_cards:
-            product_cards = driver.find_elements(By.CSS_SELECTOR, "[data-carousel-target='card']")
+            product_cards = extract_elements(driver, "[data-carousel-target='card']", {"href": ("a", "href")})
         
         for card in product_cards:
-            try:
-                link_element = card.find_element(By.TAG_NAME, "a")
-                href = link_element.get_attribute("href")
-                if href and "/used-" in href and href not in valid_links:
-                    valid_links.append(href)
-            except:
-                pass
+            href = card["href"]
+            if href and "/used-" in href and href not in valid_links:
+                valid_links.append(href)
     except:
         pass
     
-    # Method 3: Find all "More Details" buttons and get their parent links
+    # Method 3: Find all "More Details" buttons and get the links of their closest parent with links
     try:
-        detail_buttons = driver.find_elements(By.XPATH, "//button[contains(text(), 'More Details')]")
-        for button in detail_buttons:
-            try:
-                # Find closest parent a tag
-                parent = button
-                for _ in range(5):  # Look up to 5 levels up
-                    parent = parent.find_element(By.XPATH, "..")
-                    try:
-                        links = parent.find_elements(By.TAG_NAME, "a")
-                        for link in links:
-                            href = link.get_attribute("href")
-                            if href and "/used-" in href and href not in valid_links:
-                                valid_links.append(href)
-                        if links:
-                            break
-                    except:
-                        continue
-            except:
-                pass
+        detail_links = driver.execute_script("""
+            const links = [];
+            document.querySelectorAll('button').forEach(button => {
+                if (!button.textContent.includes('More Details')) {
+                    return;
+                }
+                let parent = button;
+                for (let i = 0; i < 5 && parent.parentElement; i++) {  // Look up to 5 levels up
+                    parent = parent.parentElement;
+                    const anchors = parent.querySelectorAll('a');
+                    if (anchors.length) {
+                        anchors.forEach(a => { if (a.href) links.push(a.href); });
+                        break;
+                    }
+                }
+            });
+            return links;
+        """)
+        for href in detail_links:
+            if "/used-" in href and href not in valid_links:
+                valid_links.append(href)
     except:
         pass
     
@@ -315,14 +295,9 @@ def find_product_links(driver):
             time.sleep(1)
             
             # Find links after scrolling
-            links = driver.find_elements(By.TAG_NAME, "a")
-            for link in links:
-                try:
-                    href = link.get_attribute("href")
-                    if href and "/used-" in href and href not in valid_links:
-                        valid_links.append(href)
-                except:
-                    continue
+            for href in extract_hrefs(driver):
+                if "/used-" in href and href not in valid_links:
+                    valid_links.append(href)
     except:
         pass
     
@@ -715,7 +690,7 @@ def process_tablet_device(driver, device_name, device_type, brand, model, color)
                     driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", storage_button)
                     time.sleep(1)
                     driver.execute_script("arguments[0].click();", storage_button)
-                    time.sleep(2)  # Wait for page to update
+                    wait_for_dom_quiet(driver)  # Wait for page to update
                 except Exception as e:
                     print(f"Error clicking storage button: {e}")
             
@@ -810,7 +785,7 @@ def process_device_listing(driver, url):
         print(f"Navigating to: {url}")
         try:
             driver.get(url)
-            time.sleep(5)  # Wait for page to load
+            wait_for_page_ready(driver)
         except TimeoutException:
             print("Page load timed out, but continuing anyway")
             driver.execute_script("window.stop();")  # Stop page loading
@@ -895,7 +870,7 @@ def process_device_listing(driver, url):
                     driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", storage_button)
                     time.sleep(1)
                     driver.execute_script("arguments[0].click();", storage_button)
-                    time.sleep(2)  # Wait for page to update
+                    wait_for_dom_quiet(driver)  # Wait for page to update
                 except Exception as e:
                     print(f"Error clicking storage button: {e}")
             
@@ -956,6 +931,7 @@ def main():
     """Main function to scrape device prices"""
     global df
     max_retries = 3
+    page_cache = PageCache(cache_path(excel_file)) if args.incremental else None
     
     # Setup driver
     print("Setting up Chrome WebDriver...")
@@ -967,7 +943,7 @@ def main():
         driver.get("https://3cat.my/#explore_products")
         
         # Wait for page to load
-        time.sleep(5)
+        wait_for_page_ready(driver)
         
         # Find all product links
         print("Finding product links...")
@@ -997,10 +973,14 @@ def main():
             device_data = []
             retry_count = 0
             success = False
+            reused = False
             
             while not success and retry_count < max_retries:
                 try:
-                    device_data = process_device_listing(driver, product_url)
+                    if page_cache is not None:
+                        device_data, reused = page_cache.rows(product_url, lambda: process_device_listing(driver, product_url))
+                    else:
+                        device_data = process_device_listing(driver, product_url)
                     if device_data:  # Consider success only if we got data
                         success = True
                     else:
@@ -1027,11 +1007,15 @@ def main():
                     else:
                         df = new_rows_df
                         
-                    df.to_excel(excel_file, index=False)
+                    write_excel(df, excel_file)
                     print(f"Updated Excel file with {len(device_data)} new entries")
                 else:
                     print("No data extracted for this device after all retries")
             
+            # Reused rows did not load the page, so no need to pace the site
+            if reused:
+                continue
+            
             # Add random delay between processing
             delay = random.uniform(2, 4)
             print(f"Waiting {delay:.1f} seconds before next device...")
@@ -1045,8 +1029,10 @@ def main():
         # Save final data
         try:
             if 'df' in globals() and not df.empty:
-                df.to_excel(excel_file, index=False)
+                write_excel(df, excel_file)
                 print(f"Final data saved to {excel_file}")
+                if page_cache is not None:
+                    print(f"Incremental crawl: {page_cache.summary()}")
                 
                 # Print summary
                 print("\nData Summary:")
@@ -1067,6 +1053,9 @@ def main():
         except Exception as e:
             print(f"Error saving final data: {e}")
         
+        if page_cache is not None:
+            page_cache.close()
+        
         # Close driver
         try:
             driver.quit()
@@ -1075,4 +1064,5 @@ def main():
             print("Driver already closed")
 
 if __name__ == "__main__":
+    enable_sleep_budget()
     main()
\ No newline at end of file
@@ -1,6 +1,8 @@
 """
 This script should be run separately. It has cloudfare protection, so should be run in HEAD mode only and should be checked for
 manual verification at the start of the script
+
+With -w N the listings are processed by N browser workers, each with its own freeze watchdog.
 """
 import os
 import time
@@ -11,17 +13,33 @@ import sys
 import traceback
 import argparse
 import re
-from selenium.common.exceptions import TimeoutException, StaleElementReferenceException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.driver_pool import DriverPool
+from common.browser_session import BrowserSession
+from common.fanout import fan_out_sessions, site_worker_limit
+from common.watchdog import format_operation_stats
+from common.dom import extract_hrefs, find_element_by_text
+from common.waits import enable_sleep_budget, wait_for_dom_quiet, wait_for_element_count_stable
+from common.resource_blocking import apply_resource_blocking
+from common.replay import configure_proxy
+from common.device_catalog import brand_of, device_type_of
+from common.model_index import ModelIndex
+from common.result_channel import write_excel
+from common.result_sink import get_sink, close_sink, read_journal, read_source_file
+
 # Parse command line arguments
 parser = argparse.ArgumentParser(description='Scrape device prices from Carousell')
 parser.add_argument('-n', '--num_devices', type=int, default=0, 
                     help='Number of devices to scrape. 0 means scrape all devices (default: 0)')
 parser.add_argument('-o', '--output', type=str, default=None,
                     help='Output Excel file path (default: output/MY_SO_Source3.xlsx)')
+parser.add_argument('-w', '--workers', type=int, default=1,
+                    help='Number of browser workers processing listings in parallel (default: 1)')
 args = parser.parse_args()
 
 # First, ensure undetected-chromedriver is installed
@@ -47,10 +65,15 @@ else:
     excel_file = os.path.join(output_dir, f'MY_SO_Source3.xlsx')
 # Base URL for Carousell Singapore
 BASE_URL = "https://www.carousell.my"
+# Listing links that point at a device page
+DEVICE_LINK_SELECTOR = "a[href*='viewing_mode=0']"
 
 # Initialize or load Excel file with columns matching CompAsia format
 try:
-    df = pd.read_excel(excel_file)
+    # Rows an interrupted run left in the result sink's journal count as already scraped
+    df = read_source_file(excel_file)
+    if df is None:
+        raise FileNotFoundError(excel_file)
     print(f"Loaded existing file: {excel_file}")
     
     # Check and add any missing columns to match CompAsia format
@@ -96,12 +119,15 @@ def setup_driver():
     options.add_argument('--disable-extensions')
     options.add_argument('--disable-infobars')
     
+    configure_proxy(options)
+    
     # Create driver with undetected_chromedriver and specify version
     driver = uc.Chrome(
         options=options,
         version_main=135,  # Match your current Chrome version 135
         headless=False      # Also set the headless parameter here for undetected_chromedriver
     )
+    apply_resource_blocking(driver, "MY_SO_Source3")
     
     driver.set_page_load_timeout(30)
     
@@ -135,25 +161,7 @@ def extract_storage_from_text(text):
 
 def extract_brand_from_device(device_name):
     """Extract brand from device name"""
-    known_brands = [
-        "Apple", "Samsung", "Huawei", "Xiaomi", "Oppo", "Vivo", 
-        "Google", "OnePlus", "Sony", "LG", "Motorola", "Nokia", 
-        "Realme", "Asus", "Poco", "Redmi", "Infinix", "Nothing", "Honor"
-    ]
-    
-    for brand in known_brands:
-        if brand.lower() in device_name.lower():
-            return brand
-    
-    # Special cases
-    if "iphone" in device_name.lower() or "ipad" in device_name.lower():
-        return "Apple"
-    if "galaxy" in device_name.lower():
-        return "Samsung"
-    if "pixel" in device_name.lower():
-        return "Google"
-    
-    return "Unknown"  # Default if no brand detected
+    return brand_of(device_name)
 
 def extract_model_from_device(device_name, brand):
     """Extract model from device name by removing the brand if present"""
@@ -197,15 +205,8 @@ def click_load_more_button(driver, max_clicks=30):
                 EC.presence_of_element_located((By.TAG_NAME, "button"))
             )
             
-            # Find all buttons
-            buttons = driver.find_elements(By.TAG_NAME, "button")
-            for button in buttons:
-                try:
-                    if "Load more" in button.text:
-                        load_more_button = button
-                        break
-                except StaleElementReferenceException:
-                    continue
+            # Find the button by its text in a single script call
+            load_more_button = find_element_by_text(driver, "button", "Load more")
         except Exception as e:
             print(f"Error searching for Load More button: {e}")
         
@@ -214,19 +215,15 @@ def click_load_more_button(driver, max_clicks=30):
             break
         
         # Record the current number of products
-        current_links = driver.find_elements(By.TAG_NAME, "a")
+        current_links = extract_hrefs(driver)
         product_count_before = len(product_ids)
         
         # Find new product links
-        for link in current_links:
-            try:
-                href = link.get_attribute("href")
-                if href and ("/certified-used-phone-l/" in href or "iphone" in href.lower()) and "viewing_mode=0" in href:
-                    product_id = extract_product_id(href)
-                    if product_id:
-                        product_ids.add(product_id)
-            except:
-                continue
+        for href in current_links:
+            if ("/certified-used-phone-l/" in href or "iphone" in href.lower()) and "viewing_mode=0" in href:
+                product_id = extract_product_id(href)
+                if product_id:
+                    product_ids.add(product_id)
         
         print(f"Current unique products: {len(product_ids)}")
         
@@ -246,7 +243,7 @@ def click_load_more_button(driver, max_clicks=30):
         click_count += 1
         
         # Wait for new content to load
-        time.sleep(3)
+        wait_for_element_count_stable(driver, DEVICE_LINK_SELECTOR, stable_ms=1500, timeout=10)
         
         # Check if we got new products
         new_count = len(product_ids) - product_count_before
@@ -271,33 +268,26 @@ def find_device_links(driver):
     unique_product_ids = set()
     
     # Wait for content to load
-    time.sleep(5)
+    wait_for_element_count_stable(driver, DEVICE_LINK_SELECTOR, stable_ms=1500, timeout=10)
     
-    # Find all links
-    links = driver.find_elements(By.TAG_NAME, "a")
+    # Find all links in one script call
+    links = extract_hrefs(driver)
     print(f"Found {len(links)} total links on the page")
     
     # Filter for device links using the pattern from scrape.py
-    for link in links:
-        try:
-            href = link.get_attribute("href")
-            if not href:
-                continue
+    for href in links:
+        # Use the key patterns from scrape.py that work well
+        if ("/certified-used-phone-l/" in href or "iphone" in href.lower()) and "viewing_mode=0" in href:
+            # Extract product ID to avoid duplicates
+            product_id = extract_product_id(href)
+            if product_id and product_id not in unique_product_ids:
+                unique_product_ids.add(product_id)
                 
-            # Use the key patterns from scrape.py that work well
-            if ("/certified-used-phone-l/" in href or "iphone" in href.lower()) and "viewing_mode=0" in href:
-                # Extract product ID to avoid duplicates
-                product_id = extract_product_id(href)
-                if product_id and product_id not in unique_product_ids:
-                    unique_product_ids.add(product_id)
+                # Convert relative URL to absolute URL if needed
+                if href.startswith('/'):
+                    href = BASE_URL + href
                     
-                    # Convert relative URL to absolute URL if needed
-                    if href.startswith('/'):
-                        href = BASE_URL + href
-                        
-                    valid_links.append(href)
-        except Exception as e:
-            continue
+                valid_links.append(href)
     
     print(f"Found {len(valid_links)} valid device links")
     return valid_links
@@ -576,8 +566,9 @@ def map_condition_text(condition_text):
     else:
         return condition_text  # Keep original if no mapping found
 
-def process_device_listing(driver, url):
-    """Process a device listing page directly"""
+def process_device_listing(session, url):
+    """Process a device listing page directly in a browser session"""
+    driver = session.driver
     device_data = []
     
     try:
@@ -589,14 +580,24 @@ def process_device_listing(driver, url):
             
         print(f"Navigating to: {full_url}")
         try:
+            session.start_operation("navigate_to_url")
             driver.get(full_url)
-            time.sleep(5)  # Wait for page to load
+            session.end_operation()
+            wait_for_dom_quiet(driver, quiet_ms=1000, timeout=5)  # Wait for page to load
         except TimeoutException:
+            session.end_operation()
             print("Page load timed out, but continuing anyway")
             driver.execute_script("window.stop();")  # Stop page loading
         
+        # Browser was killed by the watchdog
+        if session.is_frozen:
+            print("Browser freeze detected, restarting...")
+            return []
+        
         # Get device name
+        session.start_operation("get_page_title")
         device_name = get_page_title(driver)
+        session.end_operation()
         print(f"Processing device: {device_name}")
         
         # Extract brand from device name
@@ -606,22 +607,28 @@ def process_device_listing(driver, url):
         model = extract_model_from_device(device_name, brand)
         
         # Determine device type
-        device_type = "Tablet" if any(keyword in device_name.lower() for keyword in ["ipad", "tab", "tablet"]) else "SmartPhone"
+        device_type = device_type_of(device_name)
         
         # Get device color
         color = get_device_color(driver)
         
         # Get initial price
+        session.start_operation("get_initial_price")
         initial_price = get_price(driver)
+        session.end_operation()
         if not initial_price:
             print("Could not find price. Skipping device.")
             return []
         
         # Get storage options
+        session.start_operation("find_storage_options")
         storage_options = find_storage_options(driver)
+        session.end_operation()
         
         # Get condition options
+        session.start_operation("find_condition_options")
         condition_options = find_condition_options(driver)
+        session.end_operation()
         
         # Process all combinations of storage and condition
         for storage_option in storage_options:
@@ -711,37 +718,88 @@ def process_device_listing(driver, url):
         return device_data
     
     except Exception as e:
+        session.end_operation()
         print(f"Error processing device: {e}")
         traceback.print_exc()
         return []
 
+def scrape_url(session, card_url, max_retries=3):
+    """Process one listing URL with retries, restarting the session's browser if it freezes"""
+    device_data = []
+    retry_count = 0
+    
+    while retry_count < max_retries:
+        try:
+            if session.needs_restart:
+                print("Browser needs to be restarted before processing")
+                session.restart()
+            device_data = process_device_listing(session, card_url)
+            if device_data:  # Consider success only if we got data
+                return device_data
+            print("No data extracted, considering as failure")
+            retry_count += 1
+        except Exception as e:
+            retry_count += 1
+            print(f"Error processing device (attempt {retry_count}/{max_retries}): {e}")
+            
+            if retry_count < max_retries:
+                print("Retrying after a short delay...")
+                time.sleep(5)
+    
+    return device_data
+
+def open_worker_session(pool, name):
+    """Start another browser session and let it pass the Cloudflare check before it gets listings"""
+    session = BrowserSession(pool, name)
+    try:
+        session.start_operation("open_base_url")
+        session.driver.get(BASE_URL)
+        session.end_operation()
+        handle_cloudflare(session.driver)
+    except Exception as e:
+        session.end_operation()
+        print(f"Error opening {BASE_URL} in {name}: {e}")
+    return session
+
 def main():
     """Main function to scrape device prices"""
-    global df
-    max_retries = 3
+    model_index = ModelIndex(df)
+    
+    # Workers append their rows to one shared sink; the .xlsx is written once at the end
+    sink = get_sink(excel_file)
+    replaced = False
     
-    # Setup driver
+    # Setup driver pool: one browser per worker plus one warm spare
+    workers = site_worker_limit(BASE_URL, args.workers)
     print("Setting up undetected ChromeDriver...")
-    driver = setup_driver()
+    pool = DriverPool(setup_driver, size=workers, spares=1, serial_launch=True)
+    
+    # The first session loads the listings and then works as the first worker
+    session = BrowserSession(pool, "worker-1")
+    sessions = [session]
     
     try:
         # Navigate directly to the target page
         print("Navigating to certified mobiles page...")
-        driver.get("https://www.carousell.my/smart_render/?type=market-landing-page&name=ap-certified-mobiles")
+        session.start_operation("navigate_to_main_page")
+        session.driver.get("https://www.carousell.my/smart_render/?type=market-landing-page&name=ap-certified-mobiles")
+        session.end_operation()
         
         # Simple wait for page to load
-        time.sleep(5)
+        wait_for_dom_quiet(session.driver, quiet_ms=1000, timeout=5)
         
         # Simple Cloudflare handling
-        handle_cloudflare(driver)
+        handle_cloudflare(session.driver)
         
         # Click Load More button to load all listings
         print("Loading all device listings...")
-        click_load_more_button(driver, max_clicks=30)
+        session.start_operation("click_load_more")
+        click_load_more_button(session.driver, max_clicks=30)
+        session.end_operation()
         
         # Find device links using the pattern from scrape.py
         print("Finding device links...")
-        card_urls = find_device_links(driver)
+        card_urls = find_device_links(session.driver)
         
         # Remove duplicates
         card_urls = list(set(card_urls))
@@ -753,78 +811,76 @@ def main():
                 print(f"Limiting to first {args.num_devices} devices (of {len(card_urls)}) as specified by -n argument")
                 card_urls = card_urls[:args.num_devices]
         
-        # Process each device
-        for i, card_url in enumerate(card_urls):
-            print(f"\nProcessing device {i+1}/{len(card_urls)}")
+        # Remaining workers get their own browser and watchdog
+        for worker in range(2, min(workers, len(card_urls)) + 1):
+            sessions.append(open_worker_session(pool, f"worker-{worker}"))
+        if len(sessions) > 1:
+            print(f"Processing {len(card_urls)} devices with {len(sessions)} browser workers")
+        
+        def process(session, item):
+            i, card_url = item
+            print(f"\n[{session.name}] Processing device {i+1}/{len(card_urls)}")
             print(f"URL: {card_url}")
+            device_data = scrape_url(session, card_url)
             
-            # Process this device with retries
-            device_data = []
-            retry_count = 0
-            success = False
-            
-            while not success and retry_count < max_retries:
-                try:
-                    device_data = process_device_listing(driver, card_url)
-                    if device_data:  # Consider success only if we got data
-                        success = True
-                    else:
-                        print("No data extracted, considering as failure")
-                        retry_count += 1
-                except Exception as e:
-                    retry_count += 1
-                    print(f"Error processing device (attempt {retry_count}/{max_retries}): {e}")
-                    
-                    if retry_count < max_retries:
-                        print("Retrying after a short delay...")
-                        time.sleep(5)
-                
-                # Update Excel file if we got data
-                if device_data:
-                    new_rows_df = pd.DataFrame(device_data)
-                    
-                    # Handle empty df warning
-                    if not df.empty or not new_rows_df.empty:
-                        df = pd.concat([df, new_rows_df], ignore_index=True)
-                        # Only drop duplicates if we actually have rows
-                        if not df.empty:
-                            df.drop_duplicates(subset=['Model', 'Capacity', 'Condition'], keep='last', inplace=True)
-                    else:
-                        df = new_rows_df
-                        
-                    df.to_excel(excel_file, index=False)
-                    print(f"Updated Excel file with {len(device_data)} new entries")
-                else:
-                    print("No data extracted for this device after all retries")
-                    # Add random delay between processing
-                delay = random.uniform(2, 4)
-                print(f"Waiting {delay:.1f} seconds before next device...")
-                time.sleep(delay)
+            # Add random delay between processing
+            delay = random.uniform(2, 4)
+            print(f"Waiting {delay:.1f} seconds before next device...")
+            time.sleep(delay)
+            return device_data
+        
+        def record(item, device_data):
+            nonlocal replaced
+            # Save the rows if we got data
+            if device_data:
+                # Only drop duplicates at the end if the new rows replace existing ones
+                if model_index.overlaps(device_data):
+                    replaced = True
+                for row in device_data:
+                    sink.append(row)
+                model_index.add(device_data)
+                print(f"Saved {len(device_data)} new entries")
+            else:
+                print("No data extracted for this device after all retries")
+        
+        # Workers take the next URL from a shared queue and share the output
+        fan_out_sessions(list(enumerate(card_urls)), process, sessions, on_result=record)
         
     except Exception as e:
         print(f"Error in main function: {e}")
         traceback.print_exc()
     
     finally:
+        # Stop the watchdogs
+        for worker_session in sessions:
+            worker_session.close()
+        print(format_operation_stats())
+        
         # Save final data
         try:
-            if 'df' in globals() and not df.empty:
-                df.to_excel(excel_file, index=False)
+            close_sink(excel_file)
+            final_df = read_source_file(excel_file)
+            if final_df is not None and not final_df.empty:
+                # Rewrite the file once if rows replaced earlier ones, unless some are still pending in the journal
+                if replaced and not read_journal(excel_file):
+                    final_df = final_df.drop_duplicates(subset=['Model', 'Capacity', 'Condition'], keep='last')
+                    write_excel(final_df, excel_file)
                 print(f"Final data saved to {excel_file}")
                 
                 # Print summary
                 print("\nData Summary:")
-                print(f"Total devices: {df['Model'].nunique()}")
-                print(f"Total entries: {len(df)}")
+                print(f"Total devices: {final_df['Model'].nunique()}")
+                print(f"Total entries: {len(final_df)}")
         except Exception as e:
             print(f"Error saving final data: {e}")
         
-        # Close driver
+        # Close all pooled browsers
         try:
-            driver.quit()
+            pool.close()
             print("Driver closed")
         except:
             print("Driver already closed")
 
 if __name__ == "__main__":
+    enable_sleep_budget()
     main()
\ No newline at end of file
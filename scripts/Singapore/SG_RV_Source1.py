@@ -6,11 +6,23 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException
 from webdriver_manager.chrome import ChromeDriverManager
 import time
-import openpyxl
 from datetime import datetime
 import os
 import re
 import argparse
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.result_sink import get_sink, close_sink
+from common.driver_pool import DriverPool
+from common.fanout import fan_out, site_worker_limit
+from common.compasia_form import ConditionSweep, diagnostic_form_ready, select_screen_condition
+from common.waits import enable_sleep_budget, wait_for_dom_quiet, wait_for_element_count_stable, wait_for_network_idle
+from common.resource_blocking import apply_resource_blocking
+from common.replay import configure_proxy
+
+# Landing page of the trade-in form
+SELL_URL = "https://compasiatradeinsg.com/tradein/sell"
 
 def setup_driver(headless=True):
     """Set up the Chrome WebDriver with appropriate options for containerized environment."""
@@ -44,8 +56,11 @@ def setup_driver(headless=True):
     # Use a normal page load strategy instead of eager
     options.page_load_strategy = 'normal'
     
+    configure_proxy(options)
+    
     # Initialize the driver directly
     driver = webdriver.Chrome(options=options)
+    apply_resource_blocking(driver, "SG_RV_Source1")
     
     # Set page load timeout to be more generous
     driver.set_page_load_timeout(60)
@@ -83,7 +98,7 @@ def click_device_type(driver, wait, device_type):
         result = driver.execute_script(script)
         if result:
             print(f"Successfully clicked on {device_type} card using JavaScript")
-            time.sleep(3)  # Wait for page to update
+            wait_for_dom_quiet(driver)  # Wait for page to update
             return True
     except Exception as e:
         print(f"JavaScript click failed: {e}")
@@ -96,7 +111,7 @@ def click_device_type(driver, wait, device_type):
                 driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", element)
                 driver.execute_script("arguments[0].click();", element)
                 print(f"Successfully clicked on {device_type} footer directly")
-                time.sleep(3)
+                wait_for_dom_quiet(driver)
                 return True
     except Exception as e:
         print(f"Direct footer click failed: {e}")
@@ -108,7 +123,7 @@ def click_device_type(driver, wait, device_type):
         driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", element)
         driver.execute_script("arguments[0].click();", element)
         print(f"Successfully clicked on {device_type} using XPath with parent")
-        time.sleep(3)
+        wait_for_dom_quiet(driver)
         return True
     except Exception as e:
         print(f"XPath parent click failed: {e}")
@@ -125,13 +140,13 @@ def get_dropdown_options(driver, input_id):
         )
         driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", dropdown)
         dropdown.click()
-        time.sleep(1)
+        wait_for_element_count_stable(driver, f"div[id^='{input_id.replace('input', 'option')}-']", stable_ms=300, timeout=5)
         options = driver.find_elements(By.CSS_SELECTOR, f"div[id^='{input_id.replace('input', 'option')}-']")
         option_texts = [option.text.strip() for option in options if option.text.strip()]
         
         # Close dropdown by clicking again
         dropdown.click()
-        time.sleep(0.5)
+        wait_for_dom_quiet(driver, quiet_ms=200, timeout=2)
         return option_texts
     except Exception as e:
         print(f"Error getting options for {input_id}: {e}")
@@ -146,7 +161,6 @@ def select_dropdown_option(driver, input_id, option_index, wait, trade_in_data=N
         dropdown = wait.until(EC.element_to_be_clickable((By.ID, input_id)))
         driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", dropdown)
         dropdown.click()
-        time.sleep(1)
         
         option_selector = f"//div[@id='{input_id.replace('input', 'option')}-{option_index}']"
         option = wait.until(EC.element_to_be_clickable((By.XPATH, option_selector)))
@@ -292,7 +306,7 @@ def fill_diagnostic_form(driver, screen_condition):
     
     driver.execute_script(script)
     print("Filled diagnostic form")
-    time.sleep(2)
+    wait_for_dom_quiet(driver)
 
 
 def extract_trade_in_value(driver, wait, trade_in_data, output_file):
@@ -326,12 +340,93 @@ def extract_trade_in_value(driver, wait, trade_in_data, output_file):
         return False
 
 
-def navigate_and_complete_form(driver, wait, device_type, brand_index, model_index, variant_index, screen_condition, output_file):
-    """Navigate the website and complete the form for a specific configuration."""
-    print(f"Processing: {device_type}, Brand index {brand_index}, Model index {model_index}, Variant index {variant_index}, Screen condition: {screen_condition}")
+def select_device_variant(driver, wait, device_type, brand_index, model_index, variant_index, trade_in_data):
+    """Load the portal and fill type, brand, model and variant up to the diagnostic form."""
+    # Load the main page
+    driver.get(SELL_URL)
+    wait_for_element_count_stable(driver, ".card-button")
+    
+    # Click on device type card
+    if not click_device_type(driver, wait, device_type):
+        return False
+    
+    # Select brand
+    if not select_dropdown_option(driver, "react-select-2-input", brand_index, wait, trade_in_data):
+        return False
+    
+    # Select model
+    if not select_dropdown_option(driver, "react-select-3-input", model_index, wait, trade_in_data):
+        return False
+    
+    # Select variant
+    if not select_dropdown_option(driver, "react-select-4-input", variant_index, wait, trade_in_data):
+        return False
+    
+    # Click next button
+    next_button_js = """
+        var nextBtn = document.querySelector('button.progress-button-next:not([disabled])');
+        if (nextBtn) {
+            nextBtn.scrollIntoView({block: 'center'});
+            nextBtn.click();
+            return true;
+        }
+        return false;
+    """
+    if not click_button_with_fallback(
+        driver, wait, 
+        "//button[contains(@class, 'progress-button-next') and not(@disabled)]", 
+        next_button_js, "Next"
+    ):
+        return False
+    
+    # The diagnostic form replaces the device selection step
+    return diagnostic_form_ready(driver)
 
-    # Initialize data dictionary with the required columns
-    trade_in_data = {
+
+def request_quote(driver, wait, screen_condition, full_form=True):
+    """Fill the diagnostic form for screen_condition and submit it.
+
+    When the form was already filled for this device only the screen condition radio is toggled.
+    """
+    if full_form:
+        fill_diagnostic_form(driver, screen_condition)
+    else:
+        if not select_screen_condition(driver, screen_condition):
+            return False
+        print(f"Switched screen condition to {screen_condition}")
+        wait_for_dom_quiet(driver, quiet_ms=300, timeout=3)
+    
+    # Click Get Quote button
+    quote_button_js = """
+        var quoteBtn = document.querySelector('button[type="submit"]');
+        if (quoteBtn) {
+            quoteBtn.scrollIntoView({block: 'center'});
+            quoteBtn.click();
+            return true;
+        }
+        return false;
+    """
+    if not click_button_with_fallback(
+        driver, wait, 
+        "//button[@type='submit' and contains(text(), 'Get Quote')]", 
+        quote_button_js, "Get Quote"
+    ):
+        return False
+    
+    # The quote is fetched from the pricing API
+    wait_for_network_idle(driver)
+    return True
+
+
+def navigate_and_sweep_conditions(driver, wait, device_type, brand_index, model_index, variant_index, screen_conditions, output_file):
+    """Select a device variant once and price every screen condition on it.
+
+    Returns a dict mapping each screen condition to whether its value was saved.
+    """
+    print(f"Processing: {device_type}, Brand index {brand_index}, Model index {model_index}, Variant index {variant_index}, Screen conditions: {screen_conditions}")
+
+    # Initialize data dictionary with the required columns; Condition is set per sweep step
+    device_data = {
         "Country": "Singapore",
         "Device Type": device_type,
         "Brand": "",
@@ -339,7 +434,7 @@ def navigate_and_complete_form(driver, wait, device_type, brand_index, model_ind
         "Capacity": "",
         "Color": "",
         "Launch RRP": "",
-        "Condition": get_condition_mapping(screen_condition),
+        "Condition": "",
         "Value Type": "Trade-in",
         "Currency": "SGD",
         "Value": "",
@@ -349,137 +444,44 @@ def navigate_and_complete_form(driver, wait, device_type, brand_index, model_ind
         "Comments": ""
     }
 
-    try:
-        # Load the main page
-        driver.get("https://compasiatradeinsg.com/tradein/sell")
-        time.sleep(3)
-        
-        # Click on device type card
-        if not click_device_type(driver, wait, device_type):
-            return False
-        
-        # Select brand
-        if not select_dropdown_option(driver, "react-select-2-input", brand_index, wait, trade_in_data):
-            return False
-        
-        # Select model
-        if not select_dropdown_option(driver, "react-select-3-input", model_index, wait, trade_in_data):
-            return False
-        
-        # Select variant
-        if not select_dropdown_option(driver, "react-select-4-input", variant_index, wait, trade_in_data):
-            return False
-        
-        # Click next button
-        next_button_js = """
-            var nextBtn = document.querySelector('button.progress-button-next:not([disabled])');
-            if (nextBtn) {
-                nextBtn.scrollIntoView({block: 'center'});
-                nextBtn.click();
-                return true;
-            }
-            return false;
-        """
-        if not click_button_with_fallback(
-            driver, wait, 
-            "//button[contains(@class, 'progress-button-next') and not(@disabled)]", 
-            next_button_js, "Next"
-        ):
-            return False
-        
-        time.sleep(3)
-        
-        # Fill diagnostic form
-        fill_diagnostic_form(driver, screen_condition)
-        
-        # Click Get Quote button
-        quote_button_js = """
-            var quoteBtn = document.querySelector('button[type="submit"]');
-            if (quoteBtn) {
-                quoteBtn.scrollIntoView({block: 'center'});
-                quoteBtn.click();
-                return true;
-            }
-            return false;
-        """
-        if not click_button_with_fallback(
-            driver, wait, 
-            "//button[@type='submit' and contains(text(), 'Get Quote')]", 
-            quote_button_js, "Get Quote"
-        ):
-            return False
-        
-        time.sleep(5)
-        
-        # Extract trade-in value
+    def extract(screen_condition):
+        trade_in_data = dict(device_data)
+        trade_in_data["Condition"] = get_condition_mapping(screen_condition)
         return extract_trade_in_value(driver, wait, trade_in_data, output_file)
-    
-    except Exception as main_error:
-        print(f"Main execution failed: {main_error}")
-        error_folder = os.path.dirname(output_file)
-        os.makedirs(error_folder, exist_ok=True)
-        error_screenshot = os.path.join(error_folder, f"error_{device_type}_{brand_index}_{model_index}_{variant_index}_{screen_condition}.png")
-        driver.save_screenshot(error_screenshot)
-        return False
 
+    sweep = ConditionSweep(
+        driver,
+        lambda: select_device_variant(driver, wait, device_type, brand_index, model_index, variant_index, device_data),
+        lambda screen_condition, full_form: request_quote(driver, wait, screen_condition, full_form),
+        extract
+    )
+    results = sweep.run(screen_conditions)
+    print(f"Priced {sum(results.values())}/{len(screen_conditions)} conditions with {sweep.full_navigations} full navigation(s)")
 
-def save_to_excel(data, output_file):
-    """Save the extracted trade-in data to an Excel file."""
-    # Ensure output directory exists
-    os.makedirs(os.path.dirname(output_file) if os.path.dirname(output_file) else ".", exist_ok=True)
-    
-    if os.path.exists(output_file):
+    failed = [condition for condition, success in results.items() if not success]
+    if failed:
         try:
-            workbook = openpyxl.load_workbook(output_file)
-            sheet = workbook.active
-        except:
-            workbook = openpyxl.Workbook()
-            sheet = workbook.active
-            # Use the new column headers
-            headers = ["Country", "Device Type", "Brand", "Model", "Capacity", "Color", 
-                      "Launch RRP", "Condition", "Value Type", "Currency", "Value", 
-                      "Source", "Updated on", "Updated by", "Comments"]
-            sheet.append(headers)
-    else:
-        workbook = openpyxl.Workbook()
-        sheet = workbook.active
-        # Use the new column headers
-        headers = ["Country", "Device Type", "Brand", "Model", "Capacity", "Color", 
-                  "Launch RRP", "Condition", "Value Type", "Currency", "Value", 
-                  "Source", "Updated on", "Updated by", "Comments"]
-        sheet.append(headers)
-
-    # Add new row with all the required columns
-    row_data = [
-        data["Country"],
-        data["Device Type"],
-        data["Brand"],
-        data["Model"],
-        data["Capacity"],
-        data["Color"],
-        data["Launch RRP"],
-        data["Condition"],
-        data["Value Type"],
-        data["Currency"],
-        data["Value"],
-        data["Source"],
-        data["Updated on"],
-        data["Updated by"],
-        data["Comments"]
-    ]
-    sheet.append(row_data)
+            error_folder = os.path.dirname(output_file)
+            os.makedirs(error_folder, exist_ok=True)
+            error_screenshot = os.path.join(error_folder, f"error_{device_type}_{brand_index}_{model_index}_{variant_index}_{'_'.join(failed)}.png")
+            driver.save_screenshot(error_screenshot)
+        except Exception as e:
+            print(f"Could not save error screenshot: {e}")
+    return results
+
+
+def navigate_and_complete_form(driver, wait, device_type, brand_index, model_index, variant_index, screen_condition, output_file):
+    """Navigate the website and complete the form for a specific configuration."""
+    results = navigate_and_sweep_conditions(driver, wait, device_type, brand_index, model_index, variant_index, [screen_condition], output_file)
+    return results[screen_condition]
 
-    try:
-        workbook.save(output_file)
-        print(f"Saved data to {output_file}")
-    except Exception as e:
-        print(f"Error saving Excel file: {e}")
-        alt_file_name = os.path.join(os.path.dirname(output_file), f"SG_RV_Source1.xlsx")
-        try:
-            workbook.save(alt_file_name)
-            print(f"Saved to {alt_file_name}")
-        except:
-            print("Could not save Excel file")
+
+def save_to_excel(data, output_file):
+    """Append the extracted trade-in data to the result sink for output_file.
+
+    Rows are journaled immediately; the Excel file is written once when the sink is closed.
+    """
+    get_sink(output_file).append(data)
 
 
 def main_loop(n_scrape=None, output_file=None):
@@ -513,8 +515,8 @@ def main_loop(n_scrape=None, output_file=None):
             print(f"\n========== Processing {device_type} ==========\n")
             
             # Navigate to website
-            driver.get("https://compasiatradeinsg.com/tradein/sell")
-            time.sleep(3)
+            driver.get(SELL_URL)
+            wait_for_element_count_stable(driver, ".card-button")
             
             # Click on the device type
             if not click_device_type(driver, wait, device_type):
@@ -540,8 +542,8 @@ def main_loop(n_scrape=None, output_file=None):
             # Process each brand
             for brand_idx in brand_indices:
                 # Navigate to the main page for each brand
-                driver.get("https://compasiatradeinsg.com/tradein/sell")
-                time.sleep(3)
+                driver.get(SELL_URL)
+                wait_for_element_count_stable(driver, ".card-button")
                 
                 if not click_device_type(driver, wait, device_type):
                     print(f"Could not click on {device_type} card for brand {brand_idx}, skipping")
@@ -560,8 +562,8 @@ def main_loop(n_scrape=None, output_file=None):
                 # Process each model
                 for model_idx in range(num_models):
                     # Navigate to main page for each model
-                    driver.get("https://compasiatradeinsg.com/tradein/sell")
-                    time.sleep(3)
+                    driver.get(SELL_URL)
+                    wait_for_element_count_stable(driver, ".card-button")
                     
                     if not click_device_type(driver, wait, device_type):
                         print(f"Could not click on {device_type} card for model {model_idx}, skipping")
@@ -582,33 +584,33 @@ def main_loop(n_scrape=None, output_file=None):
                     num_variants = len(variant_options)
                     print(f"Found {num_variants} variants for model index {model_idx}: {variant_options}")
                     
-                    # Process each variant and condition
+                    # Process each variant, sweeping all screen conditions on one device selection
                     for variant_idx in range(num_variants):
-                        for condition in screen_conditions:
-                            # Check if we've reached the requested number of scrapes for this device type
-                            if n_scrape is not None and device_scrape_counts[device_type] >= n_scrape:
-                                print(f"Completed {n_scrape} {device_type} scrapes as requested. Moving to next device type.")
-                                break  # Break out of conditions loop
-                            
-                            print(f"\nStarting new configuration: {device_type}, Brand idx {brand_idx}, Model idx {model_idx}, Variant idx {variant_idx}, Condition: {condition}")
-                            result = navigate_and_complete_form(driver, wait, device_type, brand_idx, model_idx, variant_idx, condition, output_file)
-                            time.sleep(2)  # Brief pause between iterations
-                            
-                            # If there was an error, retry once
-                            if not result:
-                                print("Retrying after error...")
-                                result = navigate_and_complete_form(driver, wait, device_type, brand_idx, model_idx, variant_idx, condition, output_file)
-                                time.sleep(2)
-                            
-                            # Only increment if successful
-                            if result:
-                                device_scrape_counts[device_type] += 1
-                                total_scrape_count += 1
-                                print(f"Completed {device_scrape_counts[device_type]}/{n_scrape if n_scrape else 'unlimited'} {device_type} scrapes")
-                        
-                        # Check if we should break out of the variant loop
+                        # Check if we've reached the requested number of scrapes for this device type
                         if n_scrape is not None and device_scrape_counts[device_type] >= n_scrape:
+                            print(f"Completed {n_scrape} {device_type} scrapes as requested. Moving to next device type.")
                             break
+                        
+                        conditions = screen_conditions
+                        if n_scrape is not None:
+                            conditions = screen_conditions[:n_scrape - device_scrape_counts[device_type]]
+                        
+                        print(f"\nStarting new configuration: {device_type}, Brand idx {brand_idx}, Model idx {model_idx}, Variant idx {variant_idx}, Conditions: {conditions}")
+                        results = navigate_and_sweep_conditions(driver, wait, device_type, brand_idx, model_idx, variant_idx, conditions, output_file)
+                        time.sleep(2)  # Brief pause between iterations
+                        
+                        # If there was an error, retry the failed conditions once
+                        failed = [condition for condition, success in results.items() if not success]
+                        if failed:
+                            print("Retrying after error...")
+                            results.update(navigate_and_sweep_conditions(driver, wait, device_type, brand_idx, model_idx, variant_idx, failed, output_file))
+                            time.sleep(2)
+                        
+                        # Only count successful conditions
+                        succeeded = sum(1 for success in results.values() if success)
+                        device_scrape_counts[device_type] += succeeded
+                        total_scrape_count += succeeded
+                        print(f"Completed {device_scrape_counts[device_type]}/{n_scrape if n_scrape else 'unlimited'} {device_type} scrapes")
                     
                     # Check if we should break out of the model loop
                     if n_scrape is not None and device_scrape_counts[device_type] >= n_scrape:
@@ -627,13 +629,149 @@ def main_loop(n_scrape=None, output_file=None):
         driver.save_screenshot(os.path.join(error_folder, "main_loop_error.png"))
     finally:
         driver.quit()
+        close_sink(output_file)
         print("Browser closed. Process complete.")
 
 
+def enumerate_configurations(driver, wait, device_types, brands, screen_conditions, n_scrape=None):
+    """Walk the type, brand, model and variant dropdowns once and return every variant to scrape.
+
+    Each work item is (device type, brand index, model index, variant index, screen conditions).
+    """
+    configurations = []
+    
+    for device_type in device_types:
+        print(f"\n========== Enumerating {device_type} ==========\n")
+        device_configurations = []
+        condition_count = 0
+        
+        driver.get(SELL_URL)
+        wait_for_element_count_stable(driver, ".card-button")
+        if not click_device_type(driver, wait, device_type):
+            print(f"Could not click on {device_type} card, skipping to next device type")
+            continue
+        
+        # Keep the brand order of the brands list
+        brand_options = get_dropdown_options(driver, "react-select-2-input")
+        brand_indices = [brand_options.index(brand) for brand in brands if brand in brand_options]
+        
+        for brand_idx in brand_indices:
+            driver.get(SELL_URL)
+            wait_for_element_count_stable(driver, ".card-button")
+            if not click_device_type(driver, wait, device_type):
+                continue
+            if not select_dropdown_option(driver, "react-select-2-input", brand_idx, wait):
+                print(f"Could not select brand index {brand_idx}, skipping")
+                continue
+            
+            model_options = get_dropdown_options(driver, "react-select-3-input")
+            print(f"Found {len(model_options)} models for brand index {brand_idx}: {model_options}")
+            
+            for model_idx in range(len(model_options)):
+                driver.get(SELL_URL)
+                wait_for_element_count_stable(driver, ".card-button")
+                if not click_device_type(driver, wait, device_type):
+                    continue
+                if not select_dropdown_option(driver, "react-select-2-input", brand_idx, wait):
+                    continue
+                if not select_dropdown_option(driver, "react-select-3-input", model_idx, wait):
+                    print(f"Could not select model index {model_idx}, skipping")
+                    continue
+                
+                variant_options = get_dropdown_options(driver, "react-select-4-input")
+                print(f"Found {len(variant_options)} variants for model index {model_idx}: {variant_options}")
+                
+                for variant_idx in range(len(variant_options)):
+                    conditions = tuple(screen_conditions)
+                    if n_scrape is not None:
+                        conditions = conditions[:n_scrape - condition_count]
+                    if conditions:
+                        device_configurations.append((device_type, brand_idx, model_idx, variant_idx, conditions))
+                        condition_count += len(conditions)
+                
+                if n_scrape is not None and condition_count >= n_scrape:
+                    break
+            
+            if n_scrape is not None and condition_count >= n_scrape:
+                break
+        
+        print(f"Enumerated {len(device_configurations)} {device_type} variants ({condition_count} configurations)")
+        configurations.extend(device_configurations)
+    
+    return configurations
+
+
+def scrape_configuration(driver, configuration, output_file):
+    """Sweep the screen conditions of one variant, retrying failed conditions once.
+
+    Returns the number of conditions whose value was saved.
+    """
+    ignored_exceptions = (NoSuchElementException, StaleElementReferenceException)
+    wait = WebDriverWait(driver, 15, 0.5, ignored_exceptions=ignored_exceptions)
+    
+    device_type, brand_idx, model_idx, variant_idx, conditions = configuration
+    results = navigate_and_sweep_conditions(driver, wait, device_type, brand_idx, model_idx, variant_idx, list(conditions), output_file)
+    failed = [condition for condition, success in results.items() if not success]
+    if failed:
+        print("Retrying after error...")
+        results.update(navigate_and_sweep_conditions(driver, wait, device_type, brand_idx, model_idx, variant_idx, failed, output_file))
+    return sum(1 for success in results.values() if success)
+
+
+def main_loop_parallel(n_scrape=None, output_file=None, workers=4):
+    """Enumerate every configuration up front, then scrape them across a pool of browser workers."""
+    brands = ["Apple", "Samsung"]
+    screen_conditions = ["flawless", "minor_scratches", "cracked"]
+    device_types = ["Smartphone", "Tablet"]
+
+    # Use default output path if not specified
+    if output_file is None:
+        output_dir = os.environ.get("OUTPUT_DIR", "output")
+        os.makedirs(output_dir, exist_ok=True)
+        output_file = os.path.join(output_dir, "SG_RV_Source1.xlsx")
+    
+    print(f"Will save results to: {output_file}")
+
+    workers = site_worker_limit(SELL_URL, workers)
+    pool = DriverPool(lambda: setup_driver(headless=True), size=workers)
+    
+    try:
+        # Enumeration only needs one browser; the others warm up in the meantime
+        with pool.driver() as driver:
+            ignored_exceptions = (NoSuchElementException, StaleElementReferenceException)
+            wait = WebDriverWait(driver, 15, 0.5, ignored_exceptions=ignored_exceptions)
+            configurations = enumerate_configurations(driver, wait, device_types, brands, screen_conditions, n_scrape)
+        
+        total_conditions = sum(len(configuration[4]) for configuration in configurations)
+        print(f"\nScraping {len(configurations)} variants ({total_conditions} configurations) with {workers} browser workers\n")
+        results = fan_out(
+            configurations,
+            lambda driver, configuration: scrape_configuration(driver, configuration, output_file),
+            pool,
+            workers
+        )
+        
+        succeeded = sum(result for _, result in results if result)
+        print(f"\nCompleted {succeeded}/{total_conditions} configurations")
+
+    except Exception as e:
+        print(f"Error in parallel main loop: {e}")
+    finally:
+        pool.close()
+        close_sink(output_file)
+        print("Browsers closed. Process complete.")
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Scrape trade-in values for smartphones and tablets')
     parser.add_argument('-n', type=int, help='Number of scrapes to perform per device type (e.g., -n 2 will scrape 2 smartphones and 2 tablets)', default=None)
     parser.add_argument('-o', '--output', type=str, help='Output Excel file path', default=None)
+    parser.add_argument('-w', '--workers', type=int, help='Number of parallel browser workers (1 runs the sequential loop)', default=1)
     args = parser.parse_args()
     
-    main_loop(args.n, args.output)
\ No newline at end of file
+    enable_sleep_budget()
+    
+    if args.workers > 1:
+        main_loop_parallel(args.n, args.output, args.workers)
+    else:
+        main_loop(args.n, args.output)
\ No newline at end of file
@@ -10,6 +10,14 @@ import time
 import os
 import argparse
 from datetime import datetime
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.resource_blocking import apply_resource_blocking
+from common.replay import configure_proxy
+from common.device_catalog import device_type_of
+from common.result_channel import write_excel
+from common.waits import enable_sleep_budget
 
 
 def scrape_trade_in_prices(output_excel_path="SG_RV_Source2.xlsx", n_scrape=None, headless=True, delay=1):
@@ -72,8 +80,11 @@ def scrape_trade_in_prices(output_excel_path="SG_RV_Source2.xlsx", n_scrape=None
         options.add_argument('--media-cache-size=1048576')
         options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
         
+        configure_proxy(options)
+        
         # Initialize the driver
         driver = webdriver.Chrome(options=options)
+        apply_resource_blocking(driver, "SG_RV_Source2")
         
         # Process only a subset of companies if n_scrape is specified
         if n_scrape is not None and n_scrape > 0:
@@ -207,12 +218,8 @@ def scrape_trade_in_prices(output_excel_path="SG_RV_Source2.xlsx", n_scrape=None
                                     price = price_match.group(1).replace(',', '')  # Remove commas
                                     print(f"Found trade-in price: ${price_match.group(1)}")
                                     
-                                    # Determine if this is a phone or tablet
-                                    device_type = "SmartPhone"  # Default
-                                    if "Tab" in model_text or "Tablet" in model_text or "iPad" in model_text:
-                                        device_type = "Tablet"
-                                    elif "Watch" in model_text or "watch" in model_text:
-                                        device_type = "SmartWatch"
+                                    # Determine the device type from the model name
+                                    device_type = device_type_of(model_text)
                                     
                                     # Extract capacity if available
                                     capacity = ""
@@ -269,14 +276,14 @@ def scrape_trade_in_prices(output_excel_path="SG_RV_Source2.xlsx", n_scrape=None
             if not results_df.empty:
                 # Ensure directory exists
                 os.makedirs(os.path.dirname(output_excel_path) if os.path.dirname(output_excel_path) else ".", exist_ok=True)
-                results_df.to_excel(output_excel_path, index=False)
+                write_excel(results_df, output_excel_path)
                 print(f"Progress saved after company {company}: {total_models_processed} models processed so far")
         
         # Final save of all results
         if not results_df.empty:
             # Ensure directory exists
             os.makedirs(os.path.dirname(output_excel_path) if os.path.dirname(output_excel_path) else ".", exist_ok=True)
-            results_df.to_excel(output_excel_path, index=False)
+            write_excel(results_df, output_excel_path)
             
         print(f"All companies processed. {total_models_processed} models found.")
         print(f"Results saved to: {output_excel_path}")
@@ -288,7 +295,7 @@ def scrape_trade_in_prices(output_excel_path="SG_RV_Source2.xlsx", n_scrape=None
         if 'results_df' in locals() and not results_df.empty:
             # Ensure directory exists
             os.makedirs(os.path.dirname(output_excel_path) if os.path.dirname(output_excel_path) else ".", exist_ok=True)
-            results_df.to_excel(output_excel_path, index=False)
+            write_excel(results_df, output_excel_path)
             print(f"Saved partial results to {output_excel_path}")
         return False
     finally:
@@ -308,6 +315,8 @@ if __name__ == "__main__":
     parser.add_argument('-d', '--delay', type=float, help='Delay between actions (lower = faster but may be less reliable)', default=0.5)
     args = parser.parse_args()
     
+    enable_sleep_budget()
+    
     output_excel_path = args.output
     
     # Create output directory if it doesn't exist
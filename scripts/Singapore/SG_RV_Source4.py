@@ -12,6 +12,14 @@ from webdriver_manager.chrome import ChromeDriverManager
 from datetime import datetime
 import urllib3
 import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.resource_blocking import apply_resource_blocking
+from common.replay import configure_proxy
+from common.device_catalog import device_type_of
+from common.result_channel import write_excel
+from common.waits import enable_sleep_budget
 
 def extract_trade_in_values(output_excel_path="SG_RV_Source4.xlsx", limit=None, headless=True):
     """
@@ -43,7 +51,9 @@ def extract_trade_in_values(output_excel_path="SG_RV_Source4.xlsx", limit=None,
     chrome_options.page_load_strategy = 'eager'  # Don't wait for all resources to load
     
     print("Initializing driver...")
+    configure_proxy(chrome_options)
     driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
+    apply_resource_blocking(driver, "SG_RV_Source4")
     # Set page load timeout
     driver.set_page_load_timeout(30)
     
@@ -142,9 +152,7 @@ def extract_trade_in_values(output_excel_path="SG_RV_Source4.xlsx", limit=None,
                         size_name = "N/A"
                     
                     # Determine device type based on model name
-                    device_type = "SmartPhone"
-                    if any(tablet_term in model_name.lower() for tablet_term in ["tab", "ipad", "pad", "tablet"]):
-                        device_type = "Tablet"
+                    device_type = device_type_of(model_name)
                     
                     # Format the trade price correctly (just the numeric value)
                     trade_price_value = str(trade_price)
@@ -196,7 +204,7 @@ def extract_trade_in_values(output_excel_path="SG_RV_Source4.xlsx", limit=None,
     os.makedirs(os.path.dirname(output_excel_path) if os.path.dirname(output_excel_path) else ".", exist_ok=True)
     
     # Save to Excel
-    df.to_excel(output_excel_path, index=False)
+    write_excel(df, output_excel_path)
     
     print(f"Extracted {len(results)} trade-in values")
     print(f"Results saved to {output_excel_path}")
@@ -210,6 +218,8 @@ if __name__ == "__main__":
     parser.add_argument("--no-headless", action="store_true", help="Run without headless mode (shows browser)")
     args = parser.parse_args()
     
+    enable_sleep_budget()
+    
     # Ensure output path is properly set
     output_path = args.output
     
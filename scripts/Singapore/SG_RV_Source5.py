@@ -6,11 +6,19 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException
 from webdriver_manager.chrome import ChromeDriverManager
 import time
-import openpyxl
 from datetime import datetime
 import os
 import re
 import argparse
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.result_sink import get_sink, close_sink
+from common.compasia_form import QUOTE_API_PATTERN, ConditionSweep, select_screen_condition
+from common.network_capture import capture_for, captured_price, enable_performance_log
+from common.resource_blocking import apply_resource_blocking
+from common.replay import configure_proxy
+from common.waits import enable_sleep_budget, wait_for_dom_quiet, wait_for_element_count_stable, wait_for_page_ready
 
 def setup_driver():
     """Set up the Chrome WebDriver with appropriate options for containerized environment."""
@@ -25,9 +33,14 @@ def setup_driver():
     options.add_argument("--disable-popup-blocking")
     options.add_argument("--disable-infobars")
     options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
+    # Network events, so quotes can be read from the pricing API response
+    enable_performance_log(options)
+    
+    configure_proxy(options)
     
     # Use Chrome directly instead of webdriver-manager in container
     driver = webdriver.Chrome(options=options)
+    apply_resource_blocking(driver, "SG_RV_Source5")
     return driver
 
 def get_condition_mapping(screen_condition):
@@ -43,8 +56,9 @@ def click_device_type(driver, wait, device_type):
     """Click on the device type card using a simple, reliable method."""
     print(f"Attempting to click on {device_type} card...")
     
-    # Wait a good amount of time for the page to fully load
-    time.sleep(5)
+    # Wait for the page to load and render the device type cards
+    wait_for_page_ready(driver)
+    wait_for_element_count_stable(driver, ".card-button", stable_ms=500)
     
     # Simple position-based method
     try:
@@ -73,7 +87,7 @@ def click_device_type(driver, wait, device_type):
         result = driver.execute_script(script)
         if result:
             print(f"Successfully clicked on {device_type} card at position {index}")
-            time.sleep(3)  # Wait after clicking
+            wait_for_dom_quiet(driver, quiet_ms=1000)  # Wait for the deferred click to settle
             return True
         else:
             print(f"No card found at position {index}")
@@ -97,7 +111,7 @@ def click_device_type(driver, wait, device_type):
         result = driver.execute_script(script)
         if result:
             print(f"Clicked on first available card button as fallback")
-            time.sleep(3)
+            wait_for_dom_quiet(driver, quiet_ms=1000)
             return True
     except Exception as e:
         print(f"Fallback method failed: {e}")
@@ -235,93 +249,75 @@ def handle_popup(driver, wait):
             print(f"Failed to handle T&C popup using JavaScript: {js_error}")
             return False
 
-def navigate_and_complete_form(driver, wait, device_type, brand_index, model_index, variant_index, screen_condition, output_file):
-    """Navigate the website and complete the form for a specific configuration."""
-    screen_condition_id = f"LCDS-01-{screen_condition}"
-    print(f"Processing: {device_type}, Brand index {brand_index}, Model index {model_index}, Variant index {variant_index}, Condition: {screen_condition}")
+def select_device_variant(driver, wait, device_type, brand_index, model_index, variant_index, trade_in_data):
+    """Load the portal and fill type, brand, model and variant up to the diagnostic form."""
+    driver.get("https://m1tradein.compasia.com/?utm_source=website&utm_medium=cta&utm_campaign=new")
 
-    # Initialize data dictionary with the required columns
-    trade_in_data = {
-        "Country": "Singapore",
-        "Device Type": device_type,
-        "Brand": "",
-        "Model": "",
-        "Capacity": "",
-        "Color": "",  # Left blank as requested
-        "Launch RRP": "",  # Left blank as requested
-        "Condition": get_condition_mapping(screen_condition),
-        "Value Type": "Trade-in",
-        "Currency": "SGD",
-        "Value": "",
-        "Source": "SG_RV_Source5",
-        "Updated on": datetime.now().strftime("%Y-%m-%d"),
-        "Updated by": "",  # Left blank as requested
-        "Comments": ""  # Left blank as requested
-    }
+    # Click device type button
+    click_device_type(driver, wait, device_type)
+
+    # Handle the terms & conditions popup
+    handle_popup(driver, wait)
+
+    # Select brand
+    select_dropdown_option(driver, "react-select-2-input", brand_index, wait, trade_in_data)
+    wait_for_dom_quiet(driver)
+
+    # Select model
+    select_dropdown_option(driver, "react-select-3-input", model_index, wait, trade_in_data)
+    wait_for_dom_quiet(driver)
+
+    # Select variant
+    select_dropdown_option(driver, "react-select-4-input", variant_index, wait, trade_in_data)
+    wait_for_dom_quiet(driver)
 
+    # Click next button
     try:
-        driver.get("https://m1tradein.compasia.com/?utm_source=website&utm_medium=cta&utm_campaign=new")
-        
-        # Click device type button
-        click_device_type(driver, wait, device_type)
-        time.sleep(2)
-        
-        # Handle the terms & conditions popup
-        handle_popup(driver, wait)
+        next_button = wait.until(EC.element_to_be_clickable(
+            (By.XPATH, "//button[contains(@class, 'progress-button-next') and not(@disabled)]")
+        ))
+        driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", next_button)
+        next_button.click()
+        print("Successfully clicked Next button")
+    except Exception as e:
+        print(f"Failed to click Next button: {e}")
+        driver.execute_script("""
+            var nextBtn = document.querySelector('button.progress-button-next:not([disabled])');
+            if (nextBtn) {
+                nextBtn.scrollIntoView({block: 'center'});
+                nextBtn.click();
+            }
+        """)
+        time.sleep(1)
 
-        # Select brand
-        select_dropdown_option(driver, "react-select-2-input", brand_index, wait, trade_in_data)
-        time.sleep(2)
-        
-        # Select model
-        select_dropdown_option(driver, "react-select-3-input", model_index, wait, trade_in_data)
-        time.sleep(2)
-        
-        # Select variant
-        select_dropdown_option(driver, "react-select-4-input", variant_index, wait, trade_in_data)
-        time.sleep(2)
+    # NEW CODE: Click Skip button on the new third page
+    wait_for_dom_quiet(driver)  # Wait for the third page to render
 
-        # Click next button
-        try:
-            next_button = wait.until(EC.element_to_be_clickable(
-                (By.XPATH, "//button[contains(@class, 'progress-button-next') and not(@disabled)]")
-            ))
-            driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", next_button)
-            next_button.click()
-            print("Successfully clicked Next button")
-        except Exception as e:
-            print(f"Failed to click Next button: {e}")
-            driver.execute_script("""
-                var nextBtn = document.querySelector('button.progress-button-next:not([disabled])');
-                if (nextBtn) {
-                    nextBtn.scrollIntoView({block: 'center'});
-                    nextBtn.click();
-                }
-            """)
-            time.sleep(1)
+    try:
+        # Use direct XPATH to the Skip button based on exact text and class
+        skip_button = wait.until(EC.element_to_be_clickable(
+            (By.XPATH, "//button[contains(@class, 'progress-button-next') and text()='Skip']")
+        ))
+        driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", skip_button)
+        time.sleep(1)  # Add a small pause before clicking
+        driver.execute_script("arguments[0].click();", skip_button)  # Click using JavaScript
+        print("Successfully clicked Skip button using direct XPATH")
+        wait_for_dom_quiet(driver)
+    except Exception as e:
+        print(f"Failed to click Skip button: {e}")
+        # Take a screenshot for debugging if the skip button click fails
+        driver.save_screenshot(f"skip_button_error_{device_type}_{brand_index}_{model_index}_{variant_index}.png")
 
-        time.sleep(2)
-        
-        # NEW CODE: Click Skip button on the new third page
-        time.sleep(3)  # Add longer pause to make sure page loads completely
-        
-        try:
-            # Use direct XPATH to the Skip button based on exact text and class
-            skip_button = wait.until(EC.element_to_be_clickable(
-                (By.XPATH, "//button[contains(@class, 'progress-button-next') and text()='Skip']")
-            ))
-            driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", skip_button)
-            time.sleep(1)  # Add a small pause before clicking
-            driver.execute_script("arguments[0].click();", skip_button)  # Click using JavaScript
-            print("Successfully clicked Skip button using direct XPATH")
-            time.sleep(2)  # Give more time after clicking
-        except Exception as e:
-            print(f"Failed to click Skip button: {e}")
-            # Take a screenshot for debugging if the skip button click fails
-            driver.save_screenshot(f"skip_button_error_{device_type}_{brand_index}_{model_index}_{variant_index}.png")
+    return True
 
-        time.sleep(2)
+def request_quote(driver, wait, screen_condition, full_form=True):
+    """Fill the diagnostic form for screen_condition and submit it.
+
+    When the form was already filled for this device only the screen condition radio is toggled.
+    """
+    screen_condition_id = f"LCDS-01-{screen_condition}"
 
+    if full_form:
         # Fill diagnostic form using JavaScript
         driver.execute_script(f"""
             function clickYesButton(labelText) {{
@@ -337,29 +333,29 @@ def navigate_and_complete_form(driver, wait, device_type, brand_index, model_ind
                     }}
                 }}
             }}
-            
+
             // Device locks
             clickYesButton('Is your device free of any locks');
-            
+
             // Screen condition
             var screenLabel = document.querySelector('label[for="{screen_condition_id}"]');
             if (screenLabel) {{
                 screenLabel.scrollIntoView({{block: 'center'}});
                 screenLabel.click();
             }}
-            
+
             // Body condition
             var bodyLabel = document.querySelector('label[for="DECO-01-flawless"]');
             if (bodyLabel) {{
                 bodyLabel.scrollIntoView({{block: 'center'}});
                 bodyLabel.click();
             }}
-            
+
             // Other conditions
             clickYesButton('Fingerprint/Face ID working');
             clickYesButton('device functions below working fine');
             clickYesButton('front and back cameras');
-            
+
             // None of the above checkbox
             var labels = document.querySelectorAll('label');
             for (var i = 0; i < labels.length; i++) {{
@@ -380,118 +376,125 @@ def navigate_and_complete_form(driver, wait, device_type, brand_index, model_ind
             }}
         """)
         time.sleep(2)
+    else:
+        if not select_screen_condition(driver, screen_condition):
+            return False
+        print(f"Switched screen condition to {screen_condition}")
+        time.sleep(1)
 
-        # Click Get Quote button
-        try:
-            quote_button = wait.until(EC.element_to_be_clickable(
-                (By.XPATH, "//button[@type='submit' and contains(text(), 'Get Quote')]")
-            ))
-            driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", quote_button)
-            time.sleep(0.5)
-            quote_button.click()
-            print("Clicked Get Quote button")
-        except Exception as e:
-            print(f"Failed to click Get Quote button: {e}")
-            driver.execute_script("""
-                var quoteBtn = document.querySelector('button[type="submit"]');
-                if (quoteBtn) {
-                    quoteBtn.scrollIntoView({block: 'center'});
-                    quoteBtn.click();
-                }
-            """)
-            time.sleep(1)
+    # Click Get Quote button
+    capture_for(driver, [QUOTE_API_PATTERN]).clear()
+    try:
+        quote_button = wait.until(EC.element_to_be_clickable(
+            (By.XPATH, "//button[@type='submit' and contains(text(), 'Get Quote')]")
+        ))
+        driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", quote_button)
+        time.sleep(0.5)
+        quote_button.click()
+        print("Clicked Get Quote button")
+    except Exception as e:
+        print(f"Failed to click Get Quote button: {e}")
+        driver.execute_script("""
+            var quoteBtn = document.querySelector('button[type="submit"]');
+            if (quoteBtn) {
+                quoteBtn.scrollIntoView({block: 'center'});
+                quoteBtn.click();
+            }
+        """)
+        time.sleep(1)
 
-        time.sleep(5)
+    return True
 
-        # Extract trade-in value
-        try:
-            wait.until(EC.visibility_of_element_located((By.CLASS_NAME, "pricing-display-table")))
-            
-            # Currency is set to SGD by default, but extract it if available
-            currency_element = driver.find_element(By.CLASS_NAME, "price-product-name.currency")
-            if currency_element:
-                currency = currency_element.text.strip()
-                if currency:
-                    trade_in_data["Currency"] = currency
-
-            # Extract the price
+def extract_trade_in_value(driver, wait, trade_in_data, output_file):
+    """Extract the trade-in value from the results page."""
+    try:
+        # The quote API answers before the pricing page renders
+        api_price = captured_price(driver, QUOTE_API_PATTERN)
+
+        # The sweep steps back from the pricing page, so it must be on screen either way
+        wait.until(EC.visibility_of_element_located((By.CLASS_NAME, "pricing-display-table")))
+
+        # Currency is set to SGD by default, but extract it if available
+        currency_element = driver.find_element(By.CLASS_NAME, "price-product-name.currency")
+        if currency_element:
+            currency = currency_element.text.strip()
+            if currency:
+                trade_in_data["Currency"] = currency
+
+        # Extract the price
+        if api_price is not None:
+            price_clean = str(api_price)
+        else:
             price_element = driver.find_element(By.CLASS_NAME, "pricing-display-price")
             price_text = price_element.text.strip() if price_element else ""
             price_clean = re.sub(r'[^0-9.]', '', price_text)
-            trade_in_data["Value"] = price_clean
+        trade_in_data["Value"] = price_clean
 
-            print(f"Extracted trade-in value: {trade_in_data['Currency']} {price_clean}")
-            save_to_excel(trade_in_data, output_file)
-            
-            return True
+        print(f"Extracted trade-in value: {trade_in_data['Currency']} {price_clean}")
+        save_to_excel(trade_in_data, output_file)
 
-        except Exception as e:
-            print(f"Failed to extract trade-in value: {e}")
-            driver.save_screenshot(f"error_{device_type}_{brand_index}_{model_index}_{variant_index}_{screen_condition}.png")
-            return False
+        return True
 
-    except Exception as main_error:
-        print(f"Main execution failed: {main_error}")
-        driver.save_screenshot(f"error_{device_type}_{brand_index}_{model_index}_{variant_index}_{screen_condition}.png")
+    except Exception as e:
+        print(f"Failed to extract trade-in value: {e}")
         return False
 
+def navigate_and_sweep_conditions(driver, wait, device_type, brand_index, model_index, variant_index, screen_conditions, output_file):
+    """Select a device variant once and price every screen condition on it.
+
+    Returns a dict mapping each screen condition to whether its value was saved.
+    """
+    print(f"Processing: {device_type}, Brand index {brand_index}, Model index {model_index}, Variant index {variant_index}, Screen conditions: {screen_conditions}")
+
+    # Initialize data dictionary with the required columns; Condition is set per sweep step
+    device_data = {
+        "Country": "Singapore",
+        "Device Type": device_type,
+        "Brand": "",
+        "Model": "",
+        "Capacity": "",
+        "Color": "",  # Left blank as requested
+        "Launch RRP": "",  # Left blank as requested
+        "Condition": "",
+        "Value Type": "Trade-in",
+        "Currency": "SGD",
+        "Value": "",
+        "Source": "SG_RV_Source5",
+        "Updated on": datetime.now().strftime("%Y-%m-%d"),
+        "Updated by": "",  # Left blank as requested
+        "Comments": ""  # Left blank as requested
+    }
+
+    def extract(screen_condition):
+        trade_in_data = dict(device_data)
+        trade_in_data["Condition"] = get_condition_mapping(screen_condition)
+        return extract_trade_in_value(driver, wait, trade_in_data, output_file)
+
+    sweep = ConditionSweep(
+        driver,
+        lambda: select_device_variant(driver, wait, device_type, brand_index, model_index, variant_index, device_data),
+        lambda screen_condition, full_form: request_quote(driver, wait, screen_condition, full_form),
+        extract
+    )
+    results = sweep.run(screen_conditions)
+    print(f"Priced {sum(results.values())}/{len(screen_conditions)} conditions with {sweep.full_navigations} full navigation(s)")
+
+    failed = [condition for condition, success in results.items() if not success]
+    if failed:
+        driver.save_screenshot(f"error_{device_type}_{brand_index}_{model_index}_{variant_index}_{'_'.join(failed)}.png")
+    return results
+
+def navigate_and_complete_form(driver, wait, device_type, brand_index, model_index, variant_index, screen_condition, output_file):
+    """Navigate the website and complete the form for a specific configuration."""
+    results = navigate_and_sweep_conditions(driver, wait, device_type, brand_index, model_index, variant_index, [screen_condition], output_file)
+    return results[screen_condition]
+
 def save_to_excel(data, output_file):
-    """Save the extracted trade-in data to an Excel file."""
-    # Ensure output directory exists
-    os.makedirs(os.path.dirname(output_file) if os.path.dirname(output_file) else ".", exist_ok=True)
-    
-    if os.path.exists(output_file):
-        try:
-            workbook = openpyxl.load_workbook(output_file)
-            sheet = workbook.active
-        except:
-            workbook = openpyxl.Workbook()
-            sheet = workbook.active
-            # Use the new column headers
-            headers = ["Country", "Device Type", "Brand", "Model", "Capacity", "Color", 
-                      "Launch RRP", "Condition", "Value Type", "Currency", "Value", 
-                      "Source", "Updated on", "Updated by", "Comments"]
-            sheet.append(headers)
-    else:
-        workbook = openpyxl.Workbook()
-        sheet = workbook.active
-        # Use the new column headers
-        headers = ["Country", "Device Type", "Brand", "Model", "Capacity", "Color", 
-                  "Launch RRP", "Condition", "Value Type", "Currency", "Value", 
-                  "Source", "Updated on", "Updated by", "Comments"]
-        sheet.append(headers)
-
-    # Add new row with all the required columns
-    row_data = [
-        data["Country"],
-        data["Device Type"],
-        data["Brand"],
-        data["Model"],
-        data["Capacity"],
-        data["Color"],
-        data["Launch RRP"],
-        data["Condition"],
-        data["Value Type"],
-        data["Currency"],
-        data["Value"],
-        data["Source"],
-        data["Updated on"],
-        data["Updated by"],
-        data["Comments"]
-    ]
-    sheet.append(row_data)
+    """Append the extracted trade-in data to the result sink for output_file.
 
-    try:
-        workbook.save(output_file)
-        print(f"Saved data to {output_file}")
-    except Exception as e:
-        print(f"Error saving Excel file: {e}")
-        alt_file_name = os.path.join(os.path.dirname(output_file), f"SG_RV_Source5.xlsx")
-        try:
-            workbook.save(alt_file_name)
-            print(f"Saved to {alt_file_name}")
-        except Exception as e2:
-            print(f"Could not save Excel file: {e2}")
+    Rows are journaled immediately; the Excel file is written once when the sink is closed.
+    """
+    get_sink(output_file).append(data)
 
 def process_device_type(device_type, n_scrape=None, driver=None, wait=None, output_file=None):
     """Process a specific device type (Smartphone or Tablet)."""
@@ -540,14 +543,13 @@ def process_device_type(device_type, n_scrape=None, driver=None, wait=None, outp
             # Navigate to the main page for each brand
             driver.get("https://m1tradein.compasia.com/?utm_source=website&utm_medium=cta&utm_campaign=new")
             click_device_type(driver, wait, device_type)
-            time.sleep(2)
             
             # Handle the terms & conditions popup
             handle_popup(driver, wait)
             
             # Select the brand
             select_dropdown_option(driver, "react-select-2-input", brand_idx, wait)
-            time.sleep(2)
+            wait_for_dom_quiet(driver)
             
             # Get available models for this brand
             model_options = get_dropdown_options(driver, "react-select-3-input")
@@ -558,18 +560,17 @@ def process_device_type(device_type, n_scrape=None, driver=None, wait=None, outp
                 # For each model, go back to the main page
                 driver.get("https://m1tradein.compasia.com/?utm_source=website&utm_medium=cta&utm_campaign=new")
                 click_device_type(driver, wait, device_type)
-                time.sleep(2)
                 
                 # Handle the terms & conditions popup
                 handle_popup(driver, wait)
                 
                 # Select brand again
                 select_dropdown_option(driver, "react-select-2-input", brand_idx, wait)
-                time.sleep(2)
+                wait_for_dom_quiet(driver)
                 
                 # Select model
                 select_dropdown_option(driver, "react-select-3-input", model_idx, wait)
-                time.sleep(2)
+                wait_for_dom_quiet(driver)
                 
                 # Get variants for this model
                 variant_options = get_dropdown_options(driver, "react-select-4-input")
@@ -577,24 +578,29 @@ def process_device_type(device_type, n_scrape=None, driver=None, wait=None, outp
                 print(f"Found {num_variants} variants for model index {model_idx}: {variant_options}")
                 
                 for variant_idx in range(num_variants):
-                    for condition in screen_conditions:
-                        print(f"\nStarting new configuration: {device_type}, Brand idx {brand_idx}, Model idx {model_idx}, Variant idx {variant_idx}, Condition: {condition}")
-                        result = navigate_and_complete_form(driver, wait, device_type, brand_idx, model_idx, variant_idx, condition, output_file)
-                        time.sleep(2)  # Brief pause between iterations
-                        
-                        # Increment the scrape counter
-                        scrape_count += 1
-                        
-                        # If there was an error, retry once
-                        if not result:
-                            print("Retrying after error...")
-                            navigate_and_complete_form(driver, wait, device_type, brand_idx, model_idx, variant_idx, condition, output_file)
-                            time.sleep(2)
-                            
-                        # Check if we've reached the requested number of scrapes
-                        if n_scrape is not None and scrape_count >= n_scrape:
-                            print(f"Completed {scrape_count} scrapes as requested. Stopping.")
-                            return scrape_count
+                    # Sweep all screen conditions on one device selection
+                    conditions = screen_conditions
+                    if n_scrape is not None:
+                        conditions = screen_conditions[:n_scrape - scrape_count]
+                    
+                    print(f"\nStarting new configuration: {device_type}, Brand idx {brand_idx}, Model idx {model_idx}, Variant idx {variant_idx}, Conditions: {conditions}")
+                    results = navigate_and_sweep_conditions(driver, wait, device_type, brand_idx, model_idx, variant_idx, conditions, output_file)
+                    time.sleep(2)  # Brief pause between iterations
+                    
+                    # Increment the scrape counter
+                    scrape_count += len(conditions)
+                    
+                    # If there was an error, retry the failed conditions once
+                    failed = [condition for condition, success in results.items() if not success]
+                    if failed:
+                        print("Retrying after error...")
+                        navigate_and_sweep_conditions(driver, wait, device_type, brand_idx, model_idx, variant_idx, failed, output_file)
+                        time.sleep(2)
+                    
+                    # Check if we've reached the requested number of scrapes
+                    if n_scrape is not None and scrape_count >= n_scrape:
+                        print(f"Completed {scrape_count} scrapes as requested. Stopping.")
+                        return scrape_count
 
         return scrape_count
 
@@ -648,6 +654,7 @@ def main_loop(n_scrape=None, output_file=None):
         driver.save_screenshot("main_loop_error.png")
     finally:
         driver.quit()
+        close_sink(output_file)
         print("Browser closed. Process complete.")
 
 if __name__ == "__main__":
@@ -656,4 +663,6 @@ if __name__ == "__main__":
     parser.add_argument('-o', '--output', type=str, help='Output Excel file path', default=None)
     args = parser.parse_args()
     
+    enable_sleep_budget()
+    
     main_loop(args.n, args.output)
\ No newline at end of file
@@ -11,6 +11,14 @@ from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.resource_blocking import apply_resource_blocking
+from common.replay import configure_proxy
+from common.device_catalog import brand_of, device_type_of
+from common.result_channel import write_excel
+from common.waits import enable_sleep_budget
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -32,7 +40,9 @@ def setup_driver(debug=False):
     chrome_options.add_argument("--window-size=1920,1080")
     chrome_options.add_argument("user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
     
+    configure_proxy(chrome_options)
     driver = webdriver.Chrome(options=chrome_options)
+    apply_resource_blocking(driver, "SG_RV_Source6")
     return driver
 
 def get_device_list(driver, limit=None):
@@ -59,44 +69,8 @@ def get_device_list(driver, limit=None):
             device_name = option.text.strip()
             
             if device_name:
-                # Enhanced device type detection
-                device_name_lower = device_name.lower()
-                
-                # Determine device type based on keywords
-                if any(keyword in device_name_lower for keyword in ["ipad", "tab", "tablet"]):
-                    device_type = "Tablet"
-                elif any(keyword in device_name_lower for keyword in ["macbook", "laptop", "notebook", "imac", "mac mini", "mac pro"]):
-                    device_type = "Laptop"
-                elif any(keyword in device_name_lower for keyword in ["watch", "galaxy watch", "apple watch"]):
-                    device_type = "SmartWatch"
-                elif any(keyword in device_name_lower for keyword in ["airpod", "earpod", "earphone", "headphone", "buds"]):
-                    device_type = "Airpods"
-                elif any(keyword in device_name_lower for keyword in ["tv", "television"]):
-                    device_type = "TV"
-                else:
-                    # Default to Smartphone for other devices
-                    device_type = "SmartPhone"
-                
-                # Determine brand
-                brand = "Unknown"
-                if "apple" in device_name_lower or any(keyword in device_name_lower for keyword in ["iphone", "ipad", "macbook", "airpod", "apple watch"]):
-                    brand = "Apple"
-                elif "samsung" in device_name_lower:
-                    brand = "Samsung"
-                elif "xiaomi" in device_name_lower:
-                    brand = "Xiaomi"
-                elif "oppo" in device_name_lower:
-                    brand = "OPPO"
-                elif "google" in device_name_lower:
-                    brand = "Google"
-                elif "honor" in device_name_lower:
-                    brand = "Honor"
-                elif "nothing" in device_name_lower:
-                    brand = "Nothing"
-                elif "huawei" in device_name_lower:
-                    brand = "Huawei"
-                elif "sony" in device_name_lower:
-                    brand = "Sony"
+                device_type = device_type_of(device_name)
+                brand = brand_of(device_name)
                 
                 logger.info(f"Found device: {device_name} (Type: {device_type}, Brand: {brand})")
                 devices.append({
@@ -273,7 +247,7 @@ def save_results(results, filename='SG_RV_Source6.xlsx'):
             existing_df = pd.read_excel(output_path)
             df = pd.concat([existing_df, df], ignore_index=True)
         
-        df.to_excel(output_path, index=False)
+        write_excel(df, output_path)
         logger.info(f"Results saved to {output_path}")
         
     except Exception as e:
@@ -310,4 +284,5 @@ def main():
         logger.info("Driver closed")
 
 if __name__ == "__main__":
+    enable_sleep_budget()
     main()
\ No newline at end of file
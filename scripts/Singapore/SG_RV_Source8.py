@@ -22,7 +22,20 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException
 import pandas as pd
 import logging
-import threading
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.device_catalog import device_type_of
+from common.network_capture import capture_for, captured_price, enable_performance_log
+from common.resource_blocking import apply_resource_blocking
+from common.replay import configure_proxy
+from common.watchdog import Watchdog, format_operation_stats
+from common.result_channel import write_excel
+from common.result_sink import get_sink, close_sink
+from common.waits import enable_sleep_budget, wait_for_dom_quiet, wait_for_page_ready
+
+# Buyback API the quote step is assumed to read its offer from (not yet observed;
+# only used with NETWORK_PRICES=1)
+PRICE_API_PATTERN = r"reebelo\.(sg|com)/.*(quote|price|offer)"
 
 # Set up logging
 logging.basicConfig(
@@ -60,7 +73,12 @@ def setup_driver():
     # Standard user agent
     chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.212 Safari/537.36")
     
+    # Network events, so offers can be read from the buyback API response
+    enable_performance_log(chrome_options)
+    
+    configure_proxy(chrome_options)
     driver = webdriver.Chrome(options=chrome_options)
+    apply_resource_blocking(driver, "SG_RV_Source8")
     
     # Set very short timeouts to prevent long waits
     driver.set_page_load_timeout(10)
@@ -111,27 +129,26 @@ def fast_find_elements(driver, by, value, timeout=1):
     except:
         return []
 
-def threaded_page_timeout_handler(driver):
-    """Run in a separate thread to ensure the browser continues after timeout."""
-    time.sleep(5)  # Wait for max timeout
-    try:
-        # Force stop page loading if it's still loading
-        driver.execute_script("window.stop();")
-    except:
-        pass
+# Stops page loads that are still running after 5 seconds; one monitor thread for the whole run
+page_watchdog = Watchdog(timeout=5)
+
+def stop_page_load(driver):
+    """Return a watchdog handler that stops loading in driver so the scraper continues with the partial page."""
+    def stop(operation_name, elapsed):
+        try:
+            driver.execute_script("window.stop();")
+        except:
+            pass
+    return stop
 
 def safe_get(driver, url, max_retries=2):
     """Navigate to URL with smart error handling and forced continuation."""
     logger.debug(f"DEBUG: Attempting to navigate to {url}")
     for attempt in range(max_retries):
         try:
-            # Start a timeout handler thread
-            timeout_thread = threading.Thread(target=threaded_page_timeout_handler, args=(driver,))
-            timeout_thread.daemon = True
-            timeout_thread.start()
-            
-            # Try to navigate
-            driver.get(url)
+            # Try to navigate; the watchdog stops the load if it is still running after its deadline
+            with page_watchdog.operation("page_load", on_timeout=stop_page_load(driver)):
+                driver.get(url)
             logger.debug(f"DEBUG: Successfully navigated to {url}")
             return True
         except TimeoutException:
@@ -286,17 +303,8 @@ def save_debug_html(driver, model_name, storage, condition):
         logger.debug(f"DEBUG: Failed to save HTML: {e}")
 
 def determine_device_type(model_name):
-    """Determine the device type based on the model name."""
-    model_lower = model_name.lower()
-    
-    if any(keyword in model_lower for keyword in ['watch', 'watch series']):
-        return 'SmartWatch'
-    elif any(keyword in model_lower for keyword in ['macbook', 'mac book']):
-        return 'Laptop'
-    elif any(keyword in model_lower for keyword in ['airpod', 'air pod']):
-        return 'Airpods'
-    
-    return None  # Return None if no specific device type is detected
+    """Determine the device type from the model name, or None if it names no specific type."""
+    return device_type_of(model_name, default=None)
 
 def standardize_device_type(device_type):
     """Standardize device type names."""
@@ -316,8 +324,9 @@ def scrape_models(driver, max_models=None):
     """Scrape model links from the current page."""
     logger.info("Scraping model links...")
     
-    # Wait a bit longer to ensure page is loaded
-    time.sleep(3)
+    # Wait until the page is loaded and the model list has rendered
+    wait_for_page_ready(driver)
+    wait_for_dom_quiet(driver)
     
     model_selectors = [
         "//ul[contains(@class, 'flex flex-wrap')]/li/a",
@@ -398,7 +407,7 @@ def process_device_condition(driver, model_name, storage_text, condition):
         return None
     
     # Wait after clicking the screen condition
-    time.sleep(2)
+    wait_for_dom_quiet(driver)
     
     # Find and click "Flawless" for housing - try just once
     housing_selectors = [
@@ -411,7 +420,7 @@ def process_device_condition(driver, model_name, storage_text, condition):
         if housing_element:
             safe_click(driver, housing_element)
             # Wait after clicking housing condition
-            time.sleep(2)
+            wait_for_dom_quiet(driver)
             break
     
     # Select Local Singapore Set if available - quick check only
@@ -419,7 +428,7 @@ def process_device_condition(driver, model_name, storage_text, condition):
     if local_set_element:
         safe_click(driver, local_set_element)
         # Wait after clicking Local Singapore Set
-        time.sleep(2)
+        wait_for_dom_quiet(driver)
     
     # Check for warranty question and select "No" if present
     warranty_yes_selector = "//p[contains(text(), 'original warranty')]/ancestor::div[contains(@class, 'cus-yes-no')]/descendant::li[contains(text(), 'No')]"    
@@ -428,7 +437,7 @@ def process_device_condition(driver, model_name, storage_text, condition):
         logger.info("Found warranty question, selecting 'No'")
         safe_click(driver, warranty_yes_element)
         # Wait after clicking warranty option
-        time.sleep(2)
+        wait_for_dom_quiet(driver)
     
     # Check if the button is still disabled
     disabled_button = fast_find_element(driver, By.XPATH, "//button[@disabled]", timeout=0.5)
@@ -446,7 +455,7 @@ def process_device_condition(driver, model_name, storage_text, condition):
                 logger.info("Found battery health question, selecting highest option")
                 safe_click(driver, battery_element)
                 # Wait after clicking battery health option
-                time.sleep(2)
+                wait_for_dom_quiet(driver)
                 break
     
     # Click "Get Your Quote" button - try multiple selectors
@@ -487,7 +496,7 @@ def process_device_condition(driver, model_name, storage_text, condition):
                     logger.info(f"Clicking on unselected option: {element.text}")
                     safe_click(driver, element)
                     # Wait after clicking
-                    time.sleep(2)
+                    wait_for_dom_quiet(driver)
                     
                     # Check if the button is now enabled after this click
                     new_button = fast_find_element(driver, By.XPATH, "//button[contains(text(), 'Get Your Quote')]")
@@ -500,6 +509,7 @@ def process_device_condition(driver, model_name, storage_text, condition):
     
     # Try clicking the button if it's not disabled
     if not quote_button.get_attribute("disabled"):
+        capture_for(driver, [PRICE_API_PATTERN]).clear()
         if not safe_click(driver, quote_button):
             logger.warning("Still cannot click quote button, skipping")
             return None
@@ -507,12 +517,13 @@ def process_device_condition(driver, model_name, storage_text, condition):
         logger.warning("Quote button still disabled after trying all options, skipping")
         return None
     
-    # Wait for price to load
-    time.sleep(3)
-    
-    # Extract price from page content
-    page_text = driver.page_source
-    price_value = extract_price_from_text(page_text)
+    # Read the offer from the buyback API, falling back to the rendered page
+    api_price = captured_price(driver, PRICE_API_PATTERN)
+    if api_price is not None:
+        price_value = f"S${api_price}"
+    else:
+        time.sleep(3)
+        price_value = extract_price_from_text(driver.page_source)
     
     # Standardize the condition for output
     standardized_condition = standardize_condition(condition)
@@ -594,13 +605,13 @@ def process_all_conditions_efficiently(driver, model_url, model_name):
                     logger.warning(f"No storage options found, reloading page (attempt {attempt+1}/3)")
                     if not safe_get(driver, model_url):
                         break
-                    time.sleep(2)  # Wait for page to reload
+                    wait_for_page_ready(driver)
         except Exception as e:
             logger.error(f"Error finding storage options (attempt {attempt+1}): {e}")
             if attempt < 2:
                 if not safe_get(driver, model_url):
                     break
-                time.sleep(2)
+                wait_for_page_ready(driver)
     
     # If we still couldn't find any storage options, return empty results
     if not storage_texts:
@@ -618,7 +629,7 @@ def process_all_conditions_efficiently(driver, model_url, model_name):
                 if not safe_get(driver, model_url):
                     logger.warning(f"Failed to load page for {storage_text} + {condition}, skipping")
                     continue
-                time.sleep(2)  # Wait for page to load
+                wait_for_page_ready(driver)
                 
                 # Select the storage option - using more targeted selector
                 storage_selected = False
@@ -630,7 +641,7 @@ def process_all_conditions_efficiently(driver, model_url, model_name):
                                 if element.text.strip() == storage_text:
                                     logger.info(f"Selecting storage: {storage_text}")
                                     if safe_click(driver, element):
-                                        time.sleep(2)
+                                        wait_for_dom_quiet(driver)
                                         storage_selected = True
                                         break
                             except Exception as e:
@@ -663,25 +674,10 @@ def process_all_conditions_efficiently(driver, model_url, model_name):
     return results
 
 def update_excel_file(new_data, output_file):
-    """Update Excel file with new data, creating it if needed."""
+    """Append one record to the output file's result sink; the .xlsx is written once at the end."""
     try:
-        # Check if file exists and load it
-        if os.path.exists(output_file):
-            try:
-                existing_df = pd.read_excel(output_file)
-                # Append new data
-                updated_df = pd.concat([existing_df, pd.DataFrame([new_data])], ignore_index=True)
-            except Exception as e:
-                logger.warning(f"Could not read existing Excel file: {e}")
-                # Create new dataframe if file can't be read
-                updated_df = pd.DataFrame([new_data])
-        else:
-            # Create new dataframe if file doesn't exist
-            updated_df = pd.DataFrame([new_data])
-        
-        # Save the updated dataframe
-        updated_df.to_excel(output_file, index=False)
-        logger.debug(f"Updated Excel file with new data: {output_file}")
+        get_sink(output_file).append(new_data)
+        logger.debug(f"Appended new data for: {output_file}")
         return True
     except Exception as e:
         logger.error(f"Failed to update Excel file: {e}")
@@ -805,11 +801,11 @@ def main():
     
     # Create an empty Excel file if it doesn't exist
     if not os.path.exists(output_file):
-        pd.DataFrame(columns=[
+        write_excel(pd.DataFrame(columns=[
             "Country", "Device Type", "Brand", "Model", "Capacity", "Color", 
             "Launch RRP", "Condition", "Value Type", "Currency", "Value", 
             "Source", "Updated on", "Updated by", "Comments", "URL"
-        ]).to_excel(output_file, index=False)
+        ]), output_file)
         logger.info(f"Created new Excel file: {output_file}")
     
     # Setup driver
@@ -839,7 +835,10 @@ def main():
         logger.error(f"Error during scraping: {e}")
     finally:
         driver.quit()
+        close_sink(output_file)
+        logger.info(format_operation_stats())
         logger.info("Script completed")
 
 if __name__ == "__main__":
+    enable_sleep_budget()
     main()
\ No newline at end of file
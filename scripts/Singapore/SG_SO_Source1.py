@@ -1,6 +1,7 @@
 """
 Enhanced Carousell scraper with freeze detection, recovery mechanism, and smart skipping.
 - Detects browser freezes and restarts the browser if needed
+- Can process listings with several browser workers (-w), each with its own watchdog
 - Intelligently skips already processed devices (checks at model level for efficiency)
 - Implements timeout mechanism to prevent hanging
 - Provides detailed statistics on processing results
@@ -14,13 +15,25 @@ import sys
 import traceback
 import argparse
 import re
-import threading
-import signal
-from selenium.common.exceptions import TimeoutException, StaleElementReferenceException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.driver_pool import DriverPool
+from common.browser_session import BrowserSession
+from common.fanout import fan_out_sessions, site_worker_limit
+from common.watchdog import format_operation_stats
+from common.dom import extract_hrefs, find_element_by_text
+from common.waits import enable_sleep_budget, wait_for_dom_quiet, wait_for_element_count_stable
+from common.resource_blocking import apply_resource_blocking
+from common.replay import configure_proxy
+from common.device_catalog import brand_of, device_type_of
+from common.model_index import ModelIndex
+from common.result_channel import write_excel
+from common.result_sink import get_sink, close_sink, read_journal, read_source_file
+
 # Parse command line arguments
 parser = argparse.ArgumentParser(description='Scrape device prices from Carousell')
 parser.add_argument('-n', '--num_devices', type=int, default=0, 
@@ -29,6 +42,8 @@ parser.add_argument('-r', '--resume', action='store_true',
                     help='Resume from last processed URL if available')
 parser.add_argument('-f', '--force', action='store_true',
                     help='Force processing all devices even if they already exist in the Excel file')
+parser.add_argument('-w', '--workers', type=int, default=1,
+                    help='Number of browser workers processing listings in parallel (default: 1)')
 args = parser.parse_args()
 
 # First, ensure undetected-chromedriver is installed
@@ -55,60 +70,16 @@ excel_file = os.path.join(output_dir, f'SG_SO_Source1.xlsx')
 
 # Base URL for Carousell Singapore
 BASE_URL = "https://www.carousell.sg"
-
-# Global variables for timeout handling
-current_operation = "idle"
-operation_start_time = None
-driver = None
-is_frozen = False
-
-# Watchdog timer for detecting freezes
-def watchdog_timer():
-    global is_frozen, current_operation, operation_start_time, driver
-    
-    while True:
-        if current_operation != "idle" and operation_start_time is not None:
-            elapsed_time = time.time() - operation_start_time
-            
-            if elapsed_time > 30:  # 30 seconds timeout
-                print(f"⚠️ TIMEOUT DETECTED: Operation '{current_operation}' is taking too long!")
-                is_frozen = True
-                
-                # Attempt to terminate the driver
-                try:
-                    if driver is not None:
-                        print("Terminating frozen browser...")
-                        driver.quit()
-                        driver = None
-                except:
-                    print("Error terminating driver")
-                
-                # Reset operation state
-                current_operation = "idle"
-                operation_start_time = None
-                
-                # Exit the watchdog loop
-                break
-                
-        time.sleep(1)
-
-# Start a new operation with timeout monitoring
-def start_operation(operation_name):
-    global current_operation, operation_start_time
-    current_operation = operation_name
-    operation_start_time = time.time()
-    print(f"Starting operation: {operation_name}")
-
-# End the current operation
-def end_operation():
-    global current_operation, operation_start_time
-    current_operation = "idle"
-    operation_start_time = None
+# Listing links that point at a device page
+DEVICE_LINK_SELECTOR = "a[href*='viewing_mode=0']"
 
 # Initialize or load Excel file with columns matching CompAsia format
 def load_excel_file():
     try:
-        df = pd.read_excel(excel_file)
+        # Rows an interrupted run left in the result sink's journal count as already scraped
+        df = read_source_file(excel_file)
+        if df is None:
+            raise FileNotFoundError(excel_file)
         print(f"Loaded existing file: {excel_file}")
         
         # Check and add any missing columns to match CompAsia format
@@ -157,12 +128,15 @@ def setup_driver():
     options.add_argument('--disable-extensions')
     options.add_argument('--disable-infobars')
     
+    configure_proxy(options)
+    
     # Create driver with undetected_chromedriver and specify version
     driver = uc.Chrome(
         options=options,
         version_main=135,  # Match your current Chrome version 135
         headless=False      # Also set the headless parameter here for undetected_chromedriver
     )
+    apply_resource_blocking(driver, "SG_SO_Source1")
     
     driver.set_page_load_timeout(30)
     
@@ -196,25 +170,7 @@ def extract_storage_from_text(text):
 
 def extract_brand_from_device(device_name):
     """Extract brand from device name"""
-    known_brands = [
-        "Apple", "Samsung", "Huawei", "Xiaomi", "Oppo", "Vivo", 
-        "Google", "OnePlus", "Sony", "LG", "Motorola", "Nokia", 
-        "Realme", "Asus", "Poco", "Redmi", "Infinix", "Nothing", "Honor"
-    ]
-    
-    for brand in known_brands:
-        if brand.lower() in device_name.lower():
-            return brand
-    
-    # Special cases
-    if "iphone" in device_name.lower() or "ipad" in device_name.lower():
-        return "Apple"
-    if "galaxy" in device_name.lower():
-        return "Samsung"
-    if "pixel" in device_name.lower():
-        return "Google"
-    
-    return "Unknown"  # Default if no brand detected
+    return brand_of(device_name)
 
 def extract_model_from_device(device_name, brand):
     """Extract model from device name by removing the brand if present"""
@@ -230,27 +186,6 @@ def extract_product_id(url):
         return match.group(0)
     return None
 
-def check_if_model_exists(df, model):
-    """Check if a specific device model has already been processed"""
-    if df.empty:
-        return False
-    
-    # Clean up the model string for comparison by removing extra spaces and common punctuation
-    clean_model = model.strip().lower()
-    clean_model = re.sub(r'[\s\-\(\)]+', ' ', clean_model).strip()
-    
-    # Compare with each model in the dataframe using a similar cleaning process
-    for existing_model in df['Model'].dropna():
-        clean_existing = existing_model.strip().lower()
-        clean_existing = re.sub(r'[\s\-\(\)]+', ' ', clean_existing).strip()
-        
-        # If there's a match, return True
-        if clean_model == clean_existing:
-            return True
-            
-    # If we reached here, no match was found
-    return False
-
 def safe_find_element(driver, by, value, timeout=5):
     """Safely find an element with timeout"""
     try:
@@ -279,15 +214,8 @@ def click_load_more_button(driver, max_clicks=30):
                 EC.presence_of_element_located((By.TAG_NAME, "button"))
             )
             
-            # Find all buttons
-            buttons = driver.find_elements(By.TAG_NAME, "button")
-            for button in buttons:
-                try:
-                    if "Load more" in button.text:
-                        load_more_button = button
-                        break
-                except StaleElementReferenceException:
-                    continue
+            # Find the button by its text in a single script call
+            load_more_button = find_element_by_text(driver, "button", "Load more")
         except Exception as e:
             print(f"Error searching for Load More button: {e}")
         
@@ -296,19 +224,15 @@ def click_load_more_button(driver, max_clicks=30):
             break
         
         # Record the current number of products
-        current_links = driver.find_elements(By.TAG_NAME, "a")
+        current_links = extract_hrefs(driver)
         product_count_before = len(product_ids)
         
         # Find new product links
-        for link in current_links:
-            try:
-                href = link.get_attribute("href")
-                if href and ("/certified-used-phone-l/" in href or "iphone" in href.lower()) and "viewing_mode=0" in href:
-                    product_id = extract_product_id(href)
-                    if product_id:
-                        product_ids.add(product_id)
-            except:
-                continue
+        for href in current_links:
+            if ("/certified-used-phone-l/" in href or "iphone" in href.lower()) and "viewing_mode=0" in href:
+                product_id = extract_product_id(href)
+                if product_id:
+                    product_ids.add(product_id)
         
         print(f"Current unique products: {len(product_ids)}")
         
@@ -328,7 +252,7 @@ def click_load_more_button(driver, max_clicks=30):
         click_count += 1
         
         # Wait for new content to load
-        time.sleep(3)
+        wait_for_element_count_stable(driver, DEVICE_LINK_SELECTOR, stable_ms=1500, timeout=10)
         
         # Check if we got new products
         new_count = len(product_ids) - product_count_before
@@ -353,33 +277,26 @@ def find_device_links(driver):
     unique_product_ids = set()
     
     # Wait for content to load
-    time.sleep(5)
+    wait_for_element_count_stable(driver, DEVICE_LINK_SELECTOR, stable_ms=1500, timeout=10)
     
-    # Find all links
-    links = driver.find_elements(By.TAG_NAME, "a")
+    # Find all links in one script call
+    links = extract_hrefs(driver)
     print(f"Found {len(links)} total links on the page")
     
     # Filter for device links using the pattern from scrape.py
-    for link in links:
-        try:
-            href = link.get_attribute("href")
-            if not href:
-                continue
+    for href in links:
+        # Use the key patterns from scrape.py that work well
+        if ("/certified-used-phone-l/" in href or "iphone" in href.lower()) and "viewing_mode=0" in href:
+            # Extract product ID to avoid duplicates
+            product_id = extract_product_id(href)
+            if product_id and product_id not in unique_product_ids:
+                unique_product_ids.add(product_id)
                 
-            # Use the key patterns from scrape.py that work well
-            if ("/certified-used-phone-l/" in href or "iphone" in href.lower()) and "viewing_mode=0" in href:
-                # Extract product ID to avoid duplicates
-                product_id = extract_product_id(href)
-                if product_id and product_id not in unique_product_ids:
-                    unique_product_ids.add(product_id)
+                # Convert relative URL to absolute URL if needed
+                if href.startswith('/'):
+                    href = BASE_URL + href
                     
-                    # Convert relative URL to absolute URL if needed
-                    if href.startswith('/'):
-                        href = BASE_URL + href
-                        
-                    valid_links.append(href)
-        except Exception as e:
-            continue
+                valid_links.append(href)
     
     print(f"Found {len(valid_links)} valid device links")
     return valid_links
@@ -674,9 +591,9 @@ def get_last_processed_url():
                 return url
     return None
 
-def process_device_listing(driver, url, df):
-    """Process a device listing page directly"""
-    global is_frozen
+def process_device_listing(session, url, model_index):
+    """Process a device listing page directly in a browser session"""
+    driver = session.driver
     device_data = []
     
     try:
@@ -688,32 +605,32 @@ def process_device_listing(driver, url, df):
             
         print(f"Navigating to: {full_url}")
         try:
-            start_operation("navigate_to_url")
+            session.start_operation("navigate_to_url")
             driver.get(full_url)
-            end_operation()
+            session.end_operation()
             
             # If we got here, the browser didn't freeze
-            time.sleep(5)  # Wait for page to load
+            wait_for_dom_quiet(driver, quiet_ms=1000, timeout=5)  # Wait for page to load
         except TimeoutException:
             print("Page load timed out, but continuing anyway")
             driver.execute_script("window.stop();")  # Stop page loading
         except Exception as e:
             print(f"Error navigating to URL: {e}")
-            if is_frozen:
+            if session.is_frozen:
                 print("Browser freeze detected, restarting...")
-                is_frozen = False
+                session.is_frozen = False
                 return []  # Return empty to trigger retry
         
         # Check if browser froze during operation
-        if is_frozen:
+        if session.is_frozen:
             print("Browser freeze detected, restarting...")
-            is_frozen = False
+            session.is_frozen = False
             return []
         
         # Get device name
-        start_operation("get_page_title")
+        session.start_operation("get_page_title")
         device_name = get_page_title(driver)
-        end_operation()
+        session.end_operation()
         print(f"Processing device: {device_name}")
         
         # Extract brand from device name
@@ -723,42 +640,40 @@ def process_device_listing(driver, url, df):
         model = extract_model_from_device(device_name, brand)
         
         # Check if this model already exists in the Excel file (unless force flag is set)
-        if not args.force and check_if_model_exists(df, model):
+        if not args.force and model in model_index:
             print(f"📋 Model '{model}' already exists in the Excel file. Skipping this device completely.")
-            # Save the URL as processed even though we're skipping it
-            save_last_processed_url(url)
             # Return a special flag for stats tracking
             return ["SKIPPED_EXISTING_MODEL"]
         
         # Determine device type
-        device_type = "Tablet" if any(keyword in device_name.lower() for keyword in ["ipad", "tab", "tablet"]) else "SmartPhone"
+        device_type = device_type_of(device_name)
         
         # Get device color
         color = get_device_color(driver)
         
         # Get initial price
-        start_operation("get_initial_price")
+        session.start_operation("get_initial_price")
         initial_price = get_price(driver)
-        end_operation()
+        session.end_operation()
         
         if not initial_price:
             print("Could not find price. Skipping device.")
             return []
         
         # Get storage options
-        start_operation("find_storage_options")
+        session.start_operation("find_storage_options")
         storage_options = find_storage_options(driver)
-        end_operation()
+        session.end_operation()
         
         # Get condition options
-        start_operation("find_condition_options")
+        session.start_operation("find_condition_options")
         condition_options = find_condition_options(driver)
-        end_operation()
+        session.end_operation()
         
         # Check if browser froze during operations
-        if is_frozen:
+        if session.is_frozen:
             print("Browser freeze detected, restarting...")
-            is_frozen = False
+            session.is_frozen = False
             return []
         
         # Process all combinations of storage and condition
@@ -778,20 +693,20 @@ def process_device_listing(driver, url, df):
             if storage_button:
                 try:
                     print(f"Clicking on storage: {storage_text}")
-                    start_operation(f"click_storage_{storage_text}")
+                    session.start_operation("click_storage")
                     driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", storage_button)
                     time.sleep(0.5)
                     driver.execute_script("arguments[0].click();", storage_button)
-                    end_operation()
+                    session.end_operation()
                     time.sleep(2)  # Wait for page to update
                 except Exception as e:
                     print(f"Error clicking storage button: {e}")
-                    end_operation()
+                    session.end_operation()
             
             # Get current price after storage selection (might have changed)
-            start_operation("get_price_after_storage")
+            session.start_operation("get_price_after_storage")
             current_price = get_price(driver) or initial_price
-            end_operation()
+            session.end_operation()
             
             for condition_option in condition_options:
                 condition_text = condition_option["value"]
@@ -807,25 +722,25 @@ def process_device_listing(driver, url, df):
                 if condition_button:
                     try:
                         print(f"Clicking on condition: {condition_text}")
-                        start_operation(f"click_condition_{condition_text}")
+                        session.start_operation("click_condition")
                         driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", condition_button)
                         time.sleep(0.5)
                         driver.execute_script("arguments[0].click();", condition_button)
-                        end_operation()
+                        session.end_operation()
                         time.sleep(2)  # Wait for page to update
                     except Exception as e:
                         print(f"Error clicking condition button: {e}")
-                        end_operation()
+                        session.end_operation()
                         # If we had an error, check if browser froze
-                        if is_frozen:
+                        if session.is_frozen:
                             print("Browser freeze detected, restarting...")
-                            is_frozen = False
+                            session.is_frozen = False
                             return []
                 
                 # Get price after condition selection
-                start_operation("get_final_price")
+                session.start_operation("get_final_price")
                 final_price = get_price(driver) or current_price
-                end_operation()
+                session.end_operation()
                 
                 # Don't add if we couldn't get a price
                 if not final_price:
@@ -865,9 +780,6 @@ def process_device_listing(driver, url, df):
                 else:
                     print(f"Skipping duplicate entry: {capacity_display} - {mapped_condition}")
         
-        # Save the last successfully processed URL
-        save_last_processed_url(url)
-        
         return device_data
     
     except Exception as e:
@@ -875,52 +787,85 @@ def process_device_listing(driver, url, df):
         traceback.print_exc()
         
         # Check if the browser froze
-        if is_frozen:
+        if session.is_frozen:
             print("Browser freeze detected during exception, restarting...")
-            is_frozen = False
+            session.is_frozen = False
             return []
             
         return []
 
-def restart_browser():
-    """Restart the browser completely"""
-    global driver
-    
-    print("🔄 Restarting browser...")
+def scrape_url(session, card_url, model_index, max_retries=3):
+    """Process one listing URL with retries, restarting the session's browser if it freezes"""
+    device_data = []
+    retry_count = 0
     
-    # Clean up old driver if it exists
-    try:
-        if driver is not None:
-            driver.quit()
-    except:
-        print("Error closing old driver")
+    while retry_count < max_retries:
+        try:
+            # Check if browser is still responsive before processing
+            if session.needs_restart:
+                print("Browser needs to be restarted before processing")
+                session.restart()
+            
+            # Process the device
+            device_data = process_device_listing(session, card_url, model_index)
+            
+            # If browser froze during processing, retry
+            if session.needs_restart:
+                print("Browser froze during processing, retrying...")
+                session.restart()
+                retry_count += 1
+                continue
+            
+            # Consider success only if we got data and no freeze occurred
+            if device_data:
+                return device_data
+            print("No data extracted, considering as failure")
+            retry_count += 1
+        except Exception as e:
+            retry_count += 1
+            print(f"Error processing device (attempt {retry_count}/{max_retries}): {e}")
+            
+            # Check if browser froze
+            if session.needs_restart:
+                print("Browser froze during exception, restarting...")
+                session.restart()
+            
+            if retry_count < max_retries:
+                print("Retrying after a short delay...")
+                time.sleep(5)
     
-    # Create a new driver
+    return device_data
+
+def open_worker_session(pool, name):
+    """Start another browser session and let it pass the Cloudflare check before it gets listings"""
+    session = BrowserSession(pool, name)
     try:
-        driver = setup_driver()
-        print("Browser restarted successfully")
-        return driver
+        session.start_operation("open_base_url")
+        session.driver.get(BASE_URL)
+        session.end_operation()
+        handle_cloudflare(session.driver)
     except Exception as e:
-        print(f"Error restarting browser: {e}")
-        # Emergency sleep to allow system to recover
-        time.sleep(30)
-        driver = setup_driver()
-        return driver
+        session.end_operation()
+        print(f"Error opening {BASE_URL} in {name}: {e}")
+    return session
 
 def main():
     """Main function to scrape device prices"""
-    global driver, is_frozen
-    
     # Load Excel file
-    df = load_excel_file()
+    model_index = ModelIndex(load_excel_file())
     
-    # Setup driver
+    # Workers append their rows to one shared sink; the .xlsx is written once at the end
+    sink = get_sink(excel_file)
+    replaced = False
+    
+    # Setup driver pool: one browser per worker plus one warm spare
+    workers = site_worker_limit(BASE_URL, args.workers)
     print("Setting up undetected ChromeDriver...")
-    driver = setup_driver()
+    pool = DriverPool(setup_driver, size=workers, spares=1, serial_launch=True)
     
-    # Start the watchdog thread
-    watchdog_thread = threading.Thread(target=watchdog_timer, daemon=True)
-    watchdog_thread.start()
+    # The first session loads the listings and then works as the first worker
+    session = BrowserSession(pool, "worker-1")
+    sessions = [session]
     
     # If resume flag is set, try to get last processed URL
     last_processed_url = None
@@ -935,59 +880,57 @@ def main():
     try:
         # Navigate directly to the target page
         print("Navigating to certified mobiles page...")
-        start_operation("navigate_to_main_page")
-        driver.get("https://www.carousell.sg/smart_render/?type=market-landing-page&name=ap-certified-mobiles")
-        end_operation()
+        session.start_operation("navigate_to_main_page")
+        session.driver.get("https://www.carousell.sg/smart_render/?type=market-landing-page&name=ap-certified-mobiles")
+        session.end_operation()
         
         # Simple wait for page to load
-        time.sleep(5)
+        wait_for_dom_quiet(session.driver, quiet_ms=1000, timeout=5)
         
         # Check if browser froze
-        if is_frozen:
+        if session.needs_restart:
             print("Browser froze during initial navigation, restarting...")
-            driver = restart_browser()
-            is_frozen = False
+            session.restart()
             
             # Try again
-            start_operation("navigate_to_main_page_retry")
-            driver.get("https://www.carousell.sg/smart_render/?type=market-landing-page&name=ap-certified-mobiles")
-            end_operation()
-            time.sleep(5)
+            session.start_operation("navigate_to_main_page_retry")
+            session.driver.get("https://www.carousell.sg/smart_render/?type=market-landing-page&name=ap-certified-mobiles")
+            session.end_operation()
+            wait_for_dom_quiet(session.driver, quiet_ms=1000, timeout=5)
         
         # Simple Cloudflare handling
-        handle_cloudflare(driver)
+        handle_cloudflare(session.driver)
         
         # Click Load More button to load all listings
         print("Loading all device listings...")
-        start_operation("click_load_more")
-        click_load_more_button(driver, max_clicks=30)
-        end_operation()
+        session.start_operation("click_load_more")
+        click_load_more_button(session.driver, max_clicks=30)
+        session.end_operation()
         
         # Check if browser froze
-        if is_frozen:
+        if session.needs_restart:
             print("Browser froze while loading listings, restarting...")
-            driver = restart_browser()
-            is_frozen = False
+            session.restart()
             
             # Try again
-            start_operation("navigate_to_main_page_after_freeze")
-            driver.get("https://www.carousell.sg/smart_render/?type=market-landing-page&name=ap-certified-mobiles")
-            end_operation()
-            time.sleep(5)
+            session.start_operation("navigate_to_main_page_after_freeze")
+            session.driver.get("https://www.carousell.sg/smart_render/?type=market-landing-page&name=ap-certified-mobiles")
+            session.end_operation()
+            wait_for_dom_quiet(session.driver, quiet_ms=1000, timeout=5)
             
             # Handle Cloudflare again
-            handle_cloudflare(driver)
+            handle_cloudflare(session.driver)
             
             # Try loading listings again
-            start_operation("click_load_more_retry")
-            click_load_more_button(driver, max_clicks=30)
-            end_operation()
+            session.start_operation("click_load_more_retry")
+            click_load_more_button(session.driver, max_clicks=30)
+            session.end_operation()
         
         # Find device links using the pattern from scrape.py
         print("Finding device links...")
-        start_operation("find_device_links")
-        card_urls = find_device_links(driver)
-        end_operation()
+        session.start_operation("find_device_links")
+        card_urls = find_device_links(session.driver)
+        session.end_operation()
         
         # Remove duplicates
         card_urls = list(set(card_urls))
@@ -1012,95 +955,76 @@ def main():
             # Just apply the resume index
             card_urls = card_urls[resume_from_index:]
         
-        # Process each device
-        for i, card_url in enumerate(card_urls):
-            print(f"\nProcessing device {i+1}/{len(card_urls)} (overall: {resume_from_index + i + 1})")
+        # Remaining workers get their own browser and watchdog
+        for worker in range(2, min(workers, len(card_urls)) + 1):
+            sessions.append(open_worker_session(pool, f"worker-{worker}"))
+        if len(sessions) > 1:
+            print(f"Processing {len(card_urls)} devices with {len(sessions)} browser workers")
+        
+        def process(session, item):
+            i, card_url = item
+            print(f"\n[{session.name}] Processing device {i+1}/{len(card_urls)} (overall: {resume_from_index + i + 1})")
             print(f"URL: {card_url}")
-            
-            # Process this device with retries
-            device_data = []
-            retry_count = 0
-            max_retries = 3
-            success = False
-            
-            while not success and retry_count < max_retries:
-                try:
-                    # Check if browser is still responsive before processing
-                    if driver is None or is_frozen:
-                        print("Browser needs to be restarted before processing")
-                        driver = restart_browser()
-                        is_frozen = False
-                    
-                    # Process the device
-                    device_data = process_device_listing(driver, card_url, df)
-                    
-                    # If browser froze during processing, retry
-                    if is_frozen or driver is None:
-                        print("Browser froze during processing, retrying...")
-                        driver = restart_browser()
-                        is_frozen = False
-                        retry_count += 1
-                        continue
-                    
-                    # Consider success only if we got data and no freeze occurred
-                    if device_data:
-                        success = True
-                    else:
-                        print("No data extracted, considering as failure")
-                        retry_count += 1
-                except Exception as e:
-                    retry_count += 1
-                    print(f"Error processing device (attempt {retry_count}/{max_retries}): {e}")
-                    
-                    # Check if browser froze
-                    if is_frozen or driver is None:
-                        print("Browser froze during exception, restarting...")
-                        driver = restart_browser()
-                        is_frozen = False
-                    
-                    if retry_count < max_retries:
-                        print("Retrying after a short delay...")
-                        time.sleep(5)
-                
-                # Check for our special skipped flag
-                if device_data and device_data[0] == "SKIPPED_EXISTING_MODEL":
-                    skipped_devices += 1
-                # Update Excel file if we got data
-                elif device_data:
-                    new_rows_df = pd.DataFrame(device_data)
-                    
-                    # Handle empty df warning
-                    if not df.empty or not new_rows_df.empty:
-                        df = pd.concat([df, new_rows_df], ignore_index=True)
-                        # Only drop duplicates if we actually have rows
-                        if not df.empty:
-                            df.drop_duplicates(subset=['Model', 'Capacity', 'Condition'], keep='last', inplace=True)
-                    else:
-                        df = new_rows_df
-                        
-                    df.to_excel(excel_file, index=False)
-                    print(f"Updated Excel file with {len(device_data)} new entries")
-                    processed_devices += 1
-                else:
-                    print("No data extracted for this device after all retries")
+            device_data = scrape_url(session, card_url, model_index)
             
             # Add random delay between processing
             delay = random.uniform(2, 4)
             print(f"Waiting {delay:.1f} seconds before next device...")
             time.sleep(delay)
+            return device_data
+        
+        # Resume state only moves past URLs whose predecessors are all done
+        completed = set()
+        next_unfinished = 0
+        
+        def record(item, device_data):
+            nonlocal replaced, skipped_devices, processed_devices, next_unfinished
+            i, card_url = item
+            
+            # Check for our special skipped flag
+            if device_data and device_data[0] == "SKIPPED_EXISTING_MODEL":
+                skipped_devices += 1
+            # Save the rows if we got data
+            elif device_data:
+                # Only drop duplicates at the end if the new rows replace existing ones
+                if model_index.overlaps(device_data):
+                    replaced = True
+                for row in device_data:
+                    sink.append(row)
+                model_index.add(device_data)
+                print(f"Saved {len(device_data)} new entries")
+                processed_devices += 1
+            else:
+                print("No data extracted for this device after all retries")
+            
+            completed.add(i)
+            if next_unfinished in completed:
+                while next_unfinished in completed:
+                    next_unfinished += 1
+                save_last_processed_url(card_urls[next_unfinished - 1])
+        
+        # Workers take the next URL from a shared queue and share the model index and output
+        fan_out_sessions(list(enumerate(card_urls)), process, sessions, on_result=record)
         
     except Exception as e:
         print(f"Error in main function: {e}")
         traceback.print_exc()
     
     finally:
-        # End the watchdog operation
-        current_operation = "idle"
+        # Stop the watchdogs
+        for worker_session in sessions:
+            worker_session.close()
+        print(format_operation_stats())
         
         # Save final data
         try:
-            if 'df' in locals() and not df.empty:
-                df.to_excel(excel_file, index=False)
+            close_sink(excel_file)
+            df = read_source_file(excel_file)
+            if df is not None and not df.empty:
+                # Rewrite the file once if rows replaced earlier ones, unless some are still pending in the journal
+                if replaced and not read_journal(excel_file):
+                    df = df.drop_duplicates(subset=['Model', 'Capacity', 'Condition'], keep='last')
+                    write_excel(df, excel_file)
                 print(f"Final data saved to {excel_file}")
                 
                 # Print summary
@@ -1114,13 +1038,13 @@ def main():
         except Exception as e:
             print(f"Error saving final data: {e}")
         
-        # Close driver
+        # Close all pooled browsers
         try:
-            if driver is not None:
-                driver.quit()
-                print("Driver closed")
+            pool.close()
+            print("Driver closed")
         except:
             print("Driver already closed")
 
 if __name__ == "__main__":
+    enable_sleep_budget()
     main()
\ No newline at end of file
@@ -9,9 +9,42 @@ import time
 import os
 import argparse
 from datetime import datetime
+import sys
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.dom import extract_elements
+from common.shopify import collection_rows, fixture_fetcher, recording_fetcher, fetch_json, product_fingerprint
+from common.resource_blocking import apply_resource_blocking
+from common.replay import configure_proxy
+from common.page_cache import PageCache, cache_path
+from common.result_channel import write_excel, write_excel_rows
+from common.waits import enable_sleep_budget
 
-def scrape_compasia_prices(output_excel_path="SG_SO_Source2.xlsx", n_scrape=None, headless=True, delay=1):
+
+def save_results(results_df, output_excel_path):
+    """Clean up the collected rows and write them to the output Excel file"""
+    # Convert value column to numeric
+    results_df['Value'] = pd.to_numeric(results_df['Value'], errors='coerce')
+    
+    # Drop rows with missing essential data
+    results_df = results_df.dropna(subset=['Brand', 'Model'])
+
+    results_df = results_df[~results_df['Brand'].str.contains('GB', na=False)]
+    
+    # Ensure proper columns order to match Samsung scrape format
+    column_order = [
+        "Country", "Device Type", "Brand", "Model", "Capacity", "Color", 
+        "Launch RRP", "Condition", "Value Type", "Currency", "Value", 
+        "Source", "Updated on", "Updated by", "Comments"
+    ]
+    results_df = results_df[column_order]
+    
+    # Ensure output directory exists
+    os.makedirs(os.path.dirname(output_excel_path) if os.path.dirname(output_excel_path) else ".", exist_ok=True)
+    write_excel(results_df, output_excel_path)
+
+
+def scrape_compasia_prices(output_excel_path="SG_SO_Source2.xlsx", n_scrape=None, headless=True, delay=1, mode="auto", fixtures=None, save_fixtures=None, incremental=False):
     """
     Scrapes device prices from CompAsia website and saves results to a new Excel file
     
@@ -20,6 +53,11 @@ def scrape_compasia_prices(output_excel_path="SG_SO_Source2.xlsx", n_scrape=None
         n_scrape (int, optional): Number of devices to scrape for testing purposes
         headless (bool): Whether to run the browser in headless mode (default: True)
         delay (float): Delay in seconds between actions (default: 1, reduce for faster scraping)
+        mode (str): "auto" tries the Shopify JSON endpoints and falls back to the browser,
+            "json" uses only the JSON endpoints, "browser" only the browser
+        fixtures (str, optional): Directory of saved products.json responses to read instead of the network
+        save_fixtures (str, optional): Directory to save the fetched products.json responses to
+        incremental (bool): In the browser crawl, reuse the last rows of products whose variants have not changed
         
     Returns:
         bool: True if successful, False otherwise
@@ -37,6 +75,8 @@ def scrape_compasia_prices(output_excel_path="SG_SO_Source2.xlsx", n_scrape=None
             "Launch RRP", "Condition", "Value Type", "Currency", "Value", 
             "Source", "Updated on", "Updated by", "Comments"
         ])
+        # Rows already in the output file, so each progress save streams only the new ones
+        saved_rows = 0
         
         # Default values for certain columns to match Samsung scrape format
         defaults = {
@@ -51,6 +91,24 @@ def scrape_compasia_prices(output_excel_path="SG_SO_Source2.xlsx", n_scrape=None
             "Comments": ""
         }
         
+        # Fast path: read the storefront's products.json instead of clicking through every product
+        if mode != "browser":
+            fetch = fixture_fetcher(fixtures) if fixtures else fetch_json
+            if save_fixtures:
+                fetch = recording_fetcher(save_fixtures, fetch)
+            try:
+                rows = collection_rows(urls, defaults, n_scrape=n_scrape, fetch=fetch)
+                results_df = pd.DataFrame(rows, columns=results_df.columns)
+                save_results(results_df, output_excel_path)
+                print(f"Collected {len(results_df)} prices from the Shopify JSON endpoints")
+                print(f"Results saved to: {output_excel_path}")
+                return True
+            except Exception as e:
+                if mode == "json" or fixtures:
+                    print(f"Shopify JSON extraction failed: {e}")
+                    return False
+                print(f"Shopify JSON extraction failed ({e}), falling back to the browser")
+        
         # Setup Chrome options
         options = webdriver.ChromeOptions()
         # Only enable headless mode if specified
@@ -72,11 +130,15 @@ def scrape_compasia_prices(output_excel_path="SG_SO_Source2.xlsx", n_scrape=None
         options.add_argument('--media-cache-size=1048576')
         options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
         
+        configure_proxy(options)
+        
         # Initialize the driver
         driver = webdriver.Chrome(options=options)
+        apply_resource_blocking(driver, "SG_SO_Source2")
         
         # Total devices processed counter
         total_devices_processed = 0
+        page_cache = PageCache(cache_path(output_excel_path)) if incremental else None
         
         # Loop through each URL (smartphones and tablets)
         for url_index, url in enumerate(urls):
@@ -102,11 +164,19 @@ def scrape_compasia_prices(output_excel_path="SG_SO_Source2.xlsx", n_scrape=None
                 while has_next_page:
                     print(f"Processing page {current_page}...")
                     
-                    # Get all product items on the current page
-                    product_items = WebDriverWait(driver, 10).until(
-                        EC.presence_of_all_elements_located((By.CLASS_NAME, 'product-item'))
+                    # Wait for the product items on the current page
+                    WebDriverWait(driver, 10).until(
+                        EC.presence_of_element_located((By.CLASS_NAME, 'product-item'))
                     )
                     
+                    # Read every product card in a single script call
+                    product_items = extract_elements(driver, '.product-item', {
+                        "url": ('a.product-item__title', 'href'),
+                        "title": ('a.product-item__title', 'text'),
+                        "data_tags": (None, 'data-tags'),
+                        "price_text": ('span.price--highlight', 'text')
+                    })
+                    
                     # If we're testing, limit the number of products
                     if n_scrape is not None:
                         product_items = product_items[:n_scrape]
@@ -118,22 +188,18 @@ def scrape_compasia_prices(output_excel_path="SG_SO_Source2.xlsx", n_scrape=None
                     # Extract basic info and URLs from product cards
                     for item in product_items:
                         try:
-                            # Extract product URL
-                            product_link = item.find_element(By.CSS_SELECTOR, 'a.product-item__title').get_attribute('href')
-                            
-                            # Extract product title
-                            product_title = item.find_element(By.CSS_SELECTOR, 'a.product-item__title').text.strip()
+                            if not item["url"]:
+                                continue
+                            product_link = item["url"]
+                            product_title = (item["title"] or "").strip()
+                            tags = item["data_tags"].split(',') if item["data_tags"] else []
                             
                             # Extract brand from product data attribute or tags
                             brand = ""
-                            try:
-                                # Try to get brand from data-tags attribute
-                                data_tags = item.get_attribute('data-tags')
-                                if data_tags:
-                                    tags = data_tags.split(',')
-                                    # First tag is usually the brand
-                                    brand = tags[0]
-                            except:
+                            if tags:
+                                # First tag is usually the brand
+                                brand = tags[0]
+                            else:
                                 # If we can't get brand from tags, try to extract from title
                                 common_brands = ["Apple", "Samsung", "Google", "Huawei", "Xiaomi", "Oppo", "OnePlus", 
                                                "Sony", "LG", "Motorola", "Vivo", "Realme", "Honor", "Nothing"]
@@ -144,15 +210,11 @@ def scrape_compasia_prices(output_excel_path="SG_SO_Source2.xlsx", n_scrape=None
                             
                             # Extract capacity from data-tags or title
                             capacity = ""
-                            try:
-                                data_tags = item.get_attribute('data-tags')
-                                if data_tags:
-                                    tags = data_tags.split(',')
-                                    for tag in tags:
-                                        if "GB" in tag or "TB" in tag:
-                                            capacity = tag.strip()
-                                            break
-                            except:
+                            for tag in tags:
+                                if "GB" in tag or "TB" in tag:
+                                    capacity = tag.strip()
+                                    break
+                            if not capacity:
                                 # Try to extract capacity from title using regex
                                 capacity_match = re.search(r'(\d+)GB', product_title) or re.search(r'(\d+)TB', product_title)
                                 if capacity_match:
@@ -160,15 +222,11 @@ def scrape_compasia_prices(output_excel_path="SG_SO_Source2.xlsx", n_scrape=None
                             
                             # Get base price if available on the card
                             base_price = ""
-                            try:
-                                price_element = item.find_element(By.CSS_SELECTOR, 'span.price--highlight')
-                                price_text = price_element.text.strip()
+                            if item["price_text"]:
                                 # Extract numeric price
-                                price_match = re.search(r'S\$(\d+)', price_text)
+                                price_match = re.search(r'S\$(\d+)', item["price_text"])
                                 if price_match:
                                     base_price = price_match.group(1)
-                            except:
-                                pass
                             
                             # Add product info to list for processing
                             product_info = {
@@ -192,6 +250,16 @@ def scrape_compasia_prices(output_excel_path="SG_SO_Source2.xlsx", n_scrape=None
                             model_name = product_info["title"]
                             print(f"Processing product ({idx+1}/{len(product_info_list)}): {model_name}")
                             
+                            # Products whose variants have not changed reuse the rows of the last run
+                            if page_cache is not None:
+                                fingerprint = page_cache.fingerprint(product_info["url"], product_fingerprint)
+                                cached_rows = page_cache.cached_rows(product_info["url"], fingerprint)
+                                if cached_rows is not None:
+                                    print(f"Unchanged since the last run, reusing {len(cached_rows)} rows")
+                                    results_df = pd.concat([results_df, pd.DataFrame(cached_rows, columns=results_df.columns)], ignore_index=True)
+                                    total_devices_processed += 1
+                                    continue
+                            
                             # Navigate to product page
                             driver.get(product_info["url"])
                             
@@ -396,6 +464,7 @@ def scrape_compasia_prices(output_excel_path="SG_SO_Source2.xlsx", n_scrape=None
                                 })
                                 
                             # Create entries for condition data without using colors or other unnecessary fields
+                            product_rows = []
                             for condition_data in all_conditions_data:
                                 # Create a result entry based on the exact format needed
                                 result = defaults.copy()
@@ -410,7 +479,10 @@ def scrape_compasia_prices(output_excel_path="SG_SO_Source2.xlsx", n_scrape=None
                                 
                                 # Append to results DataFrame
                                 results_df = pd.concat([results_df, pd.DataFrame([result])], ignore_index=True)
+                                product_rows.append(result)
                             
+                            if page_cache is not None:
+                                page_cache.store(product_info["url"], fingerprint, product_rows)
                             total_devices_processed += 1
                             
                         except Exception as e:
@@ -526,7 +598,7 @@ def scrape_compasia_prices(output_excel_path="SG_SO_Source2.xlsx", n_scrape=None
                     if not results_df.empty:
                         # Ensure output directory exists
                         os.makedirs(os.path.dirname(output_excel_path) if os.path.dirname(output_excel_path) else ".", exist_ok=True)
-                        results_df.to_excel(output_excel_path, index=False)
+                        saved_rows = write_excel_rows(results_df, output_excel_path, saved_rows)
                         print(f"Progress saved after page {current_page}: {total_devices_processed} devices processed so far")
                 
             except Exception as e:
@@ -544,33 +616,12 @@ def scrape_compasia_prices(output_excel_path="SG_SO_Source2.xlsx", n_scrape=None
         
         # Final save of all results
         if not results_df.empty:
-            # Clean up the data
-            # Convert value column to numeric
-            results_df['Value'] = pd.to_numeric(results_df['Value'], errors='coerce')
-            
-            # Drop rows with missing essential data
-            results_df = results_df.dropna(subset=['Brand', 'Model'])
-
-            results_df = results_df[~results_df['Brand'].str.contains('GB', na=False)]
-
-            
-            # Ensure proper columns order to match Samsung scrape format
-            column_order = [
-                "Country", "Device Type", "Brand", "Model", "Capacity", "Color", 
-                "Launch RRP", "Condition", "Value Type", "Currency", "Value", 
-                "Source", "Updated on", "Updated by", "Comments"
-            ]
-            
-            # Reorder columns
-            results_df = results_df[column_order]
-            
-            # Ensure output directory exists
-            os.makedirs(os.path.dirname(output_excel_path) if os.path.dirname(output_excel_path) else ".", exist_ok=True)
-            
-            # Save final result
-            results_df.to_excel(output_excel_path, index=False)
+            save_results(results_df, output_excel_path)
             
         print(f"All pages processed. {total_devices_processed} devices found.")
+        if page_cache is not None:
+            print(f"Incremental crawl: {page_cache.summary()}")
+            page_cache.close()
         print(f"Results saved to: {output_excel_path}")
         return True
         
@@ -580,7 +631,7 @@ def scrape_compasia_prices(output_excel_path="SG_SO_Source2.xlsx", n_scrape=None
         if 'results_df' in locals() and not results_df.empty:
             # Ensure output directory exists
             os.makedirs(os.path.dirname(output_excel_path) if os.path.dirname(output_excel_path) else ".", exist_ok=True)
-            results_df.to_excel(output_excel_path, index=False)
+            write_excel_rows(results_df, output_excel_path, saved_rows)
             print(f"Saved partial results to {output_excel_path}")
         return False
     finally:
@@ -598,8 +649,14 @@ if __name__ == "__main__":
     parser.add_argument('-o', '--output', type=str, help='Output Excel file path', default="SG_SO_Source2.xlsx")
     parser.add_argument('--no-headless', action='store_true', help='Disable headless mode (show browser)')
     parser.add_argument('-d', '--delay', type=float, help='Delay between actions (lower = faster but may be less reliable)', default=1.0)
+    parser.add_argument('--mode', choices=['auto', 'json', 'browser'], default='auto', help='auto: Shopify JSON with browser fallback (default), json: JSON only, browser: browser only')
+    parser.add_argument('--fixtures', type=str, help='Read saved products.json responses from this directory (offline testing)', default=None)
+    parser.add_argument('--save-fixtures', type=str, help='Save fetched products.json responses to this directory', default=None)
+    parser.add_argument('--incremental', action='store_true', help='Browser crawl: reuse the last rows of products whose variants have not changed')
     args = parser.parse_args()
     
+    enable_sleep_budget()
+    
     output_excel_path = args.output
     
     # Create the output directory if it doesn't exist
@@ -610,6 +667,10 @@ if __name__ == "__main__":
         output_excel_path, 
         n_scrape=args.n, 
         headless=not args.no_headless,
-        delay=args.delay
+        delay=args.delay,
+        mode=args.mode,
+        fixtures=args.fixtures,
+        save_fixtures=args.save_fixtures,
+        incremental=args.incremental
     )
     print("Script completed. Results have been saved to the Excel file.")
\ No newline at end of file
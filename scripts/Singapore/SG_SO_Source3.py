@@ -13,35 +13,21 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import NoSuchElementException, TimeoutException
 from webdriver_manager.chrome import ChromeDriverManager
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.resource_blocking import apply_resource_blocking
+from common.replay import configure_proxy
+from common.device_catalog import brand_of, device_type_of
+from common.page_cache import PageCache, cache_path
+from common.result_channel import write_excel
+from common.waits import enable_sleep_budget
 
 # Define URLs
 SMARTPHONES_URL = "https://reebelo.sg/collections/smartphones?sort=latest-release"
 TABLETS_URL = "https://reebelo.sg/collections/tablets?sort=latest-release"
 OUTPUT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "output", "SG_SO_Source3.xlsx")
 
-# Define brand detection patterns
-BRAND_PATTERNS = {
-    "Apple": ["iphone", "ipad", "macbook", "airpods", "apple watch", "apple"],
-    "Samsung": ["galaxy", "samsung", "note", "fold", "flip", "tab s", "tab a"],
-    "Google": ["pixel", "google"],
-    "Huawei": ["huawei", "mate", "p30", "p40", "p50", "nova"],
-    "Xiaomi": ["xiaomi", "redmi", "poco", "mi pad"],
-    "Oppo": ["oppo", "find n", "find x", "reno"],
-    "OnePlus": ["oneplus", "one plus"],
-    "Sony": ["sony", "xperia"],
-    "LG": ["lg ", "lg v", "lg g"],
-    "Motorola": ["motorola", "moto g", "moto e", "razr"],
-    "Vivo": ["vivo"],
-    "Realme": ["realme"],
-    "Honor": ["honor"],
-    "Nothing": ["nothing phone"],
-    "Nokia": ["nokia"],
-    "Asus": ["asus", "rog phone", "zenfone"],
-    "Lenovo": ["lenovo", "tab m", "tab p"],
-    "HTC": ["htc", "one m", "desire", "u ultra", "u11", "u12"],
-    "Microsoft": ["surface", "microsoft"],
-}
-
 def setup_driver():
     """Setup and return a Chrome webdriver with appropriate options."""
     chrome_options = Options()
@@ -52,7 +38,9 @@ def setup_driver():
     chrome_options.add_argument("--disable-dev-shm-usage")
     
     service = Service(ChromeDriverManager().install())
+    configure_proxy(chrome_options)
     driver = webdriver.Chrome(service=service, options=chrome_options)
+    apply_resource_blocking(driver, "SG_SO_Source3")
     return driver
 
 def get_device_urls(driver, base_url, max_devices=None):
@@ -89,27 +77,7 @@ def get_device_urls(driver, base_url, max_devices=None):
 
 def identify_brand(device_name):
     """Identify the brand based on device name using pattern matching."""
-    device_name_lower = device_name.lower()
-    
-    # First check for exact brand mentions at the start of the name
-    for brand, patterns in BRAND_PATTERNS.items():
-        if device_name_lower.startswith(brand.lower()):
-            return brand
-    
-    # Then check for keywords that strongly indicate a specific brand
-    for brand, patterns in BRAND_PATTERNS.items():
-        for pattern in patterns:
-            if pattern in device_name_lower:
-                return brand
-    
-    # Special case handling for series that uniquely identify brands
-    if re.search(r'\biphone\b|\bipad\b|\bwatch\b', device_name_lower):
-        return "Apple"
-    elif re.search(r'\bgalaxy\b|\bs\d+\b|\ba\d+\b|\bnote\b|\btab s\b|\btab a\b|\bfold\b|\bflip\b', device_name_lower):
-        return "Samsung"
-    
-    # If no brand identified, return Unknown
-    return "Unknown"
+    return brand_of(device_name)
 
 def extract_price_from_condition_element(condition_element):
     """Extract the price from a condition element."""
@@ -189,12 +157,9 @@ def extract_device_info(driver, url):
                         device_name = driver.find_element(By.ID, "e2e-product-name").text
                         print(f"Found device: {device_name}")
                         
-                        # Determine if it's a smartphone or tablet based on device name
+                        # Determine the device type from the device name
                         full_name = device_name.strip()
-                        if any(tablet_term in full_name.lower() for tablet_term in ["tab", "ipad", "pad", "tablet"]):
-                            device_type = "Tablet"
-                        else:
-                            device_type = "SmartPhone"
+                        device_type = device_type_of(full_name)
                         
                         # Identify the brand using our enhanced method
                         brand = identify_brand(full_name)
@@ -233,10 +198,7 @@ def extract_device_info(driver, url):
                 try:
                     device_name = driver.find_element(By.ID, "e2e-product-name").text
                     full_name = device_name.strip()
-                    if any(tablet_term in full_name.lower() for tablet_term in ["tab", "ipad", "pad", "tablet"]):
-                        device_type = "Tablet"
-                    else:
-                        device_type = "SmartPhone"
+                    device_type = device_type_of(full_name)
                     brand = identify_brand(full_name)
                     model = full_name
                 except:
@@ -283,12 +245,9 @@ def extract_device_info(driver, url):
                             device_name = driver.find_element(By.ID, "e2e-product-name").text
                             print(f"Found device for {storage_value}: {device_name}")
                             
-                            # Determine if it's a smartphone or tablet based on device name
+                            # Determine the device type from the device name
                             full_name = device_name.strip()
-                            if any(tablet_term in full_name.lower() for tablet_term in ["tab", "ipad", "pad", "tablet"]):
-                                device_type = "Tablet"
-                            else:
-                                device_type = "SmartPhone"
+                            device_type = device_type_of(full_name)
                             
                             # Identify the brand using our enhanced method
                             brand = identify_brand(full_name)
@@ -331,6 +290,13 @@ def extract_device_info(driver, url):
         print(f"Error extracting device info: {e}")
         return []
 
+def scrape_device(driver, url, page_cache=None):
+    """extract_device_info, or the rows of the last run if the page has not changed since."""
+    if page_cache is None:
+        return extract_device_info(driver, url)
+    device_infos, _ = page_cache.rows(url, lambda: extract_device_info(driver, url))
+    return device_infos
+
 def initialize_excel_file():
     """Create initial Excel file with column headers."""
     columns = [
@@ -346,7 +312,7 @@ def initialize_excel_file():
     os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
     
     # Save to Excel
-    df.to_excel(OUTPUT_FILE, index=False, sheet_name="Sheet")
+    write_excel(df, OUTPUT_FILE, sheet_name="Sheet")
     print(f"Initialized output file at {OUTPUT_FILE}")
     
     return df
@@ -366,7 +332,7 @@ def update_excel_file(device_infos):
         df = pd.concat([df, new_df], ignore_index=True)
         
         # Save back to Excel
-        df.to_excel(OUTPUT_FILE, index=False, sheet_name="Sheet")
+        write_excel(df, OUTPUT_FILE, sheet_name="Sheet")
         print(f"Updated {OUTPUT_FILE} with {len(device_infos)} entries")
     else:
         # Create new file with the devices
@@ -376,15 +342,17 @@ def update_excel_file(device_infos):
         os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
         
         # Save to Excel
-        df.to_excel(OUTPUT_FILE, index=False, sheet_name="Sheet")
+        write_excel(df, OUTPUT_FILE, sheet_name="Sheet")
         print(f"Created {OUTPUT_FILE} with {len(device_infos)} entries")
 
 def main():
     parser = argparse.ArgumentParser(description='Scrape device prices from reebelo.sg')
     parser.add_argument('-n', '--number', type=int, help='Number of devices to scrape per category (smartphones/tablets)')
+    parser.add_argument('--incremental', action='store_true', help='Reuse the last rows of product pages whose content has not changed')
     args = parser.parse_args()
     
     max_devices = args.number if args.number else None
+    page_cache = PageCache(cache_path(OUTPUT_FILE)) if args.incremental else None
     
     driver = setup_driver()
     
@@ -396,7 +364,7 @@ def main():
         # Scrape smartphones
         smartphone_urls = get_device_urls(driver, SMARTPHONES_URL, max_devices)
         for url in smartphone_urls:
-            device_infos = extract_device_info(driver, url)
+            device_infos = scrape_device(driver, url, page_cache)
             if device_infos:
                 all_devices.extend(device_infos)
                 update_excel_file(device_infos)
@@ -404,7 +372,7 @@ def main():
         # Scrape tablets
         tablet_urls = get_device_urls(driver, TABLETS_URL, max_devices)
         for url in tablet_urls:
-            device_infos = extract_device_info(driver, url)
+            device_infos = scrape_device(driver, url, page_cache)
             if device_infos:
                 all_devices.extend(device_infos)
                 update_excel_file(device_infos)
@@ -415,9 +383,14 @@ def main():
         print(f"Smartphones: {sum(1 for d in all_devices if d['Device Type'] == 'SmartPhone')}")
         print(f"Tablets: {sum(1 for d in all_devices if d['Device Type'] == 'Tablet')}")
         print(f"Data saved to {OUTPUT_FILE}")
+        if page_cache is not None:
+            print(f"Incremental crawl: {page_cache.summary()}")
     
     finally:
+        if page_cache is not None:
+            page_cache.close()
         driver.quit()
 
 if __name__ == "__main__":
+    enable_sleep_budget()
     main()
\ No newline at end of file
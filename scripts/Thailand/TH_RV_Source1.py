@@ -6,11 +6,24 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException
 from webdriver_manager.chrome import ChromeDriverManager
 import time
-import openpyxl
 from datetime import datetime
 import os
 import re
 import argparse
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.result_sink import get_sink, close_sink
+from common.driver_pool import DriverPool, driver_responds
+from common.network_capture import capture_for, captured_price, enable_performance_log
+from common.resource_blocking import apply_resource_blocking
+from common.replay import configure_proxy
+from common.device_catalog import device_type_of
+from common.waits import enable_sleep_budget, wait_for_dom_quiet, wait_for_page_ready
+
+# Backend call the offer page is assumed to read its price from (not yet observed;
+# only used with NETWORK_PRICES=1)
+PRICE_API_PATTERN = r"remobie\.com/.*(price|offer|quote|estimate)"
 
 def setup_driver(headless=True):
     """Set up the Chrome WebDriver with appropriate options for containerized environment."""
@@ -44,8 +57,14 @@ def setup_driver(headless=True):
     # Use a normal page load strategy instead of eager
     options.page_load_strategy = 'normal'
     
+    # Network events, so prices can be read from the offer API response
+    enable_performance_log(options)
+    
+    configure_proxy(options)
+    
     # Initialize the driver directly
     driver = webdriver.Chrome(options=options)
+    apply_resource_blocking(driver, "TH_RV_Source1")
     
     # Set page load timeout to be more generous
     driver.set_page_load_timeout(60)
@@ -58,7 +77,7 @@ def handle_city_modal(driver, wait):
     try:
         # Wait for the modal to appear
         print("Checking for city selection modal...")
-        time.sleep(2)
+        wait_for_dom_quiet(driver)
         
         # Check if the modal is present by looking for the select element
         try:
@@ -101,7 +120,7 @@ def handle_city_modal(driver, wait):
                 EC.element_to_be_clickable((By.CSS_SELECTOR, "button.ant-btn.ant-btn-primary.ant-btn-lg"))
             )
             start_button.click()
-            time.sleep(2)
+            wait_for_dom_quiet(driver)
             print("Successfully clicked start button and closed city modal")
             return True
             
@@ -125,17 +144,8 @@ def get_condition_mapping(screen_condition):
 
 
 def detect_device_type(device_name):
-    """Determine if the device is a tablet or smartphone based on the name."""
-    device_name_lower = device_name.lower()
-    
-    # Check for tablet keywords
-    if any(keyword in device_name_lower for keyword in ["ipad", "tab", "tablet", "galaxy tab"]):
-        return "Tablet"
-    elif any(keyword in device_name_lower for keyword in ["watch"]):
-        return "SmartWatch"
-    else:
-        # Default to Smartphone for other devices
-        return "SmartPhone"
+    """Determine if the device is a tablet, smartwatch or smartphone based on the name."""
+    return device_type_of(device_name)
 
 
 def click_brand_tab(driver, wait, brand_name):
@@ -143,7 +153,7 @@ def click_brand_tab(driver, wait, brand_name):
     # For Apple, we don't need to click anything as it's displayed by default
     if brand_name.lower() == "apple":
         print(f"Apple phones are displayed by default")
-        time.sleep(2)  # Wait for models to load
+        wait_for_dom_quiet(driver)  # Wait for models to load
         return True
     
     # For Samsung, we need to click the Samsung tab
@@ -159,7 +169,7 @@ def click_brand_tab(driver, wait, brand_name):
             driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", samsung_tab)
             time.sleep(0.5)
             samsung_tab.click()
-            time.sleep(3)  # Wait for the Samsung models to load
+            wait_for_dom_quiet(driver)  # Wait for the Samsung models to load
             print(f"Successfully clicked on Samsung tab")
             return True
             
@@ -171,7 +181,7 @@ def click_brand_tab(driver, wait, brand_name):
                 samsung_tab = driver.find_element(By.XPATH, "//div[contains(@class, 'home__StyledModelSelectionTab-sc-d27gbn-4') and contains(., 'SAMSUNG')]")
                 driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", samsung_tab)
                 samsung_tab.click()
-                time.sleep(3)
+                wait_for_dom_quiet(driver)
                 print(f"Successfully clicked on Samsung tab (alternative method)")
                 return True
             except Exception as e2:
@@ -309,7 +319,6 @@ def click_view_price_button(driver, wait):
                     print(f"DEBUG: Found button with selector: {selector}")
                     driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", button)
                     driver.execute_script("arguments[0].click();", button)
-                    time.sleep(3)
                     print("DEBUG: Successfully clicked 'View price offers' button")
                     return True
             except:
@@ -323,7 +332,6 @@ def click_view_price_button(driver, wait):
                 button = buttons[1]
                 driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", button)
                 driver.execute_script("arguments[0].click();", button)
-                time.sleep(3)
                 print("DEBUG: Successfully clicked 'View price offers' button (by position)")
                 return True
         except Exception as e:
@@ -428,11 +436,14 @@ def fill_trade_in_form(driver, wait, smartphone_data, storage, screen_condition,
             time.sleep(0.5)
             
             # Click "View price offers" button
+            capture_for(driver, [PRICE_API_PATTERN]).clear()
             if not click_view_price_button(driver, wait):
                 continue
                 
-            # Extract the price
-            price = extract_trade_in_price(driver, wait)
+            # Read the price from the offer API, falling back to the rendered offer
+            price = captured_price(driver, PRICE_API_PATTERN)
+            if price is None:
+                price = extract_trade_in_price(driver, wait)
             if price:
                 smartphone_data["Value"] = price
                 smartphone_data["Condition"] = get_condition_mapping(screen_condition)
@@ -458,66 +469,19 @@ def fill_trade_in_form(driver, wait, smartphone_data, storage, screen_condition,
 
 
 def save_to_excel(data, output_file):
-    """Save the extracted trade-in data to an Excel file."""
-    # Ensure output directory exists
-    os.makedirs(os.path.dirname(output_file) if os.path.dirname(output_file) else ".", exist_ok=True)
-    
-    if os.path.exists(output_file):
-        try:
-            workbook = openpyxl.load_workbook(output_file)
-            sheet = workbook.active
-        except:
-            workbook = openpyxl.Workbook()
-            sheet = workbook.active
-            # Use the new column headers
-            headers = ["Country", "Device Type", "Brand", "Model", "Capacity", "Color", 
-                      "Launch RRP", "Condition", "Value Type", "Currency", "Value", 
-                      "Source", "Updated on", "Updated by", "Comments"]
-            sheet.append(headers)
-    else:
-        workbook = openpyxl.Workbook()
-        sheet = workbook.active
-        # Use the new column headers
-        headers = ["Country", "Device Type", "Brand", "Model", "Capacity", "Color", 
-                  "Launch RRP", "Condition", "Value Type", "Currency", "Value", 
-                  "Source", "Updated on", "Updated by", "Comments"]
-        sheet.append(headers)
-
-    # Add new row with all the required columns
-    row_data = [
-        data["Country"],
-        data["Device Type"],
-        data["Brand"],
-        data["Model"],
-        data["Capacity"],
-        data["Color"],
-        data["Launch RRP"],
-        data["Condition"],
-        data["Value Type"],
-        data["Currency"],
-        data["Value"],
-        data["Source"],
-        data["Updated on"],
-        data["Updated by"],
-        data["Comments"]
-    ]
-    sheet.append(row_data)
+    """Append the extracted trade-in data to the result sink for output_file.
 
-    try:
-        workbook.save(output_file)
-        print(f"Saved data to {output_file}")
-    except Exception as e:
-        print(f"Error saving Excel file: {e}")
-        alt_file_name = os.path.join(os.path.dirname(output_file), f"TH_RV_Source1.xlsx")
-        try:
-            workbook.save(alt_file_name)
-            print(f"Saved to {alt_file_name}")
-        except:
-            print("Could not save Excel file")
+    Rows are journaled immediately; the Excel file is written once when the sink is closed.
+    """
+    get_sink(output_file).append(data)
 
 
-def process_smartphone_configuration(driver, wait, smartphone, storage, screen_condition, output_file):
-    """Process a single smartphone configuration with retry logic."""
+def process_smartphone_configuration(driver, wait, smartphone, storage, screen_condition, output_file, recover=None):
+    """Process a single smartphone configuration with retry logic.
+
+    recover(driver) returns a replacement (driver, wait) for a browser that
+    stopped responding; the remaining attempts run in the replacement.
+    """
     max_retries = 3
     
     for attempt in range(max_retries):
@@ -545,7 +509,7 @@ def process_smartphone_configuration(driver, wait, smartphone, storage, screen_c
             
             # Navigate back to the smartphone page for fresh form
             driver.get(smartphone['url'])
-            time.sleep(1.5)
+            wait_for_page_ready(driver)
             
             # Fill the form and get the price
             if fill_trade_in_form(driver, wait, trade_in_data, storage, screen_condition):
@@ -586,6 +550,8 @@ def process_smartphone_configuration(driver, wait, smartphone, storage, screen_c
                 save_to_excel(trade_in_data, output_file)
                 return False
             else:
+                if recover is not None and not driver_responds(driver):
+                    driver, wait = recover(driver)
                 print(f"Retrying... (attempt {attempt + 2}/{max_retries})")
                 time.sleep(3)
                 continue
@@ -611,12 +577,20 @@ def main_loop(n_scrape=None, output_file=None):
     
     print(f"Will save results to: {output_file}")
 
-    # Setup driver (single browser instance)
-    driver = setup_driver(headless=True)
+    # One browser at a time, with a warm spare to replace it if it crashes
+    pool = DriverPool(lambda: setup_driver(headless=True), size=1, spares=1)
+    driver = pool.acquire()
     
     ignored_exceptions = (NoSuchElementException, StaleElementReferenceException)
     wait = WebDriverWait(driver, 15, 0.5, ignored_exceptions=ignored_exceptions)
 
+    def recover(broken):
+        nonlocal driver, wait
+        print("Browser stopped responding, switching to a warm spare")
+        driver = pool.replace(broken)
+        wait = WebDriverWait(driver, 15, 0.5, ignored_exceptions=ignored_exceptions)
+        return driver, wait
+
     # Counter for tracking scrapes
     total_scrape_count = 0
     
@@ -626,7 +600,7 @@ def main_loop(n_scrape=None, output_file=None):
             
             # Navigate to the main page
             driver.get("https://www.remobie.com/")
-            time.sleep(2)
+            wait_for_page_ready(driver)
             
             # Handle city selection modal only when loading the homepage
             handle_city_modal(driver, wait)
@@ -650,8 +624,16 @@ def main_loop(n_scrape=None, output_file=None):
                 smartphone["brand"] = brand
                 
                 # Navigate to the smartphone page
-                driver.get(smartphone['url'])
-                time.sleep(2)
+                try:
+                    driver.get(smartphone['url'])
+                    wait_for_page_ready(driver)
+                except Exception as e:
+                    if driver_responds(driver):
+                        raise
+                    print(f"Browser crashed loading {smartphone['title']}: {e}")
+                    recover(driver)
+                    driver.get(smartphone['url'])
+                    wait_for_page_ready(driver)
                 
                 # Get storage options for this smartphone
                 storage_options = get_storage_options(driver, wait)
@@ -667,7 +649,7 @@ def main_loop(n_scrape=None, output_file=None):
                     for screen_condition in screen_conditions:
                         # Process the configuration with retry logic
                         success = process_smartphone_configuration(
-                            driver, wait, smartphone, storage, screen_condition, output_file
+                            driver, wait, smartphone, storage, screen_condition, output_file, recover
                         )
                         
                         total_scrape_count += 1
@@ -687,9 +669,13 @@ def main_loop(n_scrape=None, output_file=None):
         
         error_folder = os.path.dirname(output_file)
         os.makedirs(error_folder, exist_ok=True)
-        driver.save_screenshot(os.path.join(error_folder, "main_loop_error.png"))
+        try:
+            driver.save_screenshot(os.path.join(error_folder, "main_loop_error.png"))
+        except Exception:
+            pass
     finally:
-        driver.quit()
+        pool.close()
+        close_sink(output_file)
         print("Browser closed. Process complete.")
 
 
@@ -699,4 +685,6 @@ if __name__ == "__main__":
     parser.add_argument('-o', '--output', type=str, help='Output Excel file path', default=None)
     args = parser.parse_args()
     
+    enable_sleep_budget()
+    
     main_loop(args.n, args.output)
\ No newline at end of file
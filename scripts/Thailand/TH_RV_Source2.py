@@ -9,9 +9,16 @@ import time
 import logging
 import os
 import re
-import openpyxl  # Added import for Excel functionality
 from datetime import datetime
 import argparse
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.result_sink import get_sink, close_sink
+from common.resource_blocking import apply_resource_blocking
+from common.replay import configure_proxy
+from common.device_catalog import device_type_of
+from common.waits import enable_sleep_budget, wait_for_page_ready
 
 # Set up logging
 def setup_logging(log_file=None):
@@ -62,8 +69,11 @@ def setup_driver(headless=False):
     # Use eager page load strategy
     options.page_load_strategy = 'eager'
     
+    configure_proxy(options)
+    
     # Initialize the driver
     driver = webdriver.Chrome(options=options)
+    apply_resource_blocking(driver, "TH_RV_Source2")
     
     # Set timeout
     driver.set_page_load_timeout(30)
@@ -400,7 +410,7 @@ def fill_form(driver, result_data, iteration=1):
         # Click the button
         driver.execute_script("arguments[0].click();", evaluate_button)
         logging.info("Clicked evaluate button")
-        time.sleep(5)
+        wait_for_page_ready(driver)
         
         # Wait for results page
         try:
@@ -448,76 +458,16 @@ def fill_form(driver, result_data, iteration=1):
 
 # New function to save results to Excel, matching the format from TH_RV_Source1
 def save_to_excel(data, output_file):
-    """Save the extracted trade-in data to an Excel file."""
-    # Ensure output directory exists
-    os.makedirs(os.path.dirname(output_file) if os.path.dirname(output_file) else ".", exist_ok=True)
-    
-    if os.path.exists(output_file):
-        try:
-            workbook = openpyxl.load_workbook(output_file)
-            sheet = workbook.active
-        except:
-            workbook = openpyxl.Workbook()
-            sheet = workbook.active
-            # Use the new column headers
-            headers = ["Country", "Device Type", "Brand", "Model", "Capacity", "Color", 
-                      "Launch RRP", "Condition", "Value Type", "Currency", "Value", 
-                      "Source", "Updated on", "Updated by", "Comments"]
-            sheet.append(headers)
-    else:
-        workbook = openpyxl.Workbook()
-        sheet = workbook.active
-        # Use the new column headers
-        headers = ["Country", "Device Type", "Brand", "Model", "Capacity", "Color", 
-                  "Launch RRP", "Condition", "Value Type", "Currency", "Value", 
-                  "Source", "Updated on", "Updated by", "Comments"]
-        sheet.append(headers)
+    """Append the extracted trade-in data to the result sink for output_file.
 
-    # Add new row with all the required columns
-    row_data = [
-        data["Country"],
-        data["Device Type"],
-        data["Brand"],
-        data["Model"],
-        data["Capacity"],
-        data["Color"],
-        data["Launch RRP"],
-        data["Condition"],
-        data["Value Type"],
-        data["Currency"],
-        data["Value"],
-        data["Source"],
-        data["Updated on"],
-        data["Updated by"],
-        data["Comments"]
-    ]
-    sheet.append(row_data)
-
-    try:
-        workbook.save(output_file)
-        logging.info(f"Saved data to {output_file}")
-    except Exception as e:
-        logging.error(f"Error saving Excel file: {e}")
-        alt_file_name = os.path.join(os.path.dirname(output_file), f"TH_RV_Source2.xlsx")
-        try:
-            workbook.save(alt_file_name)
-            logging.info(f"Saved to {alt_file_name}")
-        except:
-            logging.error("Could not save Excel file")
+    Rows are journaled immediately; the Excel file is written once when the sink is closed.
+    """
+    get_sink(output_file).append(data)
 
 # Helper function to determine device type
 def detect_device_type(device_name):
-    """Determine if the device is a tablet or smartphone based on the name."""
-    device_name_lower = device_name.lower()
-    
-    # Check for tablet keywords
-    if any(keyword in device_name_lower for keyword in ["ipad", "tab", "tablet", "galaxy tab"]):
-        return "Tablet"
-    elif any(keyword in device_name_lower for keyword in ["watch"]):
-        return "SmartWatch"
-    else:
-        # Default to Smartphone for other devices
-        return "SmartPhone"
+    """Determine if the device is a tablet, smartwatch or smartphone based on the name."""
+    return device_type_of(device_name)
 
 def main_navigation(output_file=None, log_file=None, iterations=3):
     """Main function to navigate through brands, models, and storage options."""
@@ -551,7 +501,7 @@ def main_navigation(output_file=None, log_file=None, iterations=3):
             driver.quit()
             return
         
-        time.sleep(4)  # Wait for page to load
+        wait_for_page_ready(driver)
         
         # Process each brand
         for brand_value, brand_info in target_brand_map.items():
@@ -565,7 +515,7 @@ def main_navigation(output_file=None, log_file=None, iterations=3):
                 logging.error(f"Failed to load page for brand {brand_display}, skipping")
                 continue
                 
-            time.sleep(4)  # Wait for page to load
+            wait_for_page_ready(driver)
             
             # Find and select brand
             try:
@@ -580,7 +530,6 @@ def main_navigation(output_file=None, log_file=None, iterations=3):
                 # Select the brand
                 brand_dropdown.select_by_value(brand_value)
                 logging.info(f"Selected brand: {brand_display}")
-                time.sleep(3)
             except Exception as e:
                 if "err_internet_disconnected" in str(e).lower():
                     logging.warning(f"Internet disconnected, waiting 30 seconds before retrying...")
@@ -632,13 +581,12 @@ def main_navigation(output_file=None, log_file=None, iterations=3):
                     logging.error(f"Failed to load page for model {model_text}, skipping")
                     continue
                 
-                time.sleep(4)
+                wait_for_page_ready(driver)
                 
                 try:
                     # Select brand again
                     brand_dropdown = Select(driver.find_element(By.ID, "brand"))
                     brand_dropdown.select_by_value(brand_value)
-                    time.sleep(3)
                     
                     # Wait for model dropdown to populate
                     if not wait_for_dropdown_options(driver, "seri"):
@@ -649,7 +597,6 @@ def main_navigation(output_file=None, log_file=None, iterations=3):
                     model_dropdown = Select(driver.find_element(By.ID, "seri"))
                     model_dropdown.select_by_value(model_value)
                     logging.info(f"Selected model: {model_text}")
-                    time.sleep(3)
                 except Exception as e:
                     if "err_internet_disconnected" in str(e).lower():
                         logging.warning(f"Internet disconnected, waiting 30 seconds before retrying...")
@@ -713,13 +660,12 @@ def main_navigation(output_file=None, log_file=None, iterations=3):
                             logging.error(f"Failed to load page for storage {storage_text}, iteration {iteration}, skipping")
                             continue
                         
-                        time.sleep(4)
+                        wait_for_page_ready(driver)
                         
                         try:
                             # Re-select brand
                             brand_dropdown = Select(driver.find_element(By.ID, "brand"))
                             brand_dropdown.select_by_value(brand_value)
-                            time.sleep(3)
                             
                             # Wait for model dropdown to populate
                             if not wait_for_dropdown_options(driver, "seri"):
@@ -729,7 +675,6 @@ def main_navigation(output_file=None, log_file=None, iterations=3):
                             # Re-select model
                             model_dropdown = Select(driver.find_element(By.ID, "seri"))
                             model_dropdown.select_by_value(model_value)
-                            time.sleep(3)
                             
                             # Wait for storage dropdown to populate
                             if not wait_for_dropdown_options(driver, "size_id"):
@@ -755,7 +700,7 @@ def main_navigation(output_file=None, log_file=None, iterations=3):
                             # Click submit
                             submit_button.click()
                             logging.info("Clicked submit button")
-                            time.sleep(5)
+                            wait_for_page_ready(driver)
                             
                             # Create data dictionary for this configuration
                             result_data = {
@@ -808,6 +753,7 @@ def main_navigation(output_file=None, log_file=None, iterations=3):
     
     finally:
         driver.quit()
+        close_sink(output_file)
         logging.info("Browser closed. Navigation complete.")
 
 if __name__ == "__main__":
@@ -817,4 +763,6 @@ if __name__ == "__main__":
     parser.add_argument('-i', '--iterations', type=int, help='Number of iterations with different screen conditions', default=3)
     args = parser.parse_args()
     
+    enable_sleep_budget()
+    
     main_navigation(args.output, args.log, args.iterations)
\ No newline at end of file
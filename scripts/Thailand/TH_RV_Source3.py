@@ -5,11 +5,17 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.service import Service
 from selenium.common.exceptions import TimeoutException, StaleElementReferenceException, ElementNotInteractableException
 from webdriver_manager.chrome import ChromeDriverManager
-import time
-import openpyxl
 from datetime import datetime
 import os
 import re
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.result_sink import get_sink, close_sink
+from common.waits import (enable_sleep_budget, read_text, wait_for_dom_quiet, wait_for_element_count_stable,
+                          wait_for_network_idle, wait_for_page_ready, wait_for_text_change)
+from common.resource_blocking import apply_resource_blocking
+from common.replay import configure_proxy
 
 # Setup Chrome driver with appropriate options
 def setup_driver(headless=True):
@@ -36,7 +42,10 @@ def setup_driver(headless=True):
     # User agent
     options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
     
-    return webdriver.Chrome(options=options)
+    configure_proxy(options)
+    driver = webdriver.Chrome(options=options)
+    apply_resource_blocking(driver, "TH_RV_Source3")
+    return driver
 
 # Function to select dropdowns
 def select_dropdowns(driver, brand, device_type):
@@ -46,7 +55,7 @@ def select_dropdowns(driver, brand, device_type):
     WebDriverWait(driver, 20).until(
         EC.presence_of_element_located((By.ID, "select-brand"))
     )
-    time.sleep(2)  # Additional wait to ensure JavaScript is fully loaded
+    wait_for_page_ready(driver)  # Make sure the page's JavaScript has run
     
     try:
         # Select brand
@@ -55,7 +64,7 @@ def select_dropdowns(driver, brand, device_type):
         )
         Select(brand_dropdown).select_by_value(brand)
         print(f"Selected brand: {brand}")
-        time.sleep(2)  # Wait for the dropdown to update
+        wait_for_element_count_stable(driver, "#select-type option:not([value=''])", stable_ms=300, timeout=10)
 
         # Select type
         type_dropdown = WebDriverWait(driver, 10).until(
@@ -63,7 +72,7 @@ def select_dropdowns(driver, brand, device_type):
         )
         Select(type_dropdown).select_by_value(device_type)
         print(f"Selected type: {device_type}")
-        time.sleep(2)  # Wait for model options to load
+        wait_for_element_count_stable(driver, "#select-model option:not([value=''])", stable_ms=500)  # Wait for model options to load
         
         # Check for model dropdown presence
         WebDriverWait(driver, 15).until(
@@ -104,7 +113,7 @@ def process_model(driver, brand, device_type, model, country="TH", output_file=N
         model_select = Select(model_dropdown)
         model_select.select_by_index(model['index'])
         print(f"Selected model: {model['text']}")
-        time.sleep(2)  # Wait for storage options to load
+        wait_for_element_count_stable(driver, "#select-storage option:not([value=''])", stable_ms=500)  # Wait for storage options to load
         
         # Get all storage options
         WebDriverWait(driver, 15).until(
@@ -135,7 +144,7 @@ def process_model(driver, brand, device_type, model, country="TH", output_file=N
             # For each storage, we start fresh with a new page load
             # This ensures dropdown states are consistent
             driver.get("https://www.kaitorasap.co.th/sale-phone")
-            time.sleep(2)
+            wait_for_page_ready(driver)
             
             # Wait for brand dropdown
             WebDriverWait(driver, 20).until(
@@ -147,14 +156,14 @@ def process_model(driver, brand, device_type, model, country="TH", output_file=N
                 EC.element_to_be_clickable((By.ID, "select-brand"))
             )
             Select(brand_dropdown).select_by_value(brand)
-            time.sleep(1)
+            wait_for_element_count_stable(driver, "#select-type option:not([value=''])", stable_ms=300, timeout=10)
             
             # Reselect type
             type_dropdown = WebDriverWait(driver, 10).until(
                 EC.element_to_be_clickable((By.ID, "select-type"))
             )
             Select(type_dropdown).select_by_value(device_type)
-            time.sleep(1)
+            wait_for_element_count_stable(driver, "#select-model option:not([value=''])", stable_ms=300, timeout=10)
             
             # Reselect model
             model_dropdown = WebDriverWait(driver, 10).until(
@@ -162,7 +171,7 @@ def process_model(driver, brand, device_type, model, country="TH", output_file=N
             )
             model_select = Select(model_dropdown)
             model_select.select_by_index(model['index'])
-            time.sleep(1)
+            wait_for_element_count_stable(driver, "#select-storage option:not([value=''])", stable_ms=300, timeout=10)
             
             # Select the storage
             storage_dropdown = WebDriverWait(driver, 10).until(
@@ -170,7 +179,7 @@ def process_model(driver, brand, device_type, model, country="TH", output_file=N
             )
             storage_select = Select(storage_dropdown)
             storage_select.select_by_index(storage['index'])
-            time.sleep(1)
+            wait_for_dom_quiet(driver, quiet_ms=300, timeout=5)
             
             # For Apple devices, select country
             if brand == "APPLE":
@@ -180,7 +189,7 @@ def process_model(driver, brand, device_type, model, country="TH", output_file=N
                     )
                     Select(country_dropdown).select_by_value(country)
                     print(f"Selected country: {country}")
-                    time.sleep(1)
+                    wait_for_dom_quiet(driver, quiet_ms=300, timeout=5)
                 except Exception as e:
                     print(f"Warning: Could not select country. Error: {e}")
             
@@ -202,7 +211,7 @@ def process_model(driver, brand, device_type, model, country="TH", output_file=N
                 WebDriverWait(driver, 20).until(
                     EC.visibility_of_element_located((By.ID, "bg-select-detail-model"))
                 )
-                time.sleep(2)  # Allow page to stabilize
+                wait_for_dom_quiet(driver)  # Allow page to stabilize
                 
                 # Process each condition
                 conditions = [
@@ -298,7 +307,6 @@ def get_price_for_condition(driver, no_problem=True, scratch_id="scratch_a", dam
             
             # Force visibility and click
             driver.execute_script("arguments[0].style.display = 'block'; arguments[0].style.visibility = 'visible';", no_problem_checkbox)
-            time.sleep(1)
             
             try:
                 no_problem_checkbox.click()
@@ -312,14 +320,13 @@ def get_price_for_condition(driver, no_problem=True, scratch_id="scratch_a", dam
             
             # Force visibility and click
             driver.execute_script("arguments[0].style.display = 'block'; arguments[0].style.visibility = 'visible';", damaged_checkbox)
-            time.sleep(1)
             
             try:
                 damaged_checkbox.click()
             except:
                 driver.execute_script("arguments[0].click();", damaged_checkbox)
         
-        time.sleep(2)  # Wait for scratch section to appear
+        wait_for_dom_quiet(driver, quiet_ms=300, timeout=5)  # Wait for scratch section to appear
 
         # Select scratch radio button via label
         WebDriverWait(driver, 15).until(
@@ -335,9 +342,10 @@ def get_price_for_condition(driver, no_problem=True, scratch_id="scratch_a", dam
         except:
             driver.execute_script("arguments[0].click();", scratch_label)
         
-        time.sleep(2)  # Wait for accessories section to update
+        wait_for_dom_quiet(driver, quiet_ms=300, timeout=5)  # Wait for accessories section to update
 
         # Select "No accessories included"
+        previous_price = read_text(driver, "#price-re")
         acc_label = WebDriverWait(driver, 15).until(
             EC.element_to_be_clickable((By.CSS_SELECTOR, "label[for='acc-n']"))
         )
@@ -347,7 +355,9 @@ def get_price_for_condition(driver, no_problem=True, scratch_id="scratch_a", dam
         except:
             driver.execute_script("arguments[0].click();", acc_label)
         
-        time.sleep(2)  # Wait for price to update
+        # Wait for price to update; the same price for two conditions shows up as a short timeout
+        if not wait_for_text_change(driver, "#price-re", previous_price, timeout=2):
+            wait_for_network_idle(driver, idle_ms=300, timeout=5)
 
         # Extract price
         price_element = WebDriverWait(driver, 15).until(
@@ -365,33 +375,10 @@ def get_price_for_condition(driver, no_problem=True, scratch_id="scratch_a", dam
 
 # Function to save results to Excel
 def save_to_excel(results, output_file):
-    """Save the extracted trade-in data to an Excel file."""
-    # Ensure output directory exists
-    os.makedirs(os.path.dirname(output_file) if os.path.dirname(output_file) else ".", exist_ok=True)
-    
-    # Check if file exists and load it or create new
-    if os.path.exists(output_file):
-        try:
-            workbook = openpyxl.load_workbook(output_file)
-            sheet = workbook.active
-        except Exception as e:
-            print(f"Error opening existing file: {e}. Creating new file.")
-            workbook = openpyxl.Workbook()
-            sheet = workbook.active
-            # Use the column headers from TH_RV_Source1.py
-            headers = ["Country", "Device Type", "Brand", "Model", "Capacity", "Color", 
-                      "Launch RRP", "Condition", "Value Type", "Currency", "Value", 
-                      "Source", "Updated on", "Updated by", "Comments"]
-            sheet.append(headers)
-    else:
-        workbook = openpyxl.Workbook()
-        sheet = workbook.active
-        # Use the column headers from TH_RV_Source1.py
-        headers = ["Country", "Device Type", "Brand", "Model", "Capacity", "Color", 
-                  "Launch RRP", "Condition", "Value Type", "Currency", "Value", 
-                  "Source", "Updated on", "Updated by", "Comments"]
-        sheet.append(headers)
+    """Append the extracted trade-in data to the result sink for output_file.
 
+    Rows are journaled immediately; the Excel file is written once when the sink is closed.
+    """
     # Map device types
     device_type_map = {
         "iPhone": "SmartPhone",
@@ -403,46 +390,28 @@ def save_to_excel(results, output_file):
     # Get the current date
     current_date = datetime.now().strftime("%Y-%m-%d")
 
-    # Add new rows with all the required columns
+    sink = get_sink(output_file)
     for result in results:
-        # Map device type
-        mapped_device_type = device_type_map.get(result["Device_Type"], "SmartPhone")
-        
-        row_data = [
-            "Thailand",  # Country
-            mapped_device_type,  # Device Type
-            result["Brand"],  # Brand
-            result["Model"],  # Model
-            result["Storage"],  # Capacity
-            "",  # Color
-            "",  # Launch RRP
-            result["Condition"],  # Condition
-            "Trade-in",  # Value Type
-            "THB",  # Currency
-            result["Price"],  # Value
-            "TH_RV_Source3",  # Source
-            current_date,  # Updated on
-            "",  # Updated by
-            ""  # Comments
-        ]
-        sheet.append(row_data)
+        sink.append({
+            "Country": "Thailand",
+            "Device Type": device_type_map.get(result["Device_Type"], "SmartPhone"),
+            "Brand": result["Brand"],
+            "Model": result["Model"],
+            "Capacity": result["Storage"],
+            "Color": "",
+            "Launch RRP": "",
+            "Condition": result["Condition"],
+            "Value Type": "Trade-in",
+            "Currency": "THB",
+            "Value": result["Price"],
+            "Source": "TH_RV_Source3",
+            "Updated on": current_date,
+            "Updated by": "",
+            "Comments": ""
+        })
 
-    try:
-        workbook.save(output_file)
-        print(f"Data saved to {output_file}")
-    except Exception as e:
-        print(f"Error saving Excel file: {e}")
-        # Try to save with a different filename as fallback
-        try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            alt_file_name = os.path.join(os.path.dirname(output_file), f"TH_RV_Source3_{timestamp}.xlsx")
-            workbook.save(alt_file_name)
-            print(f"Saved to alternative file: {alt_file_name}")
-        except Exception as e2:
-            print(f"Could not save to alternative file either: {e2}")
-            return False
-    
     return True
+
 def main():
     # Define brands and device types to scrape
     brand_device_types = [
@@ -472,7 +441,7 @@ def main():
             
             # Load the website
             driver.get("https://www.kaitorasap.co.th/sale-phone")
-            time.sleep(3)  # Wait for initial page load
+            wait_for_page_ready(driver)  # Wait for initial page load
             
             # Select brand and device type, get models
             models = select_dropdowns(driver, brand, device_type)
@@ -495,7 +464,9 @@ def main():
         # Close the browser
         print("Closing browser...")
         driver.quit()
+        close_sink(output_file)
         print("Process completed")
 
 if __name__ == "__main__":
+    enable_sleep_budget()
     main()
\ No newline at end of file
@@ -6,11 +6,23 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException
 from webdriver_manager.chrome import ChromeDriverManager
 import time
-import openpyxl
 from datetime import datetime
 import os
 import re
 import argparse
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.result_sink import get_sink, close_sink
+from common.network_capture import capture_for, captured_price, enable_performance_log
+from common.resource_blocking import apply_resource_blocking
+from common.replay import configure_proxy
+from common.device_catalog import device_type_of
+from common.waits import enable_sleep_budget, wait_for_dom_quiet, wait_for_element_count_stable, wait_for_page_ready
+
+# Backend call the price offer step is assumed to read its price from (not yet
+# observed; only used with NETWORK_PRICES=1)
+PRICE_API_PATTERN = r"trade-mobile\.com/.*(price|offer|quote|estimate)"
 
 def setup_driver(headless=True):
     """Set up the Chrome WebDriver with appropriate options."""
@@ -32,21 +44,19 @@ def setup_driver(headless=True):
     
     options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
     
+    # Network events, so prices can be read from the price API response
+    enable_performance_log(options)
+    
+    configure_proxy(options)
     driver = webdriver.Chrome(options=options)
+    apply_resource_blocking(driver, "TH_RV_Source4")
     driver.set_page_load_timeout(60)
     
     return driver
 
 def detect_device_type(device_name):
-    """Determine if the device is a tablet or smartphone based on the name."""
-    device_name_lower = device_name.lower()
-    
-    if any(keyword in device_name_lower for keyword in ["ipad", "i Pad", "tab", "tablet", "galaxy tab"]):
-        return "Tablet"
-    elif any(keyword  in device_name_lower for keyword in ["watch"]):
-        return "SmartWatch"
-    else:
-        return "SmartPhone"
+    """Determine if the device is a tablet, smartwatch or smartphone based on the name."""
+    return device_type_of(device_name)
 
 def go_to_next_page(driver, wait):
     """Attempt to navigate to the next page of results."""
@@ -68,7 +78,7 @@ def go_to_next_page(driver, wait):
         
         # Wait for the page to load and ensure device cards are present
         wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "div[data-v-b4522aa0][data-v-545eeb04]")))
-        time.sleep(1)  # Additional delay for page stability
+        wait_for_dom_quiet(driver)  # Wait for the page to settle
         
         print("Successfully navigated to next page")
         return True
@@ -84,58 +94,11 @@ def go_to_next_page(driver, wait):
         return False
 
 def save_to_excel(data, output_file):
-    """Save the extracted trade-in data to an Excel file."""
-    os.makedirs(os.path.dirname(output_file) if os.path.dirname(output_file) else ".", exist_ok=True)
-    
-    if os.path.exists(output_file):
-        try:
-            workbook = openpyxl.load_workbook(output_file)
-            sheet = workbook.active
-        except:
-            workbook = openpyxl.Workbook()
-            sheet = workbook.active
-            headers = ["Country", "Device Type", "Brand", "Model", "Capacity", "Color", 
-                      "Launch RRP", "Condition", "Value Type", "Currency", "Value", 
-                      "Source", "Updated on", "Updated by", "Comments"]
-            sheet.append(headers)
-    else:
-        workbook = openpyxl.Workbook()
-        sheet = workbook.active
-        headers = ["Country", "Device Type", "Brand", "Model", "Capacity", "Color", 
-                  "Launch RRP", "Condition", "Value Type", "Currency", "Value", 
-                  "Source", "Updated on", "Updated by", "Comments"]
-        sheet.append(headers)
+    """Append the extracted trade-in data to the result sink for output_file.
 
-    row_data = [
-        data["Country"],
-        data["Device Type"],
-        data["Brand"],
-        data["Model"],
-        data["Capacity"],
-        data["Color"],
-        data["Launch RRP"],
-        data["Condition"],
-        data["Value Type"],
-        data["Currency"],
-        data["Value"],
-        data["Source"],
-        data["Updated on"],
-        data["Updated by"],
-        data["Comments"]
-    ]
-    sheet.append(row_data)
-
-    try:
-        workbook.save(output_file)
-        print(f"Saved data to {output_file}")
-    except Exception as e:
-        print(f"Error saving Excel file: {e}")
-        alt_file_name = os.path.join(os.path.dirname(output_file), f"TH_RV_Source4.xlsx")
-        try:
-            workbook.save(alt_file_name)
-            print(f"Saved to {alt_file_name}")
-        except:
-            print("Could not save Excel file")
+    Rows are journaled immediately; the Excel file is written once when the sink is closed.
+    """
+    get_sink(output_file).append(data)
 
 def get_question_section(driver, question_keywords):
     """Find a form section by keywords in multiple languages.
@@ -350,8 +313,8 @@ def fill_form_and_get_price(driver, wait, condition_option):
                 driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", view_price_button)
                 time.sleep(1)
                 print(f"Clicking 'View price offers' button: {view_price_button.text.strip()}")
+                capture_for(driver, [PRICE_API_PATTERN]).clear()
                 view_price_button.click()
-                time.sleep(2)
             else:
                 print("⚠️ Could not find 'View price offers' button")
                 return "NA"
@@ -359,13 +322,15 @@ def fill_form_and_get_price(driver, wait, condition_option):
             print(f"Error clicking 'View price offers' button: {e}")
             return "NA"
         
-        # Wait for price to appear and extract it
+        # Read the price from the price API, falling back to the rendered offer
         try:
-            wait.until(EC.presence_of_element_located((By.XPATH, "//input[@placeholder and @disabled]")))
-            time.sleep(1)
-            
-            price_input = driver.find_element(By.XPATH, "//input[@placeholder and @disabled]")
-            price_value = price_input.get_attribute("placeholder").replace(",", "")
+            price_value = captured_price(driver, PRICE_API_PATTERN)
+            if price_value is None:
+                wait.until(EC.presence_of_element_located((By.XPATH, "//input[@placeholder and @disabled]")))
+                time.sleep(1)
+                
+                price_input = driver.find_element(By.XPATH, "//input[@placeholder and @disabled]")
+                price_value = price_input.get_attribute("placeholder").replace(",", "")
             print(f"✅ Extracted price for {condition_option} condition: {price_value} THB")
             
             # Click "Retrospective" button to go back - try both English and Thai
@@ -383,15 +348,14 @@ def fill_form_and_get_price(driver, wait, condition_option):
                 time.sleep(1)
                 print(f"Clicking 'Back' button: {back_button.text.strip()}")
                 back_button.click()
-                time.sleep(2)
+                wait_for_dom_quiet(driver)
             else:
                 print("⚠️ Could not find 'Back' button, navigating back")
                 driver.back()
-                time.sleep(2)
+                wait_for_dom_quiet(driver)
             
             # Wait for form to reload
             wait.until(EC.presence_of_element_located((By.XPATH, "//div[contains(@class, 'box-shadow rounded mb-5')]")))
-            time.sleep(1)
             
             return price_value
             
@@ -431,7 +395,7 @@ def process_device_with_prices(driver, wait, brand_name, device_title, output_fi
     try:
         # Wait for form sections to load
         wait.until(EC.presence_of_element_located((By.XPATH, "//div[contains(@class, 'box-shadow rounded mb-5')]")))
-        time.sleep(2)  # Give page a moment to fully render
+        wait_for_dom_quiet(driver)  # Wait for the form to finish rendering
         
         # Get capacity section by looking for keywords in multiple languages
         capacity_section = get_question_section(driver, ["Phone capacity", "ความจุของโทรศัพท์"])
@@ -521,7 +485,8 @@ def process_brand(driver, wait, brand_name, brand_url, processed_devices, output
     driver.get(brand_url)
     print(f"Loaded brand page for {brand_name}")
     
-    time.sleep(5)
+    wait_for_page_ready(driver)
+    wait_for_element_count_stable(driver, "div[data-v-b4522aa0][data-v-545eeb04]")
     
     page_num = 1
     continue_processing = True
@@ -568,7 +533,7 @@ def process_brand(driver, wait, brand_name, brand_url, processed_devices, output
                     
                     # Wait for the device page to load
                     wait.until(EC.presence_of_element_located((By.XPATH, "//div[contains(@class, 'box-shadow rounded mb-5')]")))
-                    time.sleep(2)
+                    wait_for_dom_quiet(driver)
                     
                     # Process the device and get prices
                     process_success = process_device_with_prices(driver, wait, brand_name, title, output_file)
@@ -579,14 +544,14 @@ def process_brand(driver, wait, brand_name, brand_url, processed_devices, output
                     # Return to brand page
                     driver.get(brand_url)
                     print(f"Returned to brand page")
-                    time.sleep(5)
+                    wait_for_page_ready(driver)
+                    wait_for_element_count_stable(driver, "div[data-v-b4522aa0][data-v-545eeb04]")
                     
                     if page_num > 1:
                         for _ in range(page_num - 1):
                             if not go_to_next_page(driver, wait):
                                 print(f"Failed to return to page {page_num}")
                                 break
-                            time.sleep(1)
                     
                     if n_scrape is not None and total_scrape_count >= n_scrape:
                         print(f"Completed {n_scrape} scrapes as requested")
@@ -612,14 +577,14 @@ def process_brand(driver, wait, brand_name, brand_url, processed_devices, output
                     print(f"Error processing {title if 'title' in locals() else 'device'}: {e}")
                     driver.get(brand_url)
                     print(f"Returned to brand page due to error")
-                    time.sleep(5)
+                    wait_for_page_ready(driver)
+                    wait_for_element_count_stable(driver, "div[data-v-b4522aa0][data-v-545eeb04]")
                     
                     if page_num > 1:
                         for _ in range(page_num - 1):
                             if not go_to_next_page(driver, wait):
                                 print(f"Failed to return to page {page_num}")
                                 break
-                            time.sleep(1)
                     
                     # Re-fetch device cards
                     device_cards = WebDriverWait(driver, 10).until(
@@ -679,6 +644,7 @@ def main_loop(n_scrape=None, output_file=None):
         driver.save_screenshot(os.path.join(error_folder, "main_loop_error.png"))
     finally:
         driver.quit()
+        close_sink(output_file)
         print(f"Browser closed. Process complete. Processed {total_scrape_count} devices.")
 
 if __name__ == "__main__":
@@ -687,4 +653,6 @@ if __name__ == "__main__":
     parser.add_argument('-o', '--output', type=str, help='Output Excel file path', default=None)
     args = parser.parse_args()
     
+    enable_sleep_budget()
+    
     main_loop(args.n, args.output)
\ No newline at end of file
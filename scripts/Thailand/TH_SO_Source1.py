@@ -10,8 +10,27 @@ import os
 import argparse
 from datetime import datetime
 import traceback
+import sys
 
-def scrape_compasia_prices(output_excel_path="TH_SO_Source1.xlsx", n_scrape=None, headless=True, delay=2.0):
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.shopify import collection_rows, fixture_fetcher, recording_fetcher, fetch_json
+from common.resource_blocking import apply_resource_blocking
+from common.replay import configure_proxy
+from common.result_channel import write_excel, write_excel_rows
+from common.waits import enable_sleep_budget
+
+# Thai condition labels used by the storefront, mapped to English
+CONDITION_MAPPING = {
+    "ดีเยี่ยม": "Excellent",
+    "ดี เยี่ยม": "Excellent", 
+    "excellent": "Excellent",
+    "ดี": "Good",
+    "good": "Good",
+    "พอใช้": "Fair Enough",
+    "fair enough": "Fair Enough"
+}
+
+def scrape_compasia_prices(output_excel_path="TH_SO_Source1.xlsx", n_scrape=None, headless=True, delay=2.0, mode="auto", fixtures=None, save_fixtures=None):
     """
     Scrapes device prices from CompAsia Thailand website and saves results to Excel file
     
@@ -20,6 +39,10 @@ def scrape_compasia_prices(output_excel_path="TH_SO_Source1.xlsx", n_scrape=None
         n_scrape (int, optional): Number of devices to scrape for testing purposes
         headless (bool): Whether to run the browser in headless mode (default: True)
         delay (float): Delay in seconds between actions (default: 2.0)
+        mode (str): "auto" tries the Shopify JSON endpoints and falls back to the browser,
+            "json" uses only the JSON endpoints, "browser" only the browser
+        fixtures (str, optional): Directory of saved products.json responses to read instead of the network
+        save_fixtures (str, optional): Directory to save the fetched products.json responses to
         
     Returns:
         bool: True if successful, False otherwise
@@ -51,6 +74,9 @@ def scrape_compasia_prices(output_excel_path="TH_SO_Source1.xlsx", n_scrape=None
                 "Source", "Updated on", "Updated by", "Comments"
             ])
         
+        # Rows already in the output file, so each save streams only the rows added since
+        saved_rows = len(results_df)
+        
         # Default values for certain columns
         defaults = {
             "Country": "Thailand",
@@ -64,6 +90,32 @@ def scrape_compasia_prices(output_excel_path="TH_SO_Source1.xlsx", n_scrape=None
             "Comments": ""
         }
         
+        # Fast path: read the storefront's products.json instead of clicking through every product
+        if mode != "browser":
+            fetch = fixture_fetcher(fixtures) if fixtures else fetch_json
+            if save_fixtures:
+                fetch = recording_fetcher(save_fixtures, fetch)
+            try:
+                rows = collection_rows(urls, defaults, n_scrape=n_scrape, fetch=fetch, condition_map=CONDITION_MAPPING)
+                new_df = pd.DataFrame(rows, columns=results_df.columns)
+                
+                # Merge with existing data, new prices replace old ones for the same storage + condition
+                results_df = pd.concat([results_df, new_df], ignore_index=True)
+                results_df = results_df.drop_duplicates(subset=['Model', 'Capacity', 'Condition'], keep='last')
+                
+                results_df['Value'] = pd.to_numeric(results_df['Value'], errors='coerce')
+                results_df = results_df.dropna(subset=['Brand', 'Model', 'Value'])
+                os.makedirs(os.path.dirname(output_excel_path) if os.path.dirname(output_excel_path) else ".", exist_ok=True)
+                write_excel(results_df, output_excel_path)
+                print(f"Collected {len(new_df)} prices from the Shopify JSON endpoints")
+                print(f"Final results saved to: {output_excel_path}")
+                return True
+            except Exception as e:
+                if mode == "json" or fixtures:
+                    print(f"Shopify JSON extraction failed: {e}")
+                    return False
+                print(f"Shopify JSON extraction failed ({e}), falling back to the browser")
+        
         # Setup Chrome options
         options = webdriver.ChromeOptions()
         if headless:
@@ -86,8 +138,11 @@ def scrape_compasia_prices(output_excel_path="TH_SO_Source1.xlsx", n_scrape=None
         })
         options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
         
+        configure_proxy(options)
+        
         # Initialize the driver
         driver = webdriver.Chrome(options=options)
+        apply_resource_blocking(driver, "TH_SO_Source1")
         
         def force_translate_page():
             """Force translate the page to English using JavaScript"""
@@ -270,20 +325,11 @@ def scrape_compasia_prices(output_excel_path="TH_SO_Source1.xlsx", n_scrape=None
         
         def map_condition_to_english(thai_condition):
             """Map Thai condition text to English"""
-            condition_mapping = {
-                "ดีเยี่ยม": "Excellent",
-                "ดี เยี่ยม": "Excellent", 
-                "excellent": "Excellent",
-                "ดี": "Good",
-                "good": "Good",
-                "พอใช้": "Fair Enough",
-                "fair enough": "Fair Enough"
-            }
-            return condition_mapping.get(thai_condition.lower(), thai_condition)
+            return CONDITION_MAPPING.get(thai_condition.lower(), thai_condition)
         
         def add_result_to_dataframe(title, storage, condition, price, device_type, brand):
             """Add a result to the dataframe and save to Excel"""
-            nonlocal results_df
+            nonlocal results_df, saved_rows
             
             if price and price != "Price not found":
                 row_data = defaults.copy()
@@ -318,7 +364,7 @@ def scrape_compasia_prices(output_excel_path="TH_SO_Source1.xlsx", n_scrape=None
                 # Save to Excel after each addition
                 try:
                     os.makedirs(os.path.dirname(output_excel_path) if os.path.dirname(output_excel_path) else ".", exist_ok=True)
-                    results_df.to_excel(output_excel_path, index=False)
+                    saved_rows = write_excel_rows(results_df, output_excel_path, saved_rows)
                 except Exception as e:
                     print(f"Error saving to Excel: {e}")
         
@@ -524,7 +570,7 @@ def scrape_compasia_prices(output_excel_path="TH_SO_Source1.xlsx", n_scrape=None
             
             # Final save
             os.makedirs(os.path.dirname(output_excel_path) if os.path.dirname(output_excel_path) else ".", exist_ok=True)
-            results_df.to_excel(output_excel_path, index=False)
+            write_excel(results_df, output_excel_path)
             print(f"\nFinal results saved to: {output_excel_path}")
             print(f"Total products processed: {total_products}")
             print(f"Successful products: {successful_products}")
@@ -538,7 +584,7 @@ def scrape_compasia_prices(output_excel_path="TH_SO_Source1.xlsx", n_scrape=None
         if 'results_df' in locals() and not results_df.empty:
             try:
                 os.makedirs(os.path.dirname(output_excel_path) if os.path.dirname(output_excel_path) else ".", exist_ok=True)
-                results_df.to_excel(output_excel_path, index=False)
+                write_excel(results_df, output_excel_path)
                 print(f"Saved partial results to {output_excel_path}")
             except Exception as save_error:
                 print(f"Error saving partial results: {save_error}")
@@ -557,8 +603,13 @@ if __name__ == "__main__":
     parser.add_argument('-o', '--output', type=str, help='Output Excel file path', default="TH_SO_Source1.xlsx")
     parser.add_argument('--no-headless', action='store_true', help='Disable headless mode (show browser)')
     parser.add_argument('-d', '--delay', type=float, help='Delay between actions (lower = faster but may be less reliable)', default=2.0)
+    parser.add_argument('--mode', choices=['auto', 'json', 'browser'], default='auto', help='auto: Shopify JSON with browser fallback (default), json: JSON only, browser: browser only')
+    parser.add_argument('--fixtures', type=str, help='Read saved products.json responses from this directory (offline testing)', default=None)
+    parser.add_argument('--save-fixtures', type=str, help='Save fetched products.json responses to this directory', default=None)
     args = parser.parse_args()
     
+    enable_sleep_budget()
+    
     output_excel_path = args.output
     os.makedirs(os.path.dirname(output_excel_path) if os.path.dirname(output_excel_path) else ".", exist_ok=True)
     print(f"Saving output to: {output_excel_path}")
@@ -567,7 +618,10 @@ if __name__ == "__main__":
         output_excel_path, 
         n_scrape=args.n, 
         headless=not args.no_headless,
-        delay=args.delay
+        delay=args.delay,
+        mode=args.mode,
+        fixtures=args.fixtures,
+        save_fixtures=args.save_fixtures
     )
     
     if success:
@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+"""Benchmark scrapers and store the metrics as JSON.
+
+    python benchmark.py SG_SO_Source3 SG_RV_Source8 -n 3
+    python benchmark.py SG_SO_Source3 --replay --compare benchmarks/bench_20250101_120000.json
+
+Each source is run through common.benchmark (WebDriver command, page load and
+sleep counters) while this process samples the peak memory of the scraper
+and its Chrome processes. With --replay the run is served from the source's
+replay_archives/<source>.har (see replay_scraper.py) so results are
+comparable between commits; otherwise the live sites are used and -n keeps
+the run short. Results go to benchmarks/bench_<timestamp>.json.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from datetime import datetime
+
+from common.result_sink import read_source_file
+from common.registry import REGISTRIES, build_command, output_path, scrapers
+from common.replay import run_with_proxy
+
+try:
+    import psutil
+except ImportError:
+    # Memory figures are reported as null without psutil
+    psutil = None
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCHMARK_DIR = os.path.join(SCRIPTS_DIR, "benchmarks")
+ARCHIVE_DIR = os.path.join(SCRIPTS_DIR, "replay_archives")
+
+# Metrics compared by --compare, and whether lower is better
+COMPARED_METRICS = {
+    "wall_seconds": True,
+    "page_loads": True,
+    "webdriver_commands": True,
+    "sleep_seconds": True,
+    "rows": False,
+    "rows_per_second": False,
+    "peak_rss_python_mb": True,
+    "peak_rss_chrome_mb": True,
+}
+
+
+def all_sources():
+    """{source name: (country, script)} for every registered scraper."""
+    sources = {}
+    for country in REGISTRIES:
+        for script in scrapers(country, include_disabled=True):
+            sources[os.path.splitext(script)[0]] = (country, script)
+    return sources
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPTS_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_monitored(command, env, memory, interval=0.5):
+    """Run command, sampling peak RSS (MB) of it and its Chrome descendants into memory."""
+    process = subprocess.Popen(command, env=env, cwd=SCRIPTS_DIR)
+    if psutil is None:
+        return process.wait()
+
+    try:
+        root = psutil.Process(process.pid)
+    except psutil.Error:
+        return process.wait()
+    while process.poll() is None:
+        python_mb = chrome_mb = 0.0
+        try:
+            python_mb = root.memory_info().rss / (1024 * 1024)
+            for child in root.children(recursive=True):
+                try:
+                    chrome_mb += child.memory_info().rss / (1024 * 1024)
+                except psutil.Error:
+                    continue
+        except psutil.Error:
+            pass
+        memory["python"] = max(memory["python"], python_mb)
+        memory["chrome"] = max(memory["chrome"], chrome_mb)
+        time.sleep(interval)
+    return process.returncode
+
+
+def count_rows(file):
+    try:
+        df = read_source_file(file)
+    except Exception as e:
+        print(f"Could not read {file}: {e}")
+        return 0
+    return 0 if df is None else len(df)
+
+
+def benchmark_source(source, country, script, n_scrape, replay, run_dir):
+    """Run one source and return its metrics dict."""
+    output_dir = os.path.join(run_dir, source)
+    os.makedirs(output_dir, exist_ok=True)
+    command, env = build_command(country, script, n_scrape, output_dir)
+    metrics_file = os.path.join(output_dir, "metrics.json")
+    env["BENCHMARK_METRICS_FILE"] = metrics_file
+    command = [sys.executable, "-m", "common.benchmark"] + command[1:]
+
+    memory = {"python": 0.0, "chrome": 0.0}
+    run = lambda command, env: run_monitored(command, env, memory)
+    proxy_stats = None
+    print(f"=== {source} ({'replay' if replay else 'live'}) ===")
+    start = time.time()
+    if replay:
+        archive = os.path.join(ARCHIVE_DIR, f"{source}.har")
+        returncode, proxy_stats = run_with_proxy("replay", archive, command, env, run)
+    else:
+        returncode = run(command, env)
+    wall_seconds = time.time() - start
+
+    result = {
+        "source": source,
+        "country": country,
+        "mode": "replay" if replay else "live",
+        "returncode": returncode,
+        "wall_seconds": round(wall_seconds, 2),
+    }
+    try:
+        with open(metrics_file) as f:
+            result.update(json.load(f))
+    except (OSError, ValueError):
+        print(f"No in-process metrics for {source}")
+
+    rows = count_rows(output_path(country, script, output_dir))
+    result["rows"] = rows
+    result["rows_per_second"] = round(rows / wall_seconds, 3) if wall_seconds else None
+    result["peak_rss_python_mb"] = round(memory["python"], 1) if psutil is not None else None
+    result["peak_rss_chrome_mb"] = round(memory["chrome"], 1) if psutil is not None else None
+    if proxy_stats is not None:
+        result["replay"] = proxy_stats
+    return result
+
+
+def compare(current, baseline_file):
+    """Print per-source changes against an earlier benchmark file."""
+    with open(baseline_file) as f:
+        baseline = {r["source"]: r for r in json.load(f)["results"]}
+    print(f"\nCompared with {baseline_file}:")
+    for result in current["results"]:
+        before = baseline.get(result["source"])
+        if before is None:
+            print(f"  {result['source']}: not in baseline")
+            continue
+        changes = []
+        for metric, lower_is_better in COMPARED_METRICS.items():
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = change > 0 if lower_is_better else change < 0
+            marker = " (regression)" if worse and abs(change) >= 0.1 else ""
+            changes.append(f"{metric} {old} -> {new} ({change:+.0%}){marker}")
+        print(f"  {result['source']}: " + ("; ".join(changes) or "no comparable metrics"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark scrapers and store the metrics as JSON')
+    parser.add_argument('sources', nargs='*', help='Sources to run, e.g. SG_SO_Source3 (default: all enabled, '
+                        'or all with an archive when --replay is given)')
+    parser.add_argument('-n', type=int, help='Number of items to scrape per source (default: 3)', default=3)
+    parser.add_argument('--replay', action='store_true', help='Serve each run from its recorded archive')
+    parser.add_argument('-o', '--output', help='Result file (default: benchmarks/bench_<timestamp>.json)', default=None)
+    parser.add_argument('--compare', help='Earlier result file to compare against', default=None)
+    args = parser.parse_args()
+
+    known = all_sources()
+    if args.sources:
+        unknown = [source for source in args.sources if source not in known]
+        if unknown:
+            parser.error(f"Unknown sources: {', '.join(unknown)}")
+        sources = args.sources
+    elif args.replay:
+        sources = [source for source in known if os.path.exists(os.path.join(ARCHIVE_DIR, f"{source}.har"))]
+    else:
+        sources = [os.path.splitext(script)[0] for country in REGISTRIES for script in scrapers(country)]
+    if not sources:
+        parser.error("No sources to benchmark")
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    run_dir = os.path.join(BENCHMARK_DIR, f"run_{timestamp}")
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "n": args.n,
+        "mode": "replay" if args.replay else "live",
+        "results": [],
+    }
+    for source in sources:
+        country, script = known[source]
+        report["results"].append(benchmark_source(source, country, script, args.n, args.replay, run_dir))
+
+    output = args.output or os.path.join(BENCHMARK_DIR, f"bench_{timestamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'source':<16}{'rc':>4}{'wall s':>9}{'pages':>7}{'cmds':>7}{'sleep s':>9}{'rows':>7}{'rows/s':>8}{'py MB':>8}{'chrome MB':>11}")
+    for r in report["results"]:
+        print(f"{r['source']:<16}{r['returncode']:>4}{r['wall_seconds']:>9.1f}{r.get('page_loads', '-'):>7}"
+              f"{r.get('webdriver_commands', '-'):>7}{r.get('sleep_seconds', 0):>9.1f}{r['rows']:>7}"
+              f"{r['rows_per_second'] or 0:>8.2f}{r['peak_rss_python_mb'] or 0:>8.0f}{r['peak_rss_chrome_mb'] or 0:>11.0f}")
+    print(f"Saved benchmark results to {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Helpers shared by the country scrapers and their parallel runners."""
@@ -0,0 +1,94 @@
+"""In-process instrumentation for benchmark runs of a scraper.
+
+    python -m common.benchmark Singapore/SG_SO_Source3.py -n 3
+
+runs the script as __main__ after patching WebDriver.execute (to count
+WebDriver commands and page loads) and turning on the sleep budget from
+common.waits. When the script finishes, the counters are written as JSON to
+BENCHMARK_METRICS_FILE. benchmark.py adds the process-level metrics (wall
+time, rows, peak memory) around it.
+"""
+import os
+import sys
+import json
+import time
+import runpy
+import threading
+from collections import Counter
+
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from common.waits import enable_sleep_budget, sleep_budget
+from common.watchdog import operation_stats
+
+_lock = threading.Lock()
+_commands = Counter()
+_command_seconds = [0.0]
+_started = time.time()
+
+
+def install():
+    """Count every WebDriver command issued in this process and account sleeps."""
+    original_execute = WebDriver.execute
+
+    def execute(self, driver_command, params=None):
+        start = time.time()
+        try:
+            return original_execute(self, driver_command, params)
+        finally:
+            with _lock:
+                _commands[driver_command] += 1
+                _command_seconds[0] += time.time() - start
+
+    WebDriver.execute = execute
+    enable_sleep_budget()
+
+
+def metrics():
+    """Counters collected since install()."""
+    budget = sleep_budget()
+    with _lock:
+        commands = dict(_commands)
+        command_seconds = _command_seconds[0]
+    return {
+        "runtime_seconds": time.time() - _started,
+        "page_loads": commands.get("get", 0),
+        "webdriver_commands": sum(commands.values()),
+        "webdriver_seconds": command_seconds,
+        "webdriver_commands_by_name": dict(Counter(commands).most_common(15)),
+        "sleep_seconds": budget["sleep_seconds"],
+        "sleep_calls": budget["sleep_calls"],
+        "wait_seconds": budget["wait_seconds"],
+        "wait_calls": budget["wait_calls"],
+        "top_sleep_sites": budget["top_sleep_sites"][:5],
+        "operation_timings": operation_stats(),
+    }
+
+
+def write_metrics(path):
+    try:
+        with open(path, "w") as f:
+            json.dump(metrics(), f, indent=2)
+    except OSError as e:
+        print(f"Could not write benchmark metrics to {path}: {e}")
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python -m common.benchmark <script> [args...]")
+        sys.exit(2)
+    script = os.path.abspath(sys.argv[1])
+    sys.argv = [script] + sys.argv[2:]
+    sys.path.insert(0, os.path.dirname(script))
+
+    install()
+    path = os.environ.get("BENCHMARK_METRICS_FILE")
+    try:
+        runpy.run_path(script, run_name="__main__")
+    finally:
+        if path:
+            write_metrics(path)
+
+
+if __name__ == "__main__":
+    main()
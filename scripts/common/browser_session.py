@@ -0,0 +1,88 @@
+"""Per-worker browser session guarded by its own watchdog (the Carousell scrapers).
+
+A session owns one pooled driver and times the operations run in it with a
+common.watchdog.Watchdog. When an operation runs past its deadline the
+browser's process tree is killed, the session is flagged as frozen and the
+worker swaps in a warm browser before its next step; the watchdog keeps
+guarding the operations after that. Because this state lives on the session
+rather than in module globals, several sessions can scrape side by side, one
+per worker thread (see fanout.fan_out_sessions).
+"""
+import time
+import threading
+
+from common.watchdog import Watchdog
+
+# Seconds a single operation may run before the browser is considered frozen
+OPERATION_TIMEOUT = 30
+
+
+class BrowserSession:
+    """One browser leased from a DriverPool plus the watchdog that guards it."""
+
+    def __init__(self, pool, name="browser", timeout=OPERATION_TIMEOUT):
+        self.pool = pool
+        self.name = name
+        self.driver = pool.acquire()
+        self.current_operation = "idle"
+        self.is_frozen = False
+        self._token = None
+        self._lock = threading.Lock()
+        self.watchdog = Watchdog(on_timeout=self._on_timeout, timeout=timeout)
+
+    def _on_timeout(self, operation_name, elapsed):
+        print(f"⚠️ TIMEOUT DETECTED [{self.name}]: Operation '{operation_name}' is taking too long ({elapsed:.0f}s)!")
+        with self._lock:
+            self.is_frozen = True
+            driver, self.driver = self.driver, None
+        if driver is not None:
+            print(f"Terminating frozen browser [{self.name}]...")
+            self.pool.discard(driver, force=True)
+
+    def start_operation(self, operation_name, timeout=None):
+        """Start timing an operation that the watchdog should guard."""
+        self.end_operation()
+        self.current_operation = operation_name
+        self._token = self.watchdog.start(operation_name, timeout)
+        print(f"Starting operation [{self.name}]: {operation_name}")
+
+    def end_operation(self):
+        token, self._token = self._token, None
+        self.current_operation = "idle"
+        if token is not None:
+            self.watchdog.end(token)
+
+    def operation(self, operation_name, timeout=None):
+        """Context manager guarding one operation, e.g. with session.operation("navigate"): ..."""
+        return self.watchdog.operation(operation_name, timeout)
+
+    @property
+    def needs_restart(self):
+        return self.driver is None or self.is_frozen
+
+    def restart(self):
+        """Swap the current browser for a warm one from the pool."""
+        print(f"🔄 Restarting browser [{self.name}]...")
+        with self._lock:
+            driver, self.driver = self.driver, None
+        try:
+            # The old browser is killed in the background; the spare is usually already running
+            driver = self.pool.replace(driver)
+            print("Browser restarted successfully")
+        except Exception as e:
+            print(f"Error restarting browser: {e}")
+            # Emergency sleep to allow system to recover
+            time.sleep(30)
+            driver = self.pool.acquire()
+        with self._lock:
+            self.driver = driver
+            self.is_frozen = False
+        return driver
+
+    def close(self):
+        """Stop the watchdog and hand the browser back to the pool."""
+        self.end_operation()
+        self.watchdog.close()
+        with self._lock:
+            driver, self.driver = self.driver, None
+        self.pool.release(driver)
@@ -0,0 +1,217 @@
+"""Canonical model IDs that line up the same device across sources.
+
+Sources spell one device differently ("iPhone 15 Pro Max 256GB", "Apple iPhone
+15 Pro Max", the URL-derived "Iphone 15 Pro Max"), so a name is reduced to a
+key first: brand from device_catalog, then the lower-cased model tokens with
+the brand, capacity, colours, connectivity and other listing noise removed.
+Names with the same key share an ID such as "apple-iphone-15-pro-max".
+
+A key seen for the first time is matched approximately against the catalog.
+Candidates come from an index keyed on the tokens that tell models apart
+(numbers, short tokens like "S"/"FE", and variant words like Pro, Max, Ultra),
+so "iPhone 15" is never merged into "iPhone 15 Pro". Among the candidates of
+the same brand (of any brand if none was detected) the closest key by
+character-trigram similarity is taken if it is similar enough, otherwise the
+key becomes a new catalog entry.
+
+Every raw (brand, model) pair is resolved once per process and cached, and
+ModelResolver.assign() works per distinct pair, so a consolidation-sized frame
+costs one dictionary lookup per row. The catalog (IDs and the keys mapped to
+them) is kept in canonical_models.json; CANONICAL_MODELS overrides its location.
+"""
+import os
+import re
+import json
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+
+from common.device_catalog import BRAND_KEYWORDS, CAPACITY_PATTERN, UNKNOWN_BRAND, brand_of
+
+logger = logging.getLogger("scraper_manager")
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CATALOG = os.path.join(SCRIPTS_DIR, "canonical_models.json")
+
+CANONICAL_COLUMN = "Canonical Model ID"
+
+# Minimum trigram (Dice) similarity for a new key to join an existing model
+MATCH_THRESHOLD = 0.8
+
+# Listing details that are not part of the model name
+NOISE_PATTERN = re.compile(
+    r"\b(?:[345]g|lte|wi-?fi|cellular|gps|dual[\s-]?sim|e?sim|unlocked|refurbished|renewed|used|"
+    r"\d+\s?mm|ram|rom|storage|smartphone|mobile\s?phone|"
+    r"black|white|silver|gold|rose|blue|green|red|purple|pink|yellow|orange|gr[ae]y|graphite|"
+    r"midnight|starlight|natural|titanium|space|phantom|lavender|cream|violet|mint|coral)\b",
+    re.IGNORECASE)
+ORDINAL_PATTERN = re.compile(r"\b(\d+)(?:st|nd|rd|th)\b", re.IGNORECASE)
+REWRITES = [
+    # RAM + storage ("12GB+512GB") goes with the capacity, not as "plus"
+    (re.compile(r"\d+(?:\.\d+)?\s*[GT]B\s*[+/]", re.IGNORECASE), " "),
+    (re.compile(r"pro\s?max", re.IGNORECASE), " pro max "),
+    (re.compile(r"\+"), " plus "),
+    (re.compile(r"\bgeneration\b", re.IGNORECASE), " gen "),
+]
+TOKEN_PATTERN = re.compile(r"[a-z]+|\d+")
+
+# Words that add nothing once the brand is known
+FILLER_WORDS = {name.lower() for name in BRAND_KEYWORDS} | {"galaxy"}
+
+# Words that distinguish one model of a line from another
+VARIANT_WORDS = {"pro", "max", "plus", "ultra", "mini", "lite", "air", "fold", "flip", "note",
+                 "edge", "neo", "prime", "power", "play", "go", "fe", "se", "xl", "xr", "xs"}
+
+
+def model_tokens(name):
+    """Lower-cased tokens of a model name without brand, capacity, colour and listing noise."""
+    text = str(name or "")
+    for pattern, replacement in REWRITES:
+        text = pattern.sub(replacement, text)
+    text = CAPACITY_PATTERN.sub(" ", text)
+    text = ORDINAL_PATTERN.sub(r"\1", text)
+    text = NOISE_PATTERN.sub(" ", text)
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in FILLER_WORDS]
+
+
+def _signature(tokens):
+    """Tokens two names must share exactly to be considered the same model."""
+    return tuple(token for token in tokens if token.isdigit() or len(token) <= 3 or token in VARIANT_WORDS)
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _dice(a, b):
+    return 2 * len(a & b) / (len(a) + len(b)) if a and b else 0.0
+
+
+def _slug(text):
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+
+class ModelResolver:
+    """Catalog of canonical models with a cached name -> ID resolution."""
+
+    def __init__(self, path=None):
+        self.path = path or os.environ.get("CANONICAL_MODELS", DEFAULT_CATALOG)
+        self.models = {}    # ID -> display name
+        self.aliases = {}   # "brand|tokens" key -> ID
+        self._blocks = {}   # signature -> [(brand, ID, trigrams)]
+        self._cache = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable model catalog {self.path}: {e}")
+            return
+        self.models.update(data.get("models", {}))
+        for key, model_id in data.get("aliases", {}).items():
+            self._index(key, model_id)
+
+    def _index(self, key, model_id, signature=None):
+        self.aliases[key] = model_id
+        brand, _, text = key.partition("|")
+        if signature is None:
+            signature = _signature(text.split())
+        self._blocks.setdefault(signature, []).append((brand, model_id, _trigrams(text)))
+
+    def _closest(self, brand, text, signature):
+        """ID of the most similar indexed key of the same brand (any brand if unknown) and signature."""
+        unknown = brand == UNKNOWN_BRAND.lower()
+        candidates = [(model_id, trigrams) for candidate_brand, model_id, trigrams in self._blocks.get(signature, ())
+                      if unknown or candidate_brand == brand]
+        if not candidates:
+            return None
+        query = _trigrams(text)
+        score, model_id = max((_dice(query, trigrams), model_id) for model_id, trigrams in candidates)
+        return model_id if score >= MATCH_THRESHOLD else None
+
+    def _resolve(self, name, brand):
+        brand = brand_of(name, default="") or brand_of(brand, default="") or brand.strip() or UNKNOWN_BRAND
+        tokens = model_tokens(name)
+        if not tokens:
+            return ""
+        text = " ".join(tokens)
+        key = f"{brand.lower()}|{text}"
+        model_id = self.aliases.get(key)
+        if model_id is None:
+            signature = _signature(tokens)
+            model_id = self._closest(brand.lower(), text, signature)
+            if model_id is None:
+                model_id = _slug(f"{brand} {text}")
+                self.models.setdefault(model_id, re.sub(r"\s+", " ", CAPACITY_PATTERN.sub(" ", str(name))).strip())
+            self._index(key, model_id, signature)
+            self._dirty = True
+        return model_id
+
+    def resolve(self, name, brand=""):
+        """Canonical Model ID of one model name, or "" if the name has no model tokens."""
+        with self._lock:
+            cache_key = (brand, name)
+            model_id = self._cache.get(cache_key)
+            if model_id is None:
+                model_id = self._cache[cache_key] = self._resolve(name, brand)
+            return model_id
+
+    def assign(self, df, model_column="Model", brand_column="Brand"):
+        """Return df with a Canonical Model ID column, resolving each distinct (Brand, Model) once."""
+        if df is None or df.empty or model_column not in df.columns:
+            return df
+        df = df.copy()
+        model_codes, models = pd.factorize(df[model_column].fillna("").astype(str))
+        if brand_column in df.columns:
+            brand_codes, brands = pd.factorize(df[brand_column].fillna("").astype(str))
+        else:
+            brand_codes, brands = np.zeros(len(df), dtype=np.intp), pd.Index([""])
+        # One integer per distinct (Brand, Model) pair
+        codes, pairs = pd.factorize(brand_codes.astype(np.int64) * len(models) + model_codes)
+        ids = np.array([self.resolve(models[pair % len(models)], brands[pair // len(models)]) for pair in pairs],
+                       dtype=object)
+        df[CANONICAL_COLUMN] = ids[codes]
+        return df
+
+    def save(self):
+        """Write the catalog if it gained entries, merged with what other processes saved meanwhile."""
+        with self._lock:
+            if not self._dirty:
+                return False
+            data = {"models": {}, "aliases": {}}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, encoding="utf-8") as f:
+                        data = json.load(f)
+                except (OSError, ValueError):
+                    pass
+            data.setdefault("models", {}).update(self.models)
+            data.setdefault("aliases", {}).update(self.aliases)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+            return True
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_resolver():
+    """The process-wide ModelResolver, so every consolidator fills the same catalog."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = ModelResolver()
+        return _shared
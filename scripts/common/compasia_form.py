@@ -0,0 +1,167 @@
+"""Navigation helpers for the CompAsia trade-in portals.
+
+The SG, StarHub, M1 and MY CompAsia microsites share one front end: device type
+card, brand/model/variant react-selects, a diagnostic form whose screen
+condition radios are labelled LCDS-01-<condition>, and a pricing page.
+"""
+import time
+
+from selenium.webdriver.support.ui import WebDriverWait
+
+from common.waits import read_text, wait_for_text_change
+
+# Present whenever the diagnostic form is on screen
+DIAGNOSTIC_FORM_SELECTOR = 'label[for^="LCDS-01-"]'
+PRICE_SELECTOR = '.pricing-display-price'
+# JSON call the pricing page is assumed to be rendered from (for common.network_capture;
+# not yet observed, so only used with NETWORK_PRICES=1)
+QUOTE_API_PATTERN = r"compasia\.com/.*(quote|pric)"
+
+
+def diagnostic_form_ready(driver, timeout=10):
+    """Wait up to timeout seconds for the diagnostic form and report whether it is shown."""
+    script = f"return document.querySelector('{DIAGNOSTIC_FORM_SELECTOR}') !== null;"
+    try:
+        if timeout <= 0:
+            return bool(driver.execute_script(script))
+        WebDriverWait(driver, timeout, 0.25).until(lambda d: d.execute_script(script))
+        return True
+    except Exception:
+        return False
+
+
+def select_screen_condition(driver, screen_condition):
+    """Toggle the screen condition radio on the diagnostic form."""
+    return bool(driver.execute_script(f"""
+        var label = document.querySelector('label[for="LCDS-01-{screen_condition}"]');
+        if (!label) {{
+            return false;
+        }}
+        label.scrollIntoView({{block: 'center'}});
+        label.click();
+        return true;
+    """))
+
+
+def read_price_text(driver):
+    """Return the displayed price text, or '' if the pricing page is not shown."""
+    return read_text(driver, PRICE_SELECTOR)
+
+
+def wait_for_price_change(driver, previous_text, timeout=5):
+    """Wait until the displayed price differs from previous_text.
+
+    Two conditions can legitimately have the same price, so a timeout is not an error.
+    """
+    return wait_for_text_change(driver, PRICE_SELECTOR, previous_text, timeout)
+
+
+def return_to_diagnostic_form(driver, timeout=10):
+    """Step back from the pricing page to the diagnostic form without reloading the portal."""
+    # Quote rendered inline under the form: nothing to do
+    if diagnostic_form_ready(driver, 0):
+        return True
+
+    # In-page back/edit button
+    clicked = driver.execute_script("""
+        var buttons = document.querySelectorAll('button, a');
+        for (var i = 0; i < buttons.length; i++) {
+            var text = buttons[i].textContent.trim().toLowerCase();
+            var cls = (buttons[i].className || '').toString();
+            if (cls.indexOf('progress-button-back') !== -1 || text === 'back' || text === 'previous') {
+                buttons[i].scrollIntoView({block: 'center'});
+                buttons[i].click();
+                return true;
+            }
+        }
+        return false;
+    """)
+    if clicked and diagnostic_form_ready(driver, timeout):
+        return True
+
+    # Browser history (the portals are single-page apps with routed steps)
+    try:
+        driver.back()
+    except Exception:
+        return False
+    return diagnostic_form_ready(driver, timeout)
+
+
+class ConditionSweep:
+    """State machine that prices every screen condition for one device selection.
+
+    States:
+        START        - nothing selected; select_device() loads the portal and
+                       fills type/brand/model/variant up to the diagnostic form
+        DIAGNOSTIC   - diagnostic form on screen
+        QUOTED       - pricing page on screen
+
+    The device is selected once. Between conditions the sweep only steps back
+    to the diagnostic form and toggles the screen condition radio; a full
+    re-navigation happens only if stepping back fails.
+
+    Callbacks:
+        select_device()                 -> bool, ends on the diagnostic form
+        request_quote(condition, first) -> bool, fills the form (fully when
+                                           first is True, otherwise only the
+                                           screen condition) and submits it
+        extract(condition)              -> bool, reads and saves the price
+    """
+
+    START = "START"
+    DIAGNOSTIC = "DIAGNOSTIC"
+    QUOTED = "QUOTED"
+
+    def __init__(self, driver, select_device, request_quote, extract):
+        self.driver = driver
+        self.select_device = select_device
+        self.request_quote = request_quote
+        self.extract = extract
+        self.state = self.START
+        self.full_navigations = 0
+        self._form_filled = False
+
+    def _ensure_diagnostic(self):
+        if self.state == self.QUOTED:
+            if return_to_diagnostic_form(self.driver):
+                self.state = self.DIAGNOSTIC
+                return True
+            print("Could not step back to the diagnostic form, re-navigating")
+            self.state = self.START
+        if self.state == self.START:
+            self.full_navigations += 1
+            self._form_filled = False
+            if not self.select_device():
+                return False
+            self.state = self.DIAGNOSTIC
+        return True
+
+    def run(self, screen_conditions):
+        """Price each condition in turn and return {condition: success}."""
+        results = {}
+        for condition in screen_conditions:
+            try:
+                # Read the last quote before stepping back, which takes the pricing page off screen
+                previous_price = read_price_text(self.driver) if self.state == self.QUOTED else ""
+                if not self._ensure_diagnostic():
+                    results[condition] = False
+                    self.state = self.START
+                    continue
+
+                if not self.request_quote(condition, not self._form_filled):
+                    results[condition] = False
+                    self.state = self.START
+                    continue
+                self._form_filled = True
+                self.state = self.QUOTED
+
+                # Make sure a re-quote is not read before the new price renders
+                if previous_price:
+                    wait_for_price_change(self.driver, previous_price)
+                results[condition] = bool(self.extract(condition))
+            except Exception as e:
+                print(f"Condition sweep failed for {condition}: {e}")
+                results[condition] = False
+                self.state = self.START
+            time.sleep(0.5)
+        return results
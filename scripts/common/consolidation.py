@@ -0,0 +1,351 @@
+"""Combining scraper output files for the runners.
+
+Consolidator merges every source's .xlsx and pending result-sink journal into
+one frame, re-reading only files that changed and keeping sources followed
+over a result channel in memory. write_delta records what changed since the
+previous run's combined file.
+"""
+import os
+import shutil
+import logging
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+from common.canonical_models import shared_resolver
+from common.device_catalog import fill_missing
+from common.price_store import SERIES_COLUMNS
+from common.result_sink import COLUMNS, journal_path, read_source_file
+
+logger = logging.getLogger("scraper_manager")
+
+
+def _file_signature(path):
+    """Return (mtime, size) for path, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def source_signature(file):
+    """Signature of a scraper output: its .xlsx plus its result-sink journal."""
+    return (_file_signature(file), _file_signature(journal_path(file)))
+
+
+class Consolidator:
+    """Incrementally combine scraper output files.
+
+    Parsed frames are cached per source keyed by (path, mtime, size) of the
+    .xlsx and its journal, so only files that changed since the last call are
+    re-read. The combined frame is built with a single concat and is only
+    rewritten to disk when at least one source changed. Each freshly read
+    source gets its Canonical Model ID column from the shared model resolver.
+
+    Sources followed through a scraper's result channel (following()) are kept
+    in memory instead: streamed rows are appended to the file's contents at the
+    time the scraper started, a snapshot replaces them, and only the rows added
+    since the last combination are converted to a frame.
+    """
+
+    def __init__(self, resolver=None):
+        self.resolver = resolver or shared_resolver()
+        self._frames = {}
+        self._combined = None
+        self._combined_key = None
+        self._written = {}
+        self._live = {}
+        self._live_version = 0
+        self._records = []
+        self._records_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+    def _load(self, file):
+        signature = source_signature(file)
+        cached = self._frames.get(file)
+        if cached is not None and cached[0] == signature:
+            return cached[1], False
+        if signature == (None, None):
+            self._frames.pop(file, None)
+            logger.warning(f"File not found: {file}")
+            return None, cached is not None
+        try:
+            df = self.resolver.assign(fill_missing(read_source_file(file)))
+        except Exception as e:
+            logger.error(f"Error reading {file}: {e}")
+            # Keep serving the last good frame for this source
+            return (cached[1] if cached else None), False
+        self._frames[file] = (signature, df)
+        logger.info(f"Read {0 if df is None else len(df)} rows from {file}")
+        return df, True
+
+    def _live_frame(self, live):
+        """Frame of a followed source, converting only the rows received since the last call."""
+        if live["rows"]:
+            live["frames"].append(self.resolver.assign(fill_missing(pd.DataFrame(live["rows"]))))
+            live["rows"] = []
+        if len(live["frames"]) > 1:
+            live["frames"] = [pd.concat(live["frames"], ignore_index=True)]
+        return live["frames"][0] if live["frames"] else None
+
+    def _follow(self, file):
+        file = os.path.abspath(file)
+        with self._lock:
+            self._apply_records()
+            # The base a streaming scraper appends to: the file as it is before the scraper starts
+            base = self._load(file)[0] if source_signature(file) != (None, None) else None
+            self._live_version += 1
+            self._live[file] = {"frames": [] if base is None else [base], "rows": [],
+                                "version": self._live_version, "received": False, "complete": False}
+
+    def feed(self, record):
+        """Queue one result-channel record (row, snapshot or done) for the followed sources.
+
+        Records are only queued here, so the runner's event loop never waits
+        for a combination in progress; they are applied by the next combine.
+        """
+        if record.get("type") not in ("row", "snapshot", "done") or not record.get("output"):
+            return
+        record = dict(record, output=os.path.abspath(record["output"]))
+        with self._records_lock:
+            if record["type"] == "snapshot":
+                # A snapshot supersedes everything still queued for its file
+                self._records = [queued for queued in self._records if queued["output"] != record["output"]]
+            self._records.append(record)
+
+    def _apply_records(self):
+        with self._records_lock:
+            records, self._records = self._records, []
+        for record in records:
+            kind, file = record["type"], record["output"]
+            live = self._live.get(file)
+            if kind == "snapshot":
+                live = self._live[file] = {"frames": [], "rows": list(record.get("rows") or []),
+                                           "received": True, "complete": True}
+            elif live is None:
+                # Rows of an output nobody followed from the start; it is read from disk instead
+                continue
+            elif kind == "row":
+                live["rows"].append(record.get("row") or {})
+                live["complete"] = False
+            else:
+                live["complete"] = True
+            live["received"] = True
+            self._live_version += 1
+            live["version"] = self._live_version
+
+    def _release(self, file):
+        file = os.path.abspath(file)
+        with self._lock:
+            self._apply_records()
+            live = self._live.pop(file, None)
+            if live is not None and live["complete"]:
+                # The file now holds exactly these rows, so it need not be parsed again
+                self._frames[file] = (source_signature(file), self._live_frame(live))
+
+    @contextmanager
+    def following(self, output_file):
+        """Follow a scraper's outputs while it runs; yields feed for its result-channel records.
+
+        Enter before the scraper starts. Until a record arrives for a source it
+        is still read from disk, so scrapers without a channel work as before.
+        On exit a source whose last record left it complete (a snapshot, or
+        done once the sink wrote the .xlsx) keeps its in-memory frame; any
+        other is read from disk again.
+        """
+        outputs = {os.path.abspath(output_file)}
+
+        def feed(record):
+            if record.get("output"):
+                outputs.add(os.path.abspath(record["output"]))
+            self.feed(record)
+
+        self._follow(output_file)
+        try:
+            yield feed
+        finally:
+            for file in outputs:
+                self._release(file)
+
+    def combine(self, excel_files):
+        """Return the combined DataFrame for excel_files, re-reading only changed files.
+
+        Followed sources that streamed records are included (from memory) even
+        if not in excel_files.
+        """
+        with self._lock:
+            self._apply_records()
+            streamed = {file for file, live in self._live.items() if live["received"]}
+            excel_files = sorted({os.path.abspath(file) for file in excel_files} | streamed)
+            frames = []
+            changed = False
+            versions = {}
+            for file in excel_files:
+                if file in streamed:
+                    live = self._live[file]
+                    df = self._live_frame(live)
+                    versions[file] = live["version"]
+                else:
+                    df, file_changed = self._load(file)
+                    changed = changed or file_changed
+                if df is not None and not df.empty:
+                    frames.append(df)
+
+            # Drop cache entries for sources that disappeared
+            for file in set(self._frames) - set(excel_files):
+                del self._frames[file]
+                changed = True
+
+            key = tuple((file, ("live", versions[file]) if file in versions else self._frames[file][0])
+                        for file in excel_files if file in versions or file in self._frames)
+            if not changed and self._combined is not None and key == self._combined_key:
+                return self._combined
+
+            self._combined = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=COLUMNS)
+            self._combined_key = key
+            try:
+                self.resolver.save()
+            except OSError as e:
+                logger.error(f"Failed to save model catalog {self.resolver.path}: {e}")
+            return self._combined
+
+    def write(self, excel_files, output_file, snapshot_file=None):
+        """Combine excel_files and write output_file once, linking or copying it to snapshot_file.
+
+        Returns the number of rows written, 0 if there was nothing to combine, or
+        None if nothing changed since output_file was last written.
+        """
+        combined_df = self.combine(excel_files)
+        if combined_df.empty:
+            return 0
+
+        with self._lock:
+            key = self._combined_key
+            if self._written.get(output_file) == key and os.path.exists(output_file):
+                return None
+
+            # Write through a temporary file so the main file gets a fresh inode;
+            # earlier snapshots hard-linked to it are never modified in place.
+            base, ext = os.path.splitext(output_file)
+            tmp_file = f"{base}.tmp{ext}"
+            combined_df.to_excel(tmp_file, index=False)
+            os.replace(tmp_file, output_file)
+            self._written[output_file] = key
+
+        if snapshot_file:
+            try:
+                if os.path.exists(snapshot_file):
+                    os.remove(snapshot_file)
+                os.link(output_file, snapshot_file)
+            except OSError:
+                shutil.copy2(output_file, snapshot_file)
+        return len(combined_df)
+
+
+def find_source_files(directory):
+    """Scraper output files in directory, skipping Combined_* files.
+
+    Outputs that so far only exist as a result-sink journal are included under
+    their .xlsx path.
+    """
+    files = []
+    for file in os.listdir(directory):
+        if file.startswith('Combined_'):
+            continue
+        if file.endswith('.xlsx'):
+            files.append(os.path.join(directory, file))
+        elif file.endswith('.jsonl'):
+            xlsx_file = os.path.join(directory, os.path.splitext(file)[0] + '.xlsx')
+            if not os.path.exists(xlsx_file):
+                files.append(xlsx_file)
+    return files
+
+
+DELTA_COLUMNS = ["Change"] + SERIES_COLUMNS + ["Currency", "Previous Value", "Value", "Abs Change", "Pct Change"]
+
+
+def _numbers(series):
+    numbers = pd.to_numeric(series, errors="coerce")
+    # Only values that did not parse as-is get the thousands separators stripped
+    text = series[numbers.isna() & series.notna()]
+    if not text.empty:
+        numbers[text.index] = pd.to_numeric(text.astype(str).str.replace(",", "", regex=False), errors="coerce")
+    return numbers
+
+
+def _keyed(df):
+    """Device key columns, Value and Currency with a 64-bit hash of the key, one row per key."""
+    if "_key" in df.columns:
+        return df
+    frame = df.reindex(columns=SERIES_COLUMNS + ["Currency", "Value"])
+    keys = frame[SERIES_COLUMNS].fillna("")
+    frame["_key"] = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+    return frame.drop_duplicates("_key", keep="last")
+
+
+def compute_delta(previous, current):
+    """Keys that are new, removed, or changed in value between two combined frames.
+
+    Both frames are joined on a hash of (Country, Source, Brand, Model,
+    Capacity, Condition, Value Type); Abs Change and Pct Change are filled in
+    when both values are numeric. previous may be a baseline saved by
+    write_delta, which already carries the hashed key.
+    """
+    merged = _keyed(current).merge(_keyed(previous), on="_key", how="outer",
+                                   suffixes=("", " previous"), indicator=True)
+    for column in SERIES_COLUMNS + ["Currency"]:
+        merged[column] = merged[column].fillna(merged[f"{column} previous"])
+
+    new_value, old_value = _numbers(merged["Value"]), _numbers(merged["Value previous"])
+    numeric = new_value.notna() & old_value.notna()
+    both = merged["_merge"] == "both"
+    text_changed = both & ~numeric & (merged["Value"].fillna("") != merged["Value previous"].fillna(""))
+    changed = both & numeric & (new_value != old_value) | text_changed
+
+    merged["Change"] = ""
+    merged.loc[merged["_merge"] == "left_only", "Change"] = "new"
+    merged.loc[merged["_merge"] == "right_only", "Change"] = "removed"
+    merged.loc[changed, "Change"] = "changed"
+    merged["Previous Value"] = merged["Value previous"]
+    merged["Abs Change"] = (new_value - old_value).where(numeric)
+    merged["Pct Change"] = ((new_value - old_value) / old_value * 100).where(numeric & (old_value != 0)).round(2)
+    delta = merged[merged["Change"] != ""]
+    return delta[DELTA_COLUMNS].reset_index(drop=True)
+
+
+def delta_paths(output_file):
+    """(delta CSV, baseline pickle) written next to a combined output file."""
+    directory, name = os.path.split(os.path.splitext(output_file)[0])
+    if name.startswith("Combined_"):
+        name = name[len("Combined_"):]
+    return (os.path.join(directory, f"Delta_{name}.csv"),
+            os.path.join(directory, f".{name}.baseline.pkl"))
+
+
+def write_delta(combined_df, output_file):
+    """Write the changes since the previous run's combined frame next to output_file.
+
+    The current frame is kept as the baseline for the next run. Returns the
+    delta file, or None on the first run or on failure.
+    """
+    delta_file, baseline_file = delta_paths(output_file)
+    try:
+        delta = None
+        if os.path.exists(baseline_file):
+            delta = compute_delta(pd.read_pickle(baseline_file), combined_df)
+            delta.to_csv(delta_file, index=False)
+            counts = delta["Change"].value_counts()
+            logger.info(f"Saved delta to {delta_file}: {counts.get('new', 0)} new, "
+                        f"{counts.get('removed', 0)} removed, {counts.get('changed', 0)} changed")
+        else:
+            logger.info(f"No previous run for {output_file}, delta starts with the next run")
+
+        tmp_file = f"{baseline_file}.tmp"
+        _keyed(combined_df).to_pickle(tmp_file)
+        os.replace(tmp_file, baseline_file)
+        return delta_file if delta is not None else None
+    except Exception as e:
+        logger.error(f"Failed to write delta for {output_file}: {e}")
+        return None
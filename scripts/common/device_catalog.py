@@ -0,0 +1,240 @@
+"""Brand, series, device type and capacity detection shared by every scraper.
+
+Each attribute is detected with one compiled regular expression that
+alternates over all of its keywords (one named group per brand or series), so
+a name is scanned once per attribute instead of once per keyword. Brand and
+series take the leftmost keyword in the name ("Apple iPhone" -> Apple);
+device type is decided by priority (a watch, earbuds, laptop or TV before a
+tablet, anything else is a SmartPhone). Capacity is the largest GB/TB figure,
+so "8GB + 256GB" gives 256GB rather than the RAM.
+
+The per-string functions (brand_of, series_of, device_type_of, capacity_of)
+serve the scrapers. The Series functions (brands, series_names, device_types,
+capacities) factorize their input and run the expressions once per distinct
+name, which is what makes consolidation-sized frames cheap: a combined file
+has hundreds of thousands of rows but only a few thousand different models.
+fill_missing() completes a whole DataFrame that way.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+UNKNOWN_BRAND = "Unknown"
+DEFAULT_DEVICE_TYPE = "SmartPhone"
+
+# Brand -> keyword patterns (matched case-insensitively on word boundaries)
+BRAND_KEYWORDS = {
+    "Apple": [r"apple", r"iphone", r"ipad", r"macbook", r"imac", r"mac\s?mini", r"airpods?"],
+    "Samsung": [r"samsung", r"galaxy", r"note(?:\s?\d+|\b)", r"z?\s?fold\d*\b", r"z?\s?flip\d*\b", r"tab\s[sa]", r"tab[sa]\d+"],
+    "Google": [r"google", r"pixel"],
+    "Huawei": [r"huawei", r"mate\s?(?:\d+|x)", r"nova", r"p[2-6]0\b"],
+    "Xiaomi": [r"xiaomi", r"redmi", r"poco", r"mi\s?pad", r"mi\s?\d+"],
+    "Oppo": [r"oppo", r"find\s?[nx]\d*", r"reno"],
+    "OnePlus": [r"one\s?plus"],
+    "Sony": [r"sony", r"xperia"],
+    "LG": [r"lg\b"],
+    "Motorola": [r"motorola", r"moto", r"razr"],
+    "Vivo": [r"vivo\b"],
+    "Realme": [r"realme"],
+    "Honor": [r"honor"],
+    "Nothing": [r"nothing"],
+    "Nokia": [r"nokia"],
+    "Asus": [r"asus", r"rog\s?phone", r"zenfone"],
+    "Lenovo": [r"lenovo", r"tab\s[mp]", r"tab[mp]\d+"],
+    "HTC": [r"htc\b", r"one\s?m\d+", r"desire", r"u\s?ultra", r"u1[12]\b"],
+    "Microsoft": [r"microsoft", r"surface"],
+    "Infinix": [r"infinix"],
+    "Tecno": [r"tecno"],
+    "ZTE": [r"zte\b"],
+}
+
+# Series -> pattern; more specific series come before the ones they extend
+SERIES_PATTERNS = {
+    "iPhone": r"iphone",
+    "iPad Pro": r"ipad\s?pro",
+    "iPad Air": r"ipad\s?air",
+    "iPad mini": r"ipad\s?mini",
+    "iPad": r"ipad",
+    "Apple Watch": r"apple\s?watch",
+    "MacBook Pro": r"macbook\s?pro",
+    "MacBook Air": r"macbook\s?air",
+    "MacBook": r"macbook",
+    "AirPods": r"airpods?",
+    "Galaxy Z Fold": r"(?:galaxy\s?)?z\s?fold",
+    "Galaxy Z Flip": r"(?:galaxy\s?)?z\s?flip",
+    "Galaxy Tab S": r"(?:galaxy\s?)?tab\s?s",
+    "Galaxy Tab A": r"(?:galaxy\s?)?tab\s?a",
+    "Galaxy Tab": r"galaxy\s?tab",
+    "Galaxy Watch": r"galaxy\s?watch",
+    "Galaxy Buds": r"galaxy\s?buds",
+    "Galaxy Note": r"(?:galaxy\s?)?note\s?\d",
+    "Galaxy S": r"galaxy\s?s\d",
+    "Galaxy A": r"galaxy\s?a\d",
+    "Galaxy M": r"galaxy\s?m\d",
+    "Pixel": r"pixel",
+    "Redmi Note": r"redmi\s?note",
+    "Redmi": r"redmi",
+    "Poco": r"poco",
+    "Mate": r"mate\s?(?:\d+|x)",
+    "Find": r"find\s?[nx]\d*",
+    "Reno": r"reno",
+    "Xperia": r"xperia",
+}
+
+# Series whose pattern is also used by other brands' names (Infinix Note 30), only given to this brand
+SERIES_BRANDS = {
+    "Galaxy Note": "Samsung",
+}
+
+# Device type -> keyword pattern, in priority order
+DEVICE_TYPE_PATTERNS = {
+    "SmartWatch": r"watch",
+    "Airpods": r"air\s?pods?|earpods?|earphones?|headphones?|buds",
+    "Laptop": r"mac\s?book|laptop|notebook|thinkpad|imac|mac\s?mini|mac\s?pro",
+    "TV": r"tv\b|television",
+    # Only the tablet lines that end in "pad" (MatePad, MediaPad, MiPad), not ThinkPad or Notepad
+    "Tablet": r"(?:i\s?|mate|media|mi\s?|xiaomi\s|redmi\s)?pad\b|ipad|tab\b|tablet",
+}
+
+CAPACITY_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*([GT])B\b", re.IGNORECASE)
+
+
+def _group_name(prefix, index):
+    return f"{prefix}{index}"
+
+
+def _alternation(prefix, patterns):
+    """One regex with a named group per entry, each matching on word boundaries."""
+    groups = [f"(?P<{_group_name(prefix, i)}>{'|'.join(keywords)})" for i, keywords in enumerate(patterns)]
+    return re.compile(r"\b(?:" + "|".join(groups) + r")", re.IGNORECASE)
+
+
+BRAND_NAMES = list(BRAND_KEYWORDS)
+BRAND_REGEX = _alternation("b", BRAND_KEYWORDS.values())
+SERIES_NAMES = list(SERIES_PATTERNS)
+SERIES_REGEX = _alternation("s", ([pattern] for pattern in SERIES_PATTERNS.values()))
+DEVICE_TYPE_REGEXES = [(device_type, re.compile(rf"\b(?:{pattern})", re.IGNORECASE))
+                       for device_type, pattern in DEVICE_TYPE_PATTERNS.items()]
+
+_BRAND_BY_GROUP = {_group_name("b", i): name for i, name in enumerate(BRAND_NAMES)}
+_SERIES_BY_GROUP = {_group_name("s", i): name for i, name in enumerate(SERIES_NAMES)}
+
+
+def _first_group(regex, names, text):
+    match = regex.search(text or "")
+    return names[match.lastgroup] if match else None
+
+
+def brand_of(name, default=UNKNOWN_BRAND):
+    """Brand of a device name, e.g. "Galaxy S24 Ultra" -> "Samsung"."""
+    return _first_group(BRAND_REGEX, _BRAND_BY_GROUP, name) or default
+
+
+def series_of(name, default=""):
+    """Product line of a device name, e.g. "iPad Air 5th Gen" -> "iPad Air".
+
+    >>> series_of("Samsung Galaxy Note 20 Ultra")
+    'Galaxy Note'
+    >>> series_of("Note 20 Ultra")
+    'Galaxy Note'
+    >>> series_of("Infinix Note 30")
+    ''
+    """
+    series = _first_group(SERIES_REGEX, _SERIES_BY_GROUP, name)
+    if series in SERIES_BRANDS and brand_of(name) != SERIES_BRANDS[series]:
+        return default
+    return series or default
+
+
+def device_type_of(name, default=DEFAULT_DEVICE_TYPE):
+    """SmartWatch, Airpods, Laptop, TV or Tablet if the name says so, else default.
+
+    >>> device_type_of("Huawei MatePad 11")
+    'Tablet'
+    >>> device_type_of("iPad Air 5th Gen")
+    'Tablet'
+    >>> device_type_of("Huawei Mate 60 Pro")
+    'SmartPhone'
+    >>> device_type_of("Lenovo ThinkPad X1")
+    'Laptop'
+    >>> device_type_of("Notepad")
+    'SmartPhone'
+    """
+    for device_type, regex in DEVICE_TYPE_REGEXES:
+        if regex.search(name or ""):
+            return device_type
+    return default
+
+
+def _format_capacity(gb):
+    if gb >= 1024 and gb % 1024 == 0:
+        return f"{int(gb // 1024)}TB"
+    return f"{int(gb) if float(gb).is_integer() else gb}GB"
+
+
+def capacity_of(name, default=""):
+    """Largest storage figure in a name as "128GB" / "1TB"."""
+    sizes = [float(number) * (1024 if unit.upper() == "T" else 1)
+             for number, unit in CAPACITY_PATTERN.findall(name or "")]
+    return _format_capacity(max(sizes)) if sizes else default
+
+
+def normalize(name):
+    """Brand, Series, Device Type and Capacity of one device name."""
+    return {
+        "Brand": brand_of(name),
+        "Series": series_of(name),
+        "Device Type": device_type_of(name),
+        "Capacity": capacity_of(name),
+    }
+
+
+def _vectorized(detect, values, default):
+    """Apply detect to each distinct value of a Series once and broadcast the results."""
+    codes, uniques = pd.factorize(values.fillna("").astype(str))
+    results = np.array([detect(value, default) for value in uniques] + [default], dtype=object)
+    return pd.Series(results[codes], index=values.index)
+
+
+def brands(values, default=UNKNOWN_BRAND):
+    """brand_of over a pandas Series."""
+    return _vectorized(brand_of, values, default)
+
+
+def series_names(values, default=""):
+    """series_of over a pandas Series."""
+    return _vectorized(series_of, values, default)
+
+
+def device_types(values, default=DEFAULT_DEVICE_TYPE):
+    """device_type_of over a pandas Series."""
+    return _vectorized(device_type_of, values, default)
+
+
+def capacities(values, default=""):
+    """capacity_of over a pandas Series."""
+    return _vectorized(capacity_of, values, default)
+
+
+def _missing(values, *placeholders):
+    text = values.fillna("").astype(str).str.strip()
+    return (text == "") | text.isin(placeholders)
+
+
+def fill_missing(df, name_column="Model"):
+    """Fill blank or Unknown Brand, Device Type and Capacity cells from the model name."""
+    if df is None or df.empty or name_column not in df.columns:
+        return df
+    df = df.copy()
+    names = df[name_column]
+    for column, detect, placeholders in (("Brand", brands, (UNKNOWN_BRAND,)),
+                                         ("Device Type", device_types, ()),
+                                         ("Capacity", capacities, ())):
+        if column not in df.columns:
+            continue
+        missing = _missing(df[column], *placeholders)
+        if missing.any():
+            df[column] = df[column].astype(object)
+            df.loc[missing, column] = detect(names[missing]).values
+    return df
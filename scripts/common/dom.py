@@ -0,0 +1,68 @@
+"""Bulk DOM extraction in a single WebDriver round-trip.
+
+Looping over find_elements() and calling get_attribute()/text on each element
+costs one WebDriver HTTP request per element and per property, which adds up
+to thousands of requests on a long listing page. These helpers run one
+JavaScript snippet that collects everything and returns it as JSON.
+"""
+
+EXTRACT_SCRIPT = """
+var selector = arguments[0], fields = arguments[1], root = arguments[2] || document;
+function read(element, property) {
+    if (!element) {
+        return null;
+    }
+    if (property === 'text') {
+        return (element.innerText || element.textContent || '').trim();
+    }
+    var value = element[property];
+    if (value === undefined || value === null || typeof value === 'object' || typeof value === 'function') {
+        value = element.getAttribute(property);
+    }
+    return value;
+}
+var results = [];
+root.querySelectorAll(selector).forEach(function(element) {
+    var item = {};
+    for (var name in fields) {
+        var subSelector = fields[name][0], property = fields[name][1];
+        item[name] = read(subSelector ? element.querySelector(subSelector) : element, property);
+    }
+    results.push(item);
+});
+return results;
+"""
+
+FIND_BY_TEXT_SCRIPT = """
+var selector = arguments[0], text = arguments[1], root = arguments[2] || document;
+var elements = root.querySelectorAll(selector);
+for (var i = 0; i < elements.length; i++) {
+    if ((elements[i].innerText || elements[i].textContent || '').indexOf(text) !== -1) {
+        return elements[i];
+    }
+}
+return null;
+"""
+
+
+def extract_elements(driver, selector, fields, root=None):
+    """Return one dict per element matching selector.
+
+    fields maps each output key to (sub_selector, property): sub_selector is
+    queried inside the element (None for the element itself) and property is a
+    DOM property such as "href" (resolved to an absolute URL), an attribute
+    such as "data-tags", or "text" for the visible text. Missing values are None.
+    """
+    fields = {name: list(spec) for name, spec in fields.items()}
+    return driver.execute_script(EXTRACT_SCRIPT, selector, fields, root) or []
+
+
+def extract_hrefs(driver, selector="a", root=None):
+    """Return the absolute href of every element matching selector, skipping empty ones."""
+    items = extract_elements(driver, selector, {"href": (None, "href")}, root)
+    return [item["href"] for item in items if item["href"]]
+
+
+def find_element_by_text(driver, selector, text, root=None):
+    """Return the first element matching selector whose visible text contains text, or None."""
+    return driver.execute_script(FIND_BY_TEXT_SCRIPT, selector, text, root)
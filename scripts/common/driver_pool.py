@@ -0,0 +1,287 @@
+"""A pool of warm Chrome drivers shared by the threads of one scraper.
+
+Starting Chrome costs seconds per browser, and a scraper that builds a fresh
+driver for every product page or every recovery after a crash pays that again
+and again. DriverPool launches size + spares drivers in the background when it
+is created, with the scraper's own setup_driver as the factory, and hands them
+out with acquire()/release() or the driver() context manager.
+
+A driver is reused for as long as it stays healthy: acquire() runs a trivial
+script on it first and replaces it if the browser no longer answers. On
+release() it is recycled instead of going back to the pool once it has loaded
+max_pages pages or its chromedriver/Chrome process tree uses more than
+max_rss_mb. discard() drops a broken driver, killing the whole process tree on
+a background thread so a hung browser cannot block the caller, and starts a
+replacement right away. close() kills every driver the pool still owns.
+"""
+import os
+import time
+import signal
+import queue
+import threading
+from contextlib import contextmanager
+
+try:
+    import psutil
+except ImportError:
+    # RSS-based recycling is disabled without psutil
+    psutil = None
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    try:
+        return int(value) if value else default
+    except ValueError:
+        return default
+
+
+def driver_processes(driver):
+    """Return the psutil processes (chromedriver, Chrome and its children) behind a driver."""
+    if psutil is None:
+        return []
+    pids = []
+    service = getattr(driver, "service", None)
+    process = getattr(service, "process", None) if service is not None else None
+    if process is not None:
+        pids.append(process.pid)
+    # undetected_chromedriver launches Chrome itself rather than through chromedriver
+    browser_pid = getattr(driver, "browser_pid", None)
+    if browser_pid:
+        pids.append(browser_pid)
+
+    processes = {}
+    for pid in pids:
+        try:
+            root = psutil.Process(pid)
+            processes[root.pid] = root
+            for child in root.children(recursive=True):
+                processes[child.pid] = child
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return list(processes.values())
+
+
+def driver_rss_mb(driver):
+    """Resident memory of the whole browser process tree in MB, or None if unknown."""
+    if psutil is None:
+        return None
+    total = 0
+    for process in driver_processes(driver):
+        try:
+            total += process.memory_info().rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return total / (1024 * 1024)
+
+
+def driver_responds(driver):
+    """True if the browser still answers a trivial script."""
+    try:
+        driver.execute_script("return 1")
+        return True
+    except Exception:
+        return False
+
+
+def _kill_root_processes(driver):
+    """Kill chromedriver and the browser by pid when psutil cannot list the process tree."""
+    service = getattr(driver, "service", None)
+    process = getattr(service, "process", None) if service is not None else None
+    if process is not None:
+        try:
+            process.kill()
+        except Exception:
+            pass
+    browser_pid = getattr(driver, "browser_pid", None)
+    if browser_pid:
+        try:
+            os.kill(browser_pid, getattr(signal, "SIGKILL", signal.SIGTERM))
+        except Exception:
+            pass
+
+
+def kill_driver(driver, force=False):
+    """Quit a driver and kill any browser processes left behind.
+
+    With force the process tree is killed before quit(), for browsers that
+    are hung and would block quit() itself.
+    """
+    processes = driver_processes(driver)
+    if force:
+        for process in processes:
+            try:
+                process.kill()
+            except Exception:
+                pass
+        if psutil is None:
+            _kill_root_processes(driver)
+    try:
+        driver.quit()
+    except Exception:
+        pass
+    for process in processes:
+        try:
+            process.kill()
+        except Exception:
+            pass
+
+
+class DriverPool:
+    """Pool of pre-launched, reusable WebDriver instances.
+
+    factory is the script's own setup_driver (or a lambda around it), so each
+    scraper keeps its Chrome options. Drivers are launched in the background,
+    health-checked on checkout and recycled after max_pages page loads or once
+    the browser process tree grows past max_rss_mb. Extra spares are kept warm
+    so replacing a crashed browser does not wait for a cold Chrome start.
+
+    Defaults come from the DRIVER_POOL_SIZE, DRIVER_POOL_SPARES,
+    DRIVER_MAX_PAGES and DRIVER_MAX_RSS_MB environment variables.
+    """
+
+    def __init__(self, factory, size=None, spares=None, max_pages=None, max_rss_mb=None, serial_launch=False):
+        self.factory = factory
+        self.size = size if size is not None else _env_int("DRIVER_POOL_SIZE", 1)
+        self.spares = spares if spares is not None else _env_int("DRIVER_POOL_SPARES", 0)
+        self.max_pages = max_pages if max_pages is not None else _env_int("DRIVER_MAX_PAGES", 500)
+        self.max_rss_mb = max_rss_mb if max_rss_mb is not None else _env_int("DRIVER_MAX_RSS_MB", 2048)
+        self.launches = 0
+
+        self._idle = queue.Queue()
+        self._drivers = set()
+        self._pages = {}
+        self._launching = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        # undetected_chromedriver patches its binary on launch, so it must not start concurrently
+        self._launch_lock = threading.Lock() if serial_launch else None
+
+        for _ in range(self.size + self.spares):
+            self._launch_async()
+
+    @property
+    def capacity(self):
+        return self.size + self.spares
+
+    def _count_pages(self, driver):
+        """Wrap driver.get so page loads are counted for recycling."""
+        original_get = driver.get
+        key = id(driver)
+
+        def counted_get(url):
+            self._pages[key] = self._pages.get(key, 0) + 1
+            return original_get(url)
+
+        driver.get = counted_get
+
+    def _launch(self):
+        driver = None
+        try:
+            if self._launch_lock is not None:
+                with self._launch_lock:
+                    driver = self.factory()
+            else:
+                driver = self.factory()
+        except Exception as e:
+            print(f"Error launching browser for pool: {e}")
+            # Back off before another launch is attempted
+            time.sleep(5)
+
+        with self._lock:
+            self._launching -= 1
+            if driver is None:
+                return
+            if self._closed:
+                kill_driver(driver)
+                return
+            self.launches += 1
+            self._drivers.add(driver)
+            self._pages[id(driver)] = 0
+        self._count_pages(driver)
+        self._idle.put(driver)
+
+    def _launch_async(self):
+        with self._lock:
+            if self._closed or len(self._drivers) + self._launching >= self.capacity:
+                return
+            self._launching += 1
+        threading.Thread(target=self._launch, daemon=True).start()
+
+    def _needs_recycle(self, driver):
+        if self.max_pages and self._pages.get(id(driver), 0) >= self.max_pages:
+            return True
+        if self.max_rss_mb:
+            rss = driver_rss_mb(driver)
+            if rss is not None and rss >= self.max_rss_mb:
+                return True
+        return False
+
+    def discard(self, driver, force=False):
+        """Drop a driver from the pool, kill its processes and warm up a replacement.
+
+        force kills the process tree before quit(), for a browser known to be hung.
+        """
+        if driver is None:
+            return
+        with self._lock:
+            self._drivers.discard(driver)
+            self._pages.pop(id(driver), None)
+        # A hung browser can block quit(), so never do it on the caller's thread
+        threading.Thread(target=kill_driver, args=(driver, force), daemon=True).start()
+        self._launch_async()
+
+    def acquire(self, timeout=300):
+        """Check out a healthy driver, waiting up to timeout seconds for one to launch."""
+        deadline = time.time() + timeout
+        while True:
+            if self._closed:
+                raise RuntimeError("Driver pool is closed")
+            try:
+                driver = self._idle.get(timeout=1)
+            except queue.Empty:
+                # Replace launches that failed
+                self._launch_async()
+                if time.time() > deadline:
+                    raise TimeoutError(f"No browser available from pool after {timeout} seconds")
+                continue
+            if driver_responds(driver):
+                return driver
+            print("Pooled browser failed health check, replacing it")
+            self.discard(driver)
+
+    def release(self, driver):
+        """Return a driver to the pool, recycling it if it has served enough pages or grown too large."""
+        if driver is None:
+            return
+        if self._closed:
+            kill_driver(driver)
+            return
+        if self._needs_recycle(driver):
+            print(f"Recycling browser after {self._pages.get(id(driver), 0)} pages")
+            self.discard(driver)
+            return
+        self._idle.put(driver)
+
+    def replace(self, driver):
+        """Discard a broken driver and return a (usually already warm) replacement."""
+        self.discard(driver)
+        return self.acquire()
+
+    @contextmanager
+    def driver(self, timeout=300):
+        """Context manager that leases a driver and returns it to the pool afterwards."""
+        driver = self.acquire(timeout)
+        try:
+            yield driver
+        finally:
+            self.release(driver)
+
+    def close(self):
+        """Quit every driver owned by the pool."""
+        with self._lock:
+            self._closed = True
+            drivers = list(self._drivers)
+            self._drivers.clear()
+        for driver in drivers:
+            kill_driver(driver)
@@ -0,0 +1,115 @@
+"""Spreading one scraper's work items over several browsers.
+
+fan_out leases a pooled driver per item; fan_out_sessions keeps one browser
+session per worker thread. Both report progress over the result channel, and
+site_worker_limit caps how many browsers may hit one site at once.
+"""
+import os
+import queue
+import threading
+from urllib.parse import urlparse
+
+from common.result_channel import report_progress
+
+# Maximum number of concurrent browsers per site, to stay polite and avoid rate limiting.
+# SITE_MAX_WORKERS in the environment overrides the cap for every site.
+SITE_MAX_WORKERS = {
+    "compasiatradeinsg.com": 4,
+    "my-caecom-microsite-portal.compasia.com": 4,
+}
+DEFAULT_SITE_MAX_WORKERS = 2
+
+
+def site_worker_limit(url, requested):
+    """Clamp the requested number of workers to the concurrency cap for url's site."""
+    override = os.environ.get("SITE_MAX_WORKERS")
+    if override and override.isdigit():
+        cap = int(override)
+    else:
+        cap = SITE_MAX_WORKERS.get(urlparse(url).netloc.lower(), DEFAULT_SITE_MAX_WORKERS)
+    return max(1, min(requested, cap))
+
+
+def fan_out(work_items, handle, pool, workers):
+    """Run handle(driver, item) for every work item across worker threads.
+
+    Each worker leases a driver from pool per item, so browsers are recycled
+    between configurations and a crashed browser only costs one item.
+    Returns a list of (item, result) pairs in completion order.
+    """
+    work_queue = queue.Queue()
+    for item in work_items:
+        work_queue.put(item)
+
+    results = []
+    results_lock = threading.Lock()
+
+    def worker(index):
+        while True:
+            try:
+                item = work_queue.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                with pool.driver() as driver:
+                    result = handle(driver, item)
+            except Exception as e:
+                print(f"Worker {index} failed on {item}: {e}")
+                result = False
+            with results_lock:
+                results.append((item, result))
+                if not report_progress(len(results), len(work_items)):
+                    print(f"Progress: {len(results)}/{len(work_items)} work items")
+
+    threads = [threading.Thread(target=worker, args=(i + 1,), daemon=True) for i in range(max(1, workers))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def fan_out_sessions(work_items, handle, sessions, on_result=None):
+    """Run handle(session, item) for every work item, one worker thread per session.
+
+    Unlike fan_out, each worker keeps its session (browser, watchdog and
+    restart state) for the whole run and takes the next item from a shared
+    queue, so the list is split across workers in order. on_result(item,
+    result) is called under a lock as items complete, which makes it the place
+    to update shared output. Returns a list of (item, result) pairs in
+    completion order.
+    """
+    work_queue = queue.Queue()
+    for item in work_items:
+        work_queue.put(item)
+
+    results = []
+    results_lock = threading.Lock()
+
+    def worker(session):
+        while True:
+            try:
+                item = work_queue.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                result = handle(session, item)
+            except Exception as e:
+                print(f"Worker {session.name} failed on {item}: {e}")
+                result = None
+            with results_lock:
+                results.append((item, result))
+                if on_result is not None:
+                    try:
+                        on_result(item, result)
+                    except Exception as e:
+                        print(f"Error recording result for {item}: {e}")
+                if not report_progress(len(results), len(work_items)):
+                    print(f"Progress: {len(results)}/{len(work_items)} work items")
+
+    threads = [threading.Thread(target=worker, args=(session,), daemon=True) for session in sessions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
@@ -0,0 +1,55 @@
+"""Normalized index of the models already in a scraper's output (the Carousell scrapers).
+
+The index is built once from the loaded output file and updated as rows are
+appended, so "has this model been scraped" and "would these rows replace
+existing ones" are set lookups instead of a scan of the whole DataFrame per
+listing.
+"""
+import re
+
+import pandas as pd
+
+SEPARATORS = re.compile(r'[\s\-\(\)]+')
+
+# Columns the scrapers de-duplicate their output on
+ROW_KEY_COLUMNS = ("Model", "Capacity", "Condition")
+
+
+def normalize_model(model):
+    """Lower-cased model with runs of whitespace, hyphens and brackets collapsed to one space."""
+    return SEPARATORS.sub(" ", str(model).strip().lower()).strip()
+
+
+def _row_key(row):
+    return tuple("" if pd.isna(row.get(column)) else row.get(column) for column in ROW_KEY_COLUMNS)
+
+
+class ModelIndex:
+    """Normalized models and (Model, Capacity, Condition) keys of an output DataFrame."""
+
+    def __init__(self, df=None):
+        self.models = set()
+        self.row_keys = set()
+        if df is not None and not df.empty:
+            models = df["Model"].dropna().astype(str)
+            self.models.update(models.str.strip().str.lower().str.replace(SEPARATORS, " ", regex=True).str.strip())
+            keys = df.reindex(columns=list(ROW_KEY_COLUMNS)).fillna("")
+            self.row_keys.update(keys.itertuples(index=False, name=None))
+
+    def __contains__(self, model):
+        return normalize_model(model) in self.models
+
+    def __len__(self):
+        return len(self.models)
+
+    def overlaps(self, rows):
+        """True if rows repeat a (Model, Capacity, Condition) already indexed or among themselves."""
+        keys = [_row_key(row) for row in rows]
+        return len(set(keys)) < len(keys) or any(key in self.row_keys for key in keys)
+
+    def add(self, rows):
+        """Index appended rows (dicts in the standard column layout)."""
+        for row in rows:
+            if not pd.isna(row.get("Model")):
+                self.models.add(normalize_model(row["Model"]))
+            self.row_keys.add(_row_key(row))
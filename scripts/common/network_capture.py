@@ -0,0 +1,270 @@
+"""Read API responses a page fetches, via Chrome's performance log and CDP.
+
+Most trade-in forms compute the displayed price from a JSON call to their
+backend. Instead of waiting for the rendered text and matching it with a
+regex, a scraper can record the responses whose URL matches a pattern and read
+the price from the parsed body:
+
+    enable_performance_log(options)          # before creating the driver
+    capture = NetworkCapture(driver, [r"/api/.*quote"])
+    capture.clear()
+    ... click "Get Quote" ...
+    response = capture.wait_for(r"/api/.*quote", timeout=10)
+    price = find_price(response["body"]) if response else None
+
+The performance log is drained on every read, so one NetworkCapture should be
+the only reader of it per driver. Set NETWORK_CAPTURE_DIR to also save every
+captured body as JSON, which is how the response shapes of a new site are
+worked out.
+
+The API endpoints and keys of the trade-in sites have not been observed yet,
+and a catalogue or retail price matching the same pattern would be written out
+as the trade-in value. API prices are therefore opt-in: captured_price()
+returns None (the scrapers read the page) unless NETWORK_PRICES=1. Without it
+nothing is captured at all, except that bodies are still saved for inspection
+when NETWORK_CAPTURE_DIR is set.
+"""
+import os
+import re
+import json
+import time
+import weakref
+
+# Keys that carry the offered amount in the price APIs seen so far, most specific first
+PRICE_KEYS = ("tradeInPrice", "trade_in_price", "buybackPrice", "offerPrice", "quotePrice",
+              "finalPrice", "final_price", "price", "amount")
+
+JSON_MIME_TYPES = ("application/json", "text/json", "application/ld+json", "+json")
+
+# One capture per driver, so helper functions deep in a scraper share its log reader
+_captures = weakref.WeakKeyDictionary()
+
+# Consecutive waits without any matching response after which a pattern is given up on
+MAX_MISSES = 3
+
+
+def network_prices_enabled():
+    """True if prices may be taken from captured API responses (NETWORK_PRICES=1)."""
+    return os.environ.get("NETWORK_PRICES", "").lower() in ("1", "true", "yes")
+
+
+def capture_enabled():
+    """True if responses are captured at all: for prices, or to save them to NETWORK_CAPTURE_DIR."""
+    return network_prices_enabled() or bool(os.environ.get("NETWORK_CAPTURE_DIR"))
+
+
+def enable_performance_log(options):
+    """Turn on Chrome's performance log (network events) for a driver created with options."""
+    if not capture_enabled():
+        return options
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    return options
+
+
+def _is_json(mime_type):
+    mime_type = (mime_type or "").lower()
+    return any(kind in mime_type for kind in JSON_MIME_TYPES)
+
+
+class NetworkCapture:
+    """Record JSON responses whose URL matches one of patterns.
+
+    Each captured response is a dict with url, status, time (when it finished
+    loading) and body (the parsed JSON, or None if it could not be read).
+    """
+
+    def __init__(self, driver, patterns, json_only=True):
+        self.driver = driver
+        self.patterns = [re.compile(pattern) for pattern in patterns]
+        self.json_only = json_only
+        self.responses = []
+        self.captured = 0
+        self.misses = 0
+        self._pending = {}
+        self._save_dir = os.environ.get("NETWORK_CAPTURE_DIR")
+        if not capture_enabled():
+            self.available = False
+            return
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            self.available = True
+        except Exception as e:
+            print(f"Network capture unavailable, falling back to the page: {e}")
+            self.available = False
+        # Events from before the capture started are not of interest
+        self._read_log()
+
+    def _read_log(self):
+        try:
+            return self.driver.get_log("performance")
+        except Exception:
+            return []
+
+    def _matches(self, url):
+        return any(pattern.search(url) for pattern in self.patterns)
+
+    def _fetch_body(self, request_id):
+        try:
+            result = self.driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+        except Exception:
+            return None
+        try:
+            return json.loads(result.get("body", ""))
+        except ValueError:
+            return None
+
+    def _save(self, entry):
+        try:
+            os.makedirs(self._save_dir, exist_ok=True)
+            name = re.sub(r'[^A-Za-z0-9.=-]+', '_', entry["url"].split("://")[-1])[:150]
+            path = os.path.join(self._save_dir, f"{int(entry['time'] * 1000)}_{name}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            print(f"Could not save captured response: {e}")
+
+    def poll(self):
+        """Process new network events; returns the responses captured by this call."""
+        if not self.available:
+            return []
+        captured = []
+        for entry in self._read_log():
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, ValueError, TypeError):
+                continue
+            method = message.get("method")
+            params = message.get("params", {})
+
+            if method == "Network.responseReceived":
+                response = params.get("response", {})
+                url = response.get("url", "")
+                if self._matches(url) and (not self.json_only or _is_json(response.get("mimeType"))):
+                    self._pending[params.get("requestId")] = (url, response.get("status"))
+            elif method in ("Network.loadingFinished", "Network.loadingFailed"):
+                request = self._pending.pop(params.get("requestId"), None)
+                if request is None or method == "Network.loadingFailed":
+                    continue
+                url, status = request
+                captured.append({
+                    "url": url,
+                    "status": status,
+                    "time": time.time(),
+                    "body": self._fetch_body(params.get("requestId")),
+                })
+
+        for entry in captured:
+            if self._save_dir:
+                self._save(entry)
+        self.responses.extend(captured)
+        self.captured += len(captured)
+        return captured
+
+    def clear(self):
+        """Forget captured responses and any events not yet read."""
+        self.poll()
+        self.responses = []
+        self._pending = {}
+
+    def latest(self, pattern=None):
+        """Most recent captured response, optionally only those whose URL matches pattern."""
+        self.poll()
+        for entry in reversed(self.responses):
+            if pattern is None or re.search(pattern, entry["url"]):
+                return entry
+        return None
+
+    def wait_for(self, pattern=None, timeout=10, poll_interval=0.2):
+        """Wait for a readable response matching pattern, captured since the last clear().
+
+        Call clear() right before the action that triggers the request. Returns
+        the latest such response, or None on timeout or when capture is unavailable.
+        """
+        if not self.available:
+            return None
+        deadline = time.time() + timeout
+        while True:
+            self.poll()
+            for entry in reversed(self.responses):
+                if entry["body"] is not None and (pattern is None or re.search(pattern, entry["url"])):
+                    return entry
+            if time.time() >= deadline:
+                return None
+            time.sleep(poll_interval)
+
+
+def iter_dicts(data):
+    """Yield every dict nested anywhere in a parsed JSON value, outermost first."""
+    stack = [data]
+    while stack:
+        item = stack.pop(0)
+        if isinstance(item, dict):
+            yield item
+            stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(item)
+
+
+def to_number(value):
+    """Parse a price given as a number or as text such as "S$1,234.00"; None if it is not one."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        cleaned = re.sub(r'[^0-9.]', '', value.replace(",", ""))
+        if cleaned and cleaned.count(".") <= 1 and cleaned != ".":
+            number = float(cleaned)
+            return int(number) if number.is_integer() else number
+    return None
+
+
+def find_price(data, keys=PRICE_KEYS):
+    """First positive number stored under one of keys (in key order) anywhere in data, or None."""
+    dicts = list(iter_dicts(data))
+    for key in keys:
+        for item in dicts:
+            if key in item:
+                number = to_number(item[key])
+                if number is not None and number > 0:
+                    return number
+    return None
+
+
+def capture_for(driver, patterns):
+    """The NetworkCapture of driver, created on first use; patterns are added to it."""
+    capture = _captures.get(driver)
+    if capture is None:
+        capture = _captures[driver] = NetworkCapture(driver, patterns)
+    else:
+        known = {pattern.pattern for pattern in capture.patterns}
+        capture.patterns.extend(re.compile(pattern) for pattern in patterns if pattern not in known)
+    return capture
+
+
+def captured_price(driver, pattern, timeout=10, keys=PRICE_KEYS):
+    """Price from the latest response matching pattern since the capture was cleared, or None.
+
+    Use after capture_for(driver, [pattern]).clear() and the click that requests
+    the quote; None means the caller should read the price from the page, which
+    is always the case unless NETWORK_PRICES=1. If
+    the first MAX_MISSES waits see no matching response at all, the pattern is
+    assumed not to fit the site and later calls return None without waiting.
+    """
+    capture = capture_for(driver, [pattern])
+    if not network_prices_enabled():
+        # Only recording response shapes for inspection
+        capture.poll()
+        return None
+    if not capture.captured and capture.misses >= MAX_MISSES:
+        return None
+    response = capture.wait_for(pattern, timeout)
+    if response is None:
+        capture.misses += 1
+        if not capture.captured and capture.misses == MAX_MISSES:
+            print(f"No response matched {pattern}, reading prices from the page only")
+        return None
+    price = find_price(response["body"], keys)
+    if price is not None:
+        print(f"Price {price} read from {response['url']}")
+    return price
@@ -0,0 +1,207 @@
+"""Per-URL fingerprints and rows for incremental crawls.
+
+A scraper in incremental mode remembers, for every product page it visits,
+a fingerprint of the page and the rows it produced. On the next run the page
+is fingerprinted with a single plain HTTP request; if the fingerprint has not
+moved the stored rows are reused (with today's "Updated on") and the browser
+never opens the page.
+
+The request is conditional (If-None-Match / If-Modified-Since with the
+validators of the last run), so servers that support it answer 304 without a
+body. Otherwise the fingerprint is a hash of the prices and capacities in the
+page, rendered or embedded as price fields of JSON data (schema.org offers,
+framework state, variation attributes, which also carry the variant prices
+only shown after a click), ignoring the markup that changes on every render.
+Prices a page fetches after loading are not covered, so a site must be
+checked before the runners pass --incremental for it. Scrapers with a
+structured product endpoint pass their own signature function instead (see
+shopify.product_fingerprint). A page that yields no fingerprint is always
+scraped, and entries older than PAGE_CACHE_MAX_AGE_DAYS (default 7) are
+scraped again regardless.
+
+Stored entries are written to disk every SAVE_EVERY pages and by close()
+(also run at exit), not once per page, so a crawl does not rewrite the whole
+cache file for every product.
+"""
+import os
+import re
+import json
+import atexit
+import hashlib
+import threading
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta
+
+from common.shopify import USER_AGENT
+
+MAX_AGE_DAYS = int(os.environ.get("PAGE_CACHE_MAX_AGE_DAYS", "7"))
+
+# Stored pages between two writes of the cache file; a crash loses at most these
+SAVE_EVERY = 50
+
+PRICE_PATTERN = re.compile(r'(?:S\$|RM|\$|฿)\s?\d[\d,]*(?:\.\d+)?')
+CAPACITY_PATTERN = re.compile(r'\b\d+\s?[GT]B\b', re.IGNORECASE)
+# "price": 123 in embedded JSON, also when escaped inside a script string (\") or an attribute (&quot;)
+JSON_PRICE_PATTERN = re.compile(
+    r'(?:\\?"|&quot;)(?:price|lowPrice|highPrice|salePrice|display_price|regular_price|compare_at_price)(?:\\?"|&quot;)'
+    r'\s*:\s*(?:\\?"|&quot;)?(\d[\d,]*(?:\.\d+)?)')
+
+
+def cache_path(output_file):
+    """Page cache file kept next to a scraper's output file."""
+    return os.path.splitext(output_file)[0] + ".pages.json"
+
+
+def page_signature(html):
+    """Hash of the rendered and embedded prices and the capacities in a page, in page order.
+
+    None if the page has no prices at all.
+    """
+    prices = PRICE_PATTERN.findall(html)
+    embedded_prices = JSON_PRICE_PATTERN.findall(html)
+    if not prices and not embedded_prices:
+        return None
+    capacities = [c.upper().replace(" ", "") for c in CAPACITY_PATTERN.findall(html)]
+    text = "\n--\n".join([
+        "\n".join(p.replace(" ", "") for p in prices),
+        "\n".join(capacities),
+        "\n".join(p.replace(",", "") for p in embedded_prices),
+    ])
+    return "content:" + hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _fetch_page(url, validators, timeout):
+    """GET url conditionally; returns (status, validators, body)."""
+    headers = {"User-Agent": USER_AGENT}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    request = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            body = response.read().decode("utf-8", "replace")
+            new_validators = {"etag": response.headers.get("ETag"),
+                              "last_modified": response.headers.get("Last-Modified")}
+            return response.status, new_validators, body
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return 304, validators, None
+        raise
+
+
+class PageCache:
+    """Fingerprints and rows of the product pages of one scraper output."""
+
+    def __init__(self, path, max_age_days=MAX_AGE_DAYS, timeout=15):
+        self.path = path
+        self.max_age = timedelta(days=max_age_days)
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._validators = {}
+        self._unsaved = 0
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable page cache {path}: {e}")
+        atexit.register(self.close)
+
+    def fingerprint(self, url, signature=None):
+        """Current fingerprint of url, or None if it cannot be determined.
+
+        signature(url) replaces the HTTP request when given, e.g. a hash of
+        the product's JSON.
+        """
+        entry = self.entries.get(url) or {}
+        try:
+            if signature is not None:
+                return signature(url)
+            status, validators, body = _fetch_page(url, entry.get("validators") or {}, self.timeout)
+        except Exception as e:
+            print(f"Could not fingerprint {url}: {e}")
+            return None
+        with self._lock:
+            self._validators[url] = validators
+        if status == 304:
+            return entry.get("fingerprint")
+        fingerprint = page_signature(body)
+        if fingerprint is None and (validators.get("etag") or validators.get("last_modified")):
+            fingerprint = f"http:{validators.get('etag')}|{validators.get('last_modified')}"
+        return fingerprint
+
+    def cached_rows(self, url, fingerprint):
+        """Rows stored for url if its fingerprint is unchanged and the entry is fresh, else None."""
+        entry = self.entries.get(url)
+        if fingerprint is None or not entry or entry.get("fingerprint") != fingerprint:
+            self.misses += 1
+            return None
+        try:
+            scraped = datetime.fromisoformat(entry["scraped"])
+        except (KeyError, ValueError):
+            self.misses += 1
+            return None
+        if datetime.now() - scraped > self.max_age:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        today = datetime.now().strftime("%Y-%m-%d")
+        return [dict(row, **{"Updated on": today}) for row in entry["rows"]]
+
+    def store(self, url, fingerprint, rows):
+        """Remember the rows scraped from url under its fingerprint."""
+        if fingerprint is None or not rows:
+            return
+        with self._lock:
+            self.entries[url] = {
+                "fingerprint": fingerprint,
+                "validators": self._validators.get(url) or {},
+                "scraped": datetime.now().isoformat(timespec="seconds"),
+                "rows": [{key: _plain(value) for key, value in row.items()} for row in rows],
+            }
+            self._unsaved += 1
+            if self._unsaved >= SAVE_EVERY:
+                self._save()
+
+    def rows(self, url, scrape, signature=None):
+        """Return (rows, reused): the cached rows if url is unchanged, else scrape() stored for next time."""
+        fingerprint = self.fingerprint(url, signature)
+        cached = self.cached_rows(url, fingerprint)
+        if cached is not None:
+            print(f"Unchanged since {self.entries[url]['scraped'][:10]}, reusing {len(cached)} rows for {url}")
+            return cached, True
+        rows = scrape()
+        self.store(url, fingerprint, rows)
+        return rows, False
+
+    def close(self):
+        """Write the entries stored since the last save."""
+        with self._lock:
+            if self._unsaved:
+                self._save()
+
+    def _save(self):
+        self._unsaved = 0
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_file = f"{self.path}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_file, self.path)
+
+    def summary(self):
+        return f"{self.hits} pages unchanged and reused, {self.misses} scraped"
+
+
+def _plain(value):
+    """JSON-safe copy of a row value (numpy numbers, NaN)."""
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return ""
+    return value
@@ -0,0 +1,185 @@
+"""SQLite price history shared by all countries.
+
+Every consolidated run is upserted into prices, keyed on
+
+    (Country, Source, Brand, Model, Capacity, Condition, Value Type, Updated on)
+
+so re-running a scraper on the same day replaces that day's values instead of
+duplicating them. latest_prices keeps the most recent row per device and
+source in the same transaction, so "latest value per key" is a plain indexed
+read no matter how many days of history accumulate.
+
+The database runs in WAL mode, so readers (reports, notebooks) never block
+the runners writing to it. PRICE_HISTORY_DB overrides its location.
+"""
+import os
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+logger = logging.getLogger("scraper_manager")
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DB = os.path.join(SCRIPTS_DIR, "price_history.db")
+
+KEY_COLUMNS = ["Country", "Source", "Brand", "Model", "Capacity", "Condition", "Value Type", "Updated on"]
+# Device identity without the date: one time series per source
+SERIES_COLUMNS = KEY_COLUMNS[:-1]
+DATA_COLUMNS = ["Device Type", "Color", "Launch RRP", "Currency", "Value", "Updated by", "Comments"]
+
+# Spreadsheet column -> SQL column
+SQL_NAMES = {column: column.lower().replace(" ", "_") for column in KEY_COLUMNS + DATA_COLUMNS}
+
+_KEY_SQL = ", ".join(SQL_NAMES[c] for c in KEY_COLUMNS)
+_SERIES_SQL = ", ".join(SQL_NAMES[c] for c in SERIES_COLUMNS)
+_DATA_SQL = [SQL_NAMES[c] for c in DATA_COLUMNS if c != "Value"] + ["value", "value_text"]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS prices (
+    {", ".join(f"{SQL_NAMES[c]} TEXT NOT NULL" for c in KEY_COLUMNS)},
+    device_type TEXT, color TEXT, launch_rrp TEXT, currency TEXT,
+    value REAL, value_text TEXT, updated_by TEXT, comments TEXT,
+    recorded_at TEXT NOT NULL,
+    PRIMARY KEY ({_KEY_SQL})
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS latest_prices (
+    {", ".join(f"{SQL_NAMES[c]} TEXT NOT NULL" for c in KEY_COLUMNS)},
+    device_type TEXT, color TEXT, launch_rrp TEXT, currency TEXT,
+    value REAL, value_text TEXT, updated_by TEXT, comments TEXT,
+    recorded_at TEXT NOT NULL,
+    PRIMARY KEY ({_SERIES_SQL})
+) WITHOUT ROWID;
+
+-- Time series of one device across sources
+CREATE INDEX IF NOT EXISTS prices_device_history
+    ON prices (country, brand, model, capacity, condition, value_type, updated_on);
+CREATE INDEX IF NOT EXISTS prices_updated_on ON prices (updated_on);
+"""
+
+_ALL_SQL = [SQL_NAMES[c] for c in KEY_COLUMNS] + _DATA_SQL + ["recorded_at"]
+_PLACEHOLDERS = ", ".join("?" for _ in _ALL_SQL)
+_UPDATE_SQL = ", ".join(f"{name} = excluded.{name}" for name in _DATA_SQL + ["recorded_at"])
+
+UPSERT_PRICES = f"""
+INSERT INTO prices ({", ".join(_ALL_SQL)}) VALUES ({_PLACEHOLDERS})
+ON CONFLICT ({_KEY_SQL}) DO UPDATE SET {_UPDATE_SQL}
+"""
+
+# Only a row at least as recent as the stored one replaces it
+UPSERT_LATEST = f"""
+INSERT INTO latest_prices ({", ".join(_ALL_SQL)}) VALUES ({_PLACEHOLDERS})
+ON CONFLICT ({_SERIES_SQL}) DO UPDATE SET updated_on = excluded.updated_on, {_UPDATE_SQL}
+WHERE excluded.updated_on >= latest_prices.updated_on
+"""
+
+
+def _text(value):
+    if value is None:
+        return ""
+    try:
+        if pd.isna(value):
+            return ""
+    except (TypeError, ValueError):
+        pass
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def _date(value):
+    """Updated on as YYYY-MM-DD, whether it was read back as text or as a timestamp."""
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return value.strftime("%Y-%m-%d")
+    text = _text(value)
+    return text[:10] if len(text) > 10 and text[10] in " T" else text
+
+
+def _number(value):
+    try:
+        number = float(str(value).replace(",", ""))
+    except (TypeError, ValueError):
+        return None
+    return None if number != number else number
+
+
+def _records(df, recorded_at):
+    """Parameter tuples for the upserts, in _ALL_SQL order."""
+    frame = df.reindex(columns=KEY_COLUMNS + DATA_COLUMNS)
+    records = []
+    for row in frame.itertuples(index=False, name=None):
+        values = dict(zip(KEY_COLUMNS + DATA_COLUMNS, row))
+        key = [_text(values[c]) for c in KEY_COLUMNS[:-1]] + [_date(values["Updated on"])]
+        data = [_text(values[c]) for c in DATA_COLUMNS if c != "Value"]
+        records.append(tuple(key + data + [_number(values["Value"]), _text(values["Value"]), recorded_at]))
+    return records
+
+
+class PriceStore:
+    """Connection to the price history database."""
+
+    def __init__(self, path=None):
+        self.path = path or os.environ.get("PRICE_HISTORY_DB", DEFAULT_DB)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def upsert_frame(self, df):
+        """Upsert every row of a consolidated DataFrame in one transaction; returns the row count."""
+        if df is None or df.empty:
+            return 0
+        records = _records(df, datetime.now().isoformat(timespec="seconds"))
+        with self._lock, self.conn:
+            self.conn.executemany(UPSERT_PRICES, records)
+            self.conn.executemany(UPSERT_LATEST, records)
+        return len(records)
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            df = pd.read_sql_query(sql, self.conn, params=params)
+        names = {sql_name: column for column, sql_name in SQL_NAMES.items()}
+        df = df.rename(columns=names)
+        return df
+
+    def _where(self, filters):
+        clauses, params = [], []
+        for column, value in filters.items():
+            if value is not None:
+                clauses.append(f"{SQL_NAMES[column]} = ?")
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def latest(self, country=None, source=None, brand=None, model=None):
+        """Most recent row per (Country, Source, Brand, Model, Capacity, Condition, Value Type)."""
+        where, params = self._where({"Country": country, "Source": source, "Brand": brand, "Model": model})
+        return self._query(f"SELECT * FROM latest_prices{where}", params)
+
+    def history(self, country, brand, model, capacity=None, condition=None, value_type=None, source=None):
+        """All recorded rows of one device, oldest first."""
+        where, params = self._where({"Country": country, "Brand": brand, "Model": model, "Capacity": capacity,
+                                     "Condition": condition, "Value Type": value_type, "Source": source})
+        return self._query(f"SELECT * FROM prices{where} ORDER BY updated_on", params)
+
+    def close(self):
+        self.conn.close()
+
+
+def record_run(df, path=None):
+    """Upsert a consolidated run into the price history, logging rather than raising on failure."""
+    try:
+        store = PriceStore(path)
+        try:
+            rows = store.upsert_frame(df)
+        finally:
+            store.close()
+        logger.info(f"Recorded {rows} rows in price history {store.path}")
+        return rows
+    except Exception as e:
+        logger.error(f"Failed to record price history: {e}")
+        return 0
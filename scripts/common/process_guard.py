@@ -0,0 +1,265 @@
+"""Hard deadlines and stall detection for scraper subprocesses.
+
+run_process() starts a scraper with asyncio.create_subprocess_exec, so the
+runners multiplex every scraper's output in one event loop. A scraper whose
+browser hangs stops printing but never exits; rather than reading its stdout
+until EOF, run_process() waits for each line with a timeout and kills the
+scraper when it has printed nothing for SCRIPT_STALL_SECONDS, or when it runs
+past its deadline: SCRIPT_DEADLINE_FACTOR times its usual runtime from the
+runtime history (at least SCRIPT_MIN_DEADLINE_SECONDS), or SCRIPT_MAX_SECONDS
+for a script without history.
+
+With on_record, the scraper also gets a result channel (common.result_channel)
+whose records are read alongside its output. run_scraper() wraps run_process()
+for one registered scraper the way every runner starts them: command from the
+registry, optional resume re-queue, streamed rows fed to a Consolidator, and a
+line in the runtime log.
+
+Scrapers are started in their own process group (a new session on POSIX,
+CREATE_NEW_PROCESS_GROUP on Windows) so kill_process_tree() takes chromedriver
+and Chrome down with the Python process instead of leaving them running.
+"""
+import os
+import signal
+import asyncio
+import logging
+import subprocess
+from datetime import datetime
+
+from common.registry import build_command, can_resume, output_path
+from common.result_channel import open_channel, read_channel
+
+try:
+    import psutil
+except ImportError:
+    # Children are killed through the process group only
+    psutil = None
+
+logger = logging.getLogger("scraper_manager")
+
+DEFAULT_STALL_SECONDS = 15 * 60
+DEFAULT_DEADLINE_FACTOR = 3
+DEFAULT_MIN_DEADLINE_SECONDS = 30 * 60
+DEFAULT_MAX_SECONDS = 4 * 60 * 60
+
+# Longest output line read from a scraper (asyncio's default is 64 KiB)
+LINE_LIMIT = 16 * 1024 * 1024
+
+# Seconds to wait for the rest of the result channel after a scraper exited
+CHANNEL_DRAIN_SECONDS = 10
+
+STALLED = "stalled"
+TIMED_OUT = "timed out"
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def stall_seconds():
+    """Seconds without output after which a scraper counts as hung (0 disables the check)."""
+    return _env_float("SCRIPT_STALL_SECONDS", DEFAULT_STALL_SECONDS)
+
+
+def script_deadline(expected_seconds=None):
+    """Hard runtime limit for a script, from its expected runtime if there is one (None: no limit)."""
+    if expected_seconds is None:
+        limit = _env_float("SCRIPT_MAX_SECONDS", DEFAULT_MAX_SECONDS)
+    else:
+        limit = max(expected_seconds * _env_float("SCRIPT_DEADLINE_FACTOR", DEFAULT_DEADLINE_FACTOR),
+                    _env_float("SCRIPT_MIN_DEADLINE_SECONDS", DEFAULT_MIN_DEADLINE_SECONDS))
+    return limit or None
+
+
+def _process_group():
+    if os.name == "nt":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def kill_process_tree(process):
+    """Kill a scraper started by run_process together with every process it spawned."""
+    children = []
+    if psutil is not None:
+        try:
+            children = psutil.Process(process.pid).children(recursive=True)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+    try:
+        if os.name == "nt":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        pass
+    # Chrome can move itself out of the group; psutil still knows it was a child
+    for child in children:
+        try:
+            child.kill()
+        except Exception:
+            pass
+    try:
+        process.kill()
+    except OSError:
+        pass
+
+
+async def run_process(command, env, on_line, deadline=None, stall=None, on_record=None):
+    """Run command in a process group of its own, passing each output line to on_line.
+
+    With on_record, each record the process sends over its result channel is
+    passed to it. The process tree is killed when no line arrives for stall
+    seconds or the process runs longer than deadline seconds. Returns
+    (returncode, killed) where killed is None if the process ended on its own,
+    otherwise STALLED or TIMED_OUT. If the coroutine is cancelled the process
+    tree is killed before the cancellation propagates.
+    """
+    kwargs = _process_group()
+    channel = open_channel(env) if on_record is not None else None
+    if channel is not None:
+        kwargs.update(channel[2])
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            env=env,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            limit=LINE_LIMIT,
+            **kwargs
+        )
+    except BaseException:
+        if channel is not None:
+            os.close(channel[0])
+        raise
+    finally:
+        # Only the scraper holds the write end, so the channel ends when it exits
+        if channel is not None:
+            os.close(channel[1])
+    records = asyncio.ensure_future(read_channel(channel[0], on_record)) if channel is not None else None
+    try:
+        loop = asyncio.get_running_loop()
+        started = last_output = loop.time()
+        killed = None
+        while True:
+            now = loop.time()
+            limits = []
+            if stall:
+                limits.append((last_output + stall - now, STALLED))
+            if deadline:
+                limits.append((started + deadline - now, TIMED_OUT))
+            timeout, reason = min(limits) if limits else (None, None)
+            try:
+                line = await asyncio.wait_for(process.stdout.readline(), max(timeout, 0) if limits else None)
+            except asyncio.TimeoutError:
+                now = loop.time()
+                logger.error(f"Killing process {process.pid}: {reason} "
+                             f"(no output for {now - last_output:.0f}s, running {now - started:.0f}s)")
+                kill_process_tree(process)
+                killed = reason
+                break
+            if not line:
+                break
+            last_output = loop.time()
+            on_line(line.decode("utf-8", errors="replace"))
+        returncode = await process.wait()
+        if records is not None:
+            try:
+                await asyncio.wait_for(records, CHANNEL_DRAIN_SECONDS)
+            except asyncio.TimeoutError:
+                logger.warning(f"Result channel of process {process.pid} still open after it exited, closing it")
+    except BaseException:
+        # Cancelled (e.g. Ctrl+C under asyncio.run): the scraper's own session never sees SIGINT
+        if process.returncode is None:
+            logger.error(f"Killing process {process.pid}: runner interrupted")
+            kill_process_tree(process)
+            try:
+                # Reap it so the transport is closed while the loop still runs
+                await asyncio.wait_for(process.wait(), 5)
+            except BaseException:
+                pass
+        if records is not None:
+            records.cancel()
+        raise
+    return returncode, killed
+
+
+def format_runtime(seconds):
+    """Runtime as written to the runtime log, e.g. "42.00 seconds" or "3.50 minutes"."""
+    if seconds >= 60:
+        return f"{seconds / 60:.2f} minutes"
+    return f"{seconds:.2f} seconds"
+
+
+async def run_scraper(country, script_name, runtime_log, consolidator=None, output_dir=None, label=None,
+                      n_scrape=None, expected_seconds=None, requeue=False, follow=True):
+    """Run one registered scraper as a subprocess and log its output and runtime.
+
+    The scraper is killed if it stops printing or runs far past expected_seconds;
+    with requeue it is then restarted once in resume mode if it supports that.
+    With follow, the rows it streams over its result channel go straight into
+    consolidator. Its runtime is appended to runtime_log and log lines are
+    prefixed with label (default: script_name). Returns (label, success, runtime).
+    """
+    label = label or script_name
+    logger.info(f"Starting {label}")
+    start_time = datetime.now()
+
+    def log_line(line):
+        # The logger writes both the console and the log file
+        logger.info(f"[{label}] {line.rstrip()}")
+
+    def on_record(record, feed):
+        if record.get("type") == "progress":
+            logger.info(f"[{label}] Progress: {record.get('done')}/{record.get('total')} work items")
+        else:
+            feed(record)
+
+    try:
+        resume = False
+        while True:
+            # Command line, output path and environment come from the scraper registry
+            command, env = build_command(country, script_name, n_scrape, output_dir, resume=resume)
+            logger.info(f"Running command: {' '.join(command)}")
+
+            # Stream the output; a scraper that stops printing or overruns its deadline is killed with its browsers
+            if follow and consolidator is not None:
+                with consolidator.following(output_path(country, script_name, output_dir)) as feed:
+                    returncode, killed = await run_process(command, env, log_line,
+                                                           deadline=script_deadline(expected_seconds), stall=stall_seconds(),
+                                                           on_record=lambda record: on_record(record, feed))
+            else:
+                returncode, killed = await run_process(command, env, log_line,
+                                                       deadline=script_deadline(expected_seconds), stall=stall_seconds())
+
+            if killed and requeue and not resume and can_resume(country, script_name):
+                logger.warning(f"{label} {killed}; re-queueing it in resume mode")
+                resume = True
+                continue
+            break
+
+        end_time = datetime.now()
+        runtime_str = format_runtime((end_time - start_time).total_seconds())
+
+        # The runtime log feeds the scheduler's runtime history
+        with open(runtime_log, 'a') as f:
+            f.write(f"{script_name},{start_time.strftime('%Y-%m-%d %H:%M:%S')},{end_time.strftime('%Y-%m-%d %H:%M:%S')},{runtime_str}\n")
+
+        logger.info(f"Runtime for {label}: {runtime_str}")
+
+        success = returncode == 0 and not killed
+        if success:
+            logger.info(f"Successfully completed {label}")
+        elif killed:
+            logger.error(f"Killed {label}: {killed}")
+        else:
+            logger.error(f"Failed to run {label} with return code {returncode}")
+
+        return label, success, runtime_str
+
+    except Exception as e:
+        logger.error(f"Error running {label}: {e}")
+        return label, False, "N/A"
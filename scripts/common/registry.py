@@ -0,0 +1,132 @@
+"""Per-country scraper registries.
+
+Each entry describes how a runner launches one scraper script:
+
+    output        output file name inside the country's output directory
+    n_arg         flag for the number of items to scrape in testing mode
+    output_arg    True if the script takes -o <file>; otherwise OUTPUT_FILE is
+                  set in its environment when output_env is True
+    extra_args    additional command-line arguments
+    resume_args   arguments that make the script continue an interrupted run; with
+                  --requeue the runners restart a killed (stalled or timed-out)
+                  script once with them
+    domain        hostname the script scrapes, for per-host concurrency limits
+    browsers      Chrome instances the script runs at once (memory weight)
+    enabled       False for scripts that are registered but not run by default
+
+Scripts are listed in each country's historical run order.
+"""
+import os
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Interpreter of the production virtual environment used by the SG and MY runners
+VENV_PYTHON = r"C:\projects\TradeBot\venv\Scripts\python.exe"
+
+# Maximum number of scrapers hitting the same host at once
+DOMAIN_LIMITS = {
+    "reebelo.sg": 1,
+}
+DEFAULT_DOMAIN_LIMIT = 2
+
+REGISTRIES = {
+    "Singapore": {
+        "python": VENV_PYTHON,
+        "combined": "Combined_Trade_In_Values.xlsx",
+        "scrapers": {
+            "SG_RV_Source1.py": {"output": "SG_RV_Source1.xlsx", "output_env": True, "extra_args": ["-w", "4"], "domain": "compasiatradeinsg.com", "browsers": 4},
+            "SG_RV_Source2.py": {"output": "SG_RV_Source2.xlsx", "output_arg": True, "domain": "www.samsung.com"},
+            "SG_RV_Source3.py": {"output": "SG_RV_Source3.xlsx", "output_env": True, "domain": "starhubtradein-sg.compasia.com"},
+            "SG_RV_Source4.py": {"output": "SG_RV_Source4.xlsx", "output_arg": True, "domain": "www.singtel.com"},
+            "SG_RV_Source5.py": {"output": "SG_RV_Source5.xlsx", "output_env": True, "domain": "m1tradein.compasia.com"},
+            "SG_RV_Source6.py": {"output": "SG_RV_Source6.xlsx", "output_env": True, "n_arg": "--num_devices", "domain": "sellto.carousell.sg"},
+            "SG_SO_Source2.py": {"output": "SG_SO_Source2.xlsx", "output_arg": True, "extra_args": ["--incremental"], "domain": "compasia.sg"},
+            "SG_RV_Source8.py": {"output": "SG_RV_Source8.xlsx", "output_arg": True, "domain": "reebelo.sg"},
+            "SG_SO_Source3.py": {"output": "SG_SO_Source3.xlsx", "domain": "reebelo.sg"},
+            "SG_SO_Source1.py": {"output": "SG_SO_Source1.xlsx", "output_env": True, "n_arg": "--num_devices", "extra_args": ["-w", "2"], "resume_args": ["--resume"], "domain": "www.carousell.sg", "browsers": 3, "enabled": False},
+        },
+    },
+    "Malaysia": {
+        "python": VENV_PYTHON,
+        "combined": "Combined_Malaysian_Trade_In_Values.xlsx",
+        "scrapers": {
+            "MY_RV_Source1.py": {"output": "MY_RV_Source1.xlsx", "output_arg": True, "extra_args": ["-w", "4"], "domain": "my-caecom-microsite-portal.compasia.com", "browsers": 4},
+            "MY_RV_Source3.py": {"output": "MY_RV_Source3.xlsx", "output_env": True, "domain": "sellto.carousell.com.my"},
+            "MY_RV_Source4.py": {"output": "MY_RV_Source4.xlsx", "output_env": True, "domain": "umobile-tradein.bolttech.my"},
+            "MY_RV_Source5.PY": {"output": "MY_RV_Source5.xlsx", "output_arg": True, "domain": "www.maxis.com.my"},
+            "MY_SO_Source1.py": {"output": "MY_SO_Source1.xlsx", "output_arg": True, "domain": "compasia.my"},
+            "MY_SO_Source2.py": {"output": "MY_SO_Source2.xlsx", "output_env": True, "n_arg": "--num_devices", "domain": "3cat.my"},
+            "MY_SO_Source3.py": {"output": "MY_SO_Source3.xlsx", "output_env": True, "n_arg": "--num_devices", "extra_args": ["-w", "2"], "domain": "www.carousell.my", "browsers": 3},
+        },
+    },
+    "Thailand": {
+        "python": "python",
+        "combined": "Combined_Trade_In_Values.xlsx",
+        "scrapers": {
+            "TH_SO_Source1.py": {"output": "TH_SO_Source1.xlsx", "output_env": True, "domain": "compasia.co.th"},
+            "TH_RV_Source1.py": {"output": "TH_RV_Source1.xlsx", "output_arg": True, "domain": "www.remobie.com"},
+            "TH_RV_Source2.py": {"output": "TH_RV_Source2.xlsx", "output_arg": True, "domain": "www.yellobe.com"},  # Runs in head mode
+            "TH_RV_Source3.py": {"output": "TH_RV_Source3.xlsx", "output_arg": True, "domain": "www.kaitorasap.co.th"},
+            "TH_RV_Source4.py": {"output": "TH_RV_Source4.xlsx", "output_arg": True, "domain": "www.trade-mobile.com"},
+        },
+    },
+}
+
+
+def country_dir(country):
+    return os.path.join(SCRIPTS_DIR, country)
+
+
+def country_output_dir(country):
+    return os.path.join(country_dir(country), "output")
+
+
+def scrapers(country, include_disabled=False):
+    """Script names registered for a country, in run order."""
+    return [script for script, spec in REGISTRIES[country]["scrapers"].items()
+            if include_disabled or spec.get("enabled", True)]
+
+
+def scraper_spec(country, script):
+    return REGISTRIES[country]["scrapers"].get(script, {})
+
+
+def output_path(country, script, output_dir=None):
+    """Full path of a script's output file."""
+    output_dir = output_dir or country_output_dir(country)
+    return os.path.join(output_dir, scraper_spec(country, script).get("output", f"{script}_output.xlsx"))
+
+
+def can_resume(country, script):
+    return "resume_args" in scraper_spec(country, script)
+
+
+def domain_limit(domain):
+    return DOMAIN_LIMITS.get(domain, DEFAULT_DOMAIN_LIMIT)
+
+
+def build_command(country, script, n_scrape=None, output_dir=None, resume=False):
+    """Return (command, env) to launch a registered script.
+
+    env is a copy of the current environment with the runner variables set.
+    resume adds the script's resume_args.
+    """
+    output_dir = output_dir or country_output_dir(country)
+    spec = scraper_spec(country, script)
+    output_file = output_path(country, script, output_dir)
+
+    command = [REGISTRIES[country]["python"], os.path.join(country_dir(country), script)]
+    if n_scrape is not None:
+        command.extend([spec.get("n_arg", "-n"), str(n_scrape)])
+    command.extend(spec.get("extra_args", []))
+    if resume:
+        command.extend(spec.get("resume_args", []))
+    if spec.get("output_arg"):
+        command.extend(["-o", output_file])
+
+    env = os.environ.copy()
+    env["PYTHONUNBUFFERED"] = "1"
+    env["OUTPUT_DIR"] = output_dir
+    if spec.get("output_env"):
+        env["OUTPUT_FILE"] = output_file
+    return command, env
@@ -0,0 +1,292 @@
+"""Record and replay a scraper's HTTP traffic through a local proxy.
+
+In record mode the proxy forwards every request to the live site and stores
+the exchange in a HAR file; in replay mode it answers from that file only, so
+a scraper run can be repeated offline and deterministically. Chrome reaches
+HTTPS sites through the proxy's CONNECT tunnel, which terminates TLS with a
+self-signed certificate (made with the openssl command line and accepted via
+--ignore-certificate-errors).
+
+Scrapers opt in by calling configure_proxy(options) before creating their
+driver; it does nothing unless SCRAPER_PROXY is set, which run_with_proxy()
+does for the command it runs. See replay_scraper.py for the command line.
+"""
+import os
+import ssl
+import json
+import base64
+import hashlib
+import threading
+import subprocess
+import http.client
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Headers that describe a single connection and are never forwarded or replayed
+HOP_BY_HOP_HEADERS = {"connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+                      "proxy-connection", "te", "trailer", "transfer-encoding", "upgrade", "content-length"}
+
+
+def configure_proxy(options):
+    """Route a driver through the record/replay proxy when SCRAPER_PROXY is set."""
+    proxy = os.environ.get("SCRAPER_PROXY")
+    if proxy:
+        options.add_argument(f"--proxy-server={proxy}")
+        options.add_argument("--ignore-certificate-errors")
+    return options
+
+
+def ensure_certificate(directory):
+    """Return (cert_file, key_file) of the proxy's self-signed certificate, creating it if needed."""
+    os.makedirs(directory, exist_ok=True)
+    cert_file = os.path.join(directory, "replay_proxy_cert.pem")
+    key_file = os.path.join(directory, "replay_proxy_key.pem")
+    if not (os.path.exists(cert_file) and os.path.exists(key_file)):
+        subprocess.run(
+            ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "3650",
+             "-subj", "/CN=scraper-replay-proxy", "-keyout", key_file, "-out", cert_file],
+            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+    return cert_file, key_file
+
+
+def _body_hash(body):
+    return hashlib.sha1(body or b"").hexdigest()
+
+
+def _strip_query(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{parts.path}"
+
+
+class Archive:
+    """HAR 1.2 file of recorded exchanges, with the lookup used for replay.
+
+    A request is matched on method, URL and body, then on method and URL, then
+    on method and URL without its query string. Repeated requests are answered
+    with the recorded responses in order, the last one repeating once they run out.
+    """
+
+    def __init__(self, path, load=True):
+        self.path = path
+        self.entries = []
+        self._lock = threading.Lock()
+        self._index = {}
+        self._cursors = {}
+        if load and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.entries = json.load(f)["log"]["entries"]
+            for entry in self.entries:
+                self._add_to_index(entry)
+
+    def _keys(self, method, url, body_hash):
+        return [("body", method, url, body_hash), ("url", method, url), ("path", method, _strip_query(url))]
+
+    def _add_to_index(self, entry):
+        request = entry["request"]
+        for key in self._keys(request["method"], request["url"], entry.get("_bodyHash", _body_hash(b""))):
+            self._index.setdefault(key, []).append(entry)
+
+    def add(self, method, url, request_headers, request_body, status, reason, headers, body):
+        entry = {
+            "startedDateTime": datetime.now(timezone.utc).isoformat(),
+            "time": 0,
+            "request": {
+                "method": method,
+                "url": url,
+                "httpVersion": "HTTP/1.1",
+                "headers": [{"name": name, "value": value} for name, value in request_headers],
+                "queryString": [],
+                "headersSize": -1,
+                "bodySize": len(request_body or b""),
+            },
+            "response": {
+                "status": status,
+                "statusText": reason,
+                "httpVersion": "HTTP/1.1",
+                "headers": [{"name": name, "value": value} for name, value in headers],
+                "content": {
+                    "size": len(body),
+                    "mimeType": dict((k.lower(), v) for k, v in headers).get("content-type", ""),
+                    "text": base64.b64encode(body).decode("ascii"),
+                    "encoding": "base64",
+                },
+                "redirectURL": dict((k.lower(), v) for k, v in headers).get("location", ""),
+                "headersSize": -1,
+                "bodySize": len(body),
+            },
+            "cache": {},
+            "timings": {"send": 0, "wait": 0, "receive": 0},
+            "_bodyHash": _body_hash(request_body),
+        }
+        if request_body:
+            entry["request"]["postData"] = {"mimeType": "", "text": request_body.decode("utf-8", "replace")}
+        with self._lock:
+            self.entries.append(entry)
+            self._add_to_index(entry)
+
+    def lookup(self, method, url, request_body=None):
+        """Return (status, reason, headers, body) of the matching recorded response, or None."""
+        with self._lock:
+            for key in self._keys(method, url, _body_hash(request_body)):
+                candidates = self._index.get(key)
+                if candidates:
+                    position = self._cursors.get(key, 0)
+                    self._cursors[key] = position + 1
+                    entry = candidates[min(position, len(candidates) - 1)]
+                    response = entry["response"]
+                    headers = [(h["name"], h["value"]) for h in response["headers"]]
+                    body = base64.b64decode(response["content"].get("text", ""))
+                    return response["status"], response.get("statusText", ""), headers, body
+        return None
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._lock:
+            har = {"log": {"version": "1.2", "creator": {"name": "scraper-replay", "version": "1"},
+                           "entries": self.entries}}
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(har, f)
+
+
+class _ProxyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Scheme and host of the CONNECT tunnel this handler serves, if any
+    origin = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_CONNECT(self):
+        self.send_response(200, "Connection Established")
+        self.end_headers()
+        try:
+            tls = self.server.ssl_context.wrap_socket(self.connection, server_side=True)
+        except (ssl.SSLError, OSError):
+            self.close_connection = True
+            return
+        host = self.path if not self.path.endswith(":443") else self.path[:-4]
+        tunnel = type("_TunnelHandler", (_ProxyHandler,), {"origin": f"https://{host}"})
+        try:
+            tunnel(tls, self.client_address, self.server)
+        except (ssl.SSLError, OSError):
+            pass
+        self.close_connection = True
+
+    def _exchange(self):
+        url = self.path if self.origin is None else self.origin + self.path
+        length = int(self.headers.get("Content-Length") or 0)
+        request_body = self.rfile.read(length) if length else b""
+
+        if self.server.mode == "record":
+            try:
+                status, reason, headers, body = self._forward(url, request_body)
+            except Exception as e:
+                self.send_error(502, f"Upstream request failed: {e}")
+                return
+            self.server.archive.add(self.command, url, list(self.headers.items()), request_body,
+                                    status, reason, headers, body)
+        else:
+            recorded = self.server.archive.lookup(self.command, url, request_body)
+            if recorded is None:
+                self.server.count("misses", url)
+                self.send_error(404, "Not in the replay archive")
+                return
+            status, reason, headers, body = recorded
+        self.server.count("served")
+
+        self.send_response(status, reason)
+        for name, value in headers:
+            if name.lower() not in HOP_BY_HOP_HEADERS:
+                self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _forward(self, url, request_body):
+        parts = urlsplit(url)
+        if parts.scheme == "https":
+            connection = http.client.HTTPSConnection(parts.netloc, timeout=60, context=ssl.create_default_context())
+        else:
+            connection = http.client.HTTPConnection(parts.netloc, timeout=60)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        headers = {name: value for name, value in self.headers.items()
+                   if name.lower() not in HOP_BY_HOP_HEADERS and name.lower() != "accept-encoding"}
+        # Plain bodies keep the archive readable and replayable as-is
+        headers["Accept-Encoding"] = "identity"
+        try:
+            connection.request(self.command, path, body=request_body or None, headers=headers)
+            response = connection.getresponse()
+            body = response.read()
+            return response.status, response.reason, response.getheaders(), body
+        finally:
+            connection.close()
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = do_HEAD = do_OPTIONS = _exchange
+
+
+class ReplayProxy(ThreadingHTTPServer):
+    """Local proxy in "record" or "replay" mode around an Archive."""
+
+    daemon_threads = True
+
+    def __init__(self, mode, archive, cert_dir, port=0):
+        super().__init__(("127.0.0.1", port), _ProxyHandler)
+        self.mode = mode
+        self.archive = archive
+        self.stats = {"served": 0, "misses": 0}
+        self.missed_urls = []
+        self._lock = threading.Lock()
+        cert_file, key_file = ensure_certificate(cert_dir)
+        self.ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self.ssl_context.load_cert_chain(cert_file, key_file)
+
+    def count(self, key, url=None):
+        with self._lock:
+            self.stats[key] += 1
+            if url is not None and len(self.missed_urls) < 100:
+                self.missed_urls.append(url)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+def run_with_proxy(mode, archive_path, command, env=None, run=None):
+    """Run command with its Chrome drivers routed through a record/replay proxy.
+
+    run(command, env) starts the command and returns its exit code (default
+    subprocess.call). Returns (exit code, proxy stats). In record mode the
+    archive is saved when the command exits.
+    """
+    if mode not in ("record", "replay"):
+        raise ValueError(f"Unknown mode {mode}")
+    if mode == "replay" and not os.path.exists(archive_path):
+        raise FileNotFoundError(f"No archive at {archive_path}, record one first")
+
+    # Recording always starts a fresh archive
+    archive = Archive(archive_path, load=(mode == "replay"))
+    proxy = ReplayProxy(mode, archive, os.path.dirname(os.path.abspath(archive_path)))
+    thread = threading.Thread(target=proxy.serve_forever, daemon=True)
+    thread.start()
+    print(f"{mode.capitalize()} proxy listening on {proxy.url} ({archive_path})")
+
+    env = dict(os.environ if env is None else env)
+    env["SCRAPER_PROXY"] = proxy.url
+    try:
+        returncode = run(command, env) if run is not None else subprocess.call(command, env=env)
+    finally:
+        proxy.shutdown()
+        proxy.server_close()
+        if mode == "record":
+            archive.save()
+            print(f"Recorded {len(archive.entries)} responses to {archive_path}")
+        else:
+            print(f"Replayed {proxy.stats['served']} responses, {proxy.stats['misses']} requests not in the archive")
+            for url in proxy.missed_urls[:10]:
+                print(f"  not recorded: {url}")
+    return returncode, dict(proxy.stats)
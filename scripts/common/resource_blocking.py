@@ -0,0 +1,97 @@
+"""Shared resource-blocking profile for the scraper drivers.
+
+None of the scrapers need images, fonts, video or third-party trackers to read
+prices, yet every page load fetched them. apply_resource_blocking() tells
+Chrome (CDP Network.setBlockedURLs) to drop those requests:
+
+    driver = webdriver.Chrome(options=options)
+    apply_resource_blocking(driver, "SG_RV_Source8")
+
+The profile is BLOCK_CATEGORIES. Per-site changes live in resource_blocking.json
+next to the country folders (or the file named by RESOURCE_BLOCKING_FILE),
+keyed by source name:
+
+    {
+        "SG_SO_Source1": {"allow": ["images"], "deny": ["*youtube.com*"]},
+        "TH_RV_Source2": {"enabled": false}
+    }
+
+allow takes category names or single patterns to unblock, deny adds patterns.
+Set RESOURCE_BLOCKING=0 to turn blocking off for a run.
+"""
+import os
+import json
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OVERRIDES_FILE = os.path.join(SCRIPTS_DIR, "resource_blocking.json")
+
+# URL patterns ("*" matches anything) blocked by default, by category
+BLOCK_CATEGORIES = {
+    "images": ["*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.avif*", "*.bmp*"],
+    "fonts": ["*.woff*", "*.ttf*", "*.otf*", "*.eot*"],
+    "media": ["*.mp4*", "*.webm*", "*.m3u8*", "*.mp3*", "*.ogg*", "*.wav*"],
+    "trackers": [
+        "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+        "*googlesyndication.com*", "*googleadservices.com*", "*connect.facebook.net*",
+        "*facebook.com/tr*", "*analytics.tiktok.com*", "*hotjar.com*", "*clarity.ms*",
+        "*bat.bing.com*", "*snap.licdn.com*", "*criteo.com*", "*criteo.net*",
+        "*taboola.com*", "*outbrain.com*", "*scorecardresearch.com*", "*nr-data.net*",
+        "*js-agent.newrelic.com*", "*segment.io*", "*cdn.segment.com*", "*mixpanel.com*",
+        "*amplitude.com*", "*branch.io*", "*appsflyer.com*", "*adjust.com*",
+    ],
+}
+
+_overrides = None
+
+
+def load_overrides(path=None):
+    """Per-site overrides from the override file; {} if there is none or it cannot be read."""
+    global _overrides
+    if path is None and _overrides is not None:
+        return _overrides
+    path = path or os.environ.get("RESOURCE_BLOCKING_FILE", OVERRIDES_FILE)
+    overrides = {}
+    if os.path.exists(path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                overrides = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not read resource blocking overrides {path}: {e}")
+    _overrides = overrides
+    return overrides
+
+
+def blocked_patterns(site=None, overrides=None):
+    """URL patterns to block for site, after applying its overrides."""
+    override = (overrides if overrides is not None else load_overrides()).get(site or "", {})
+    if override.get("enabled", True) is False:
+        return []
+
+    unblocked = set()
+    for entry in override.get("allow", []):
+        unblocked.update(BLOCK_CATEGORIES.get(entry, [entry]))
+
+    patterns = []
+    for category_patterns in BLOCK_CATEGORIES.values():
+        patterns.extend(pattern for pattern in category_patterns if pattern not in unblocked)
+    patterns.extend(pattern for pattern in override.get("deny", []) if pattern not in patterns)
+    return patterns
+
+
+def apply_resource_blocking(driver, site=None):
+    """Block the profile's requests on driver; returns the patterns in effect.
+
+    Blocking is best effort: a driver without CDP support is left unchanged.
+    """
+    if os.environ.get("RESOURCE_BLOCKING", "1") == "0":
+        return []
+    patterns = blocked_patterns(site)
+    if not patterns:
+        return []
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    except Exception as e:
+        print(f"Resource blocking unavailable: {e}")
+        return []
+    return patterns
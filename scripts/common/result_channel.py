@@ -0,0 +1,217 @@
+"""Structured result channel from a scraper to the runner that started it.
+
+The runner creates a pipe per scraper and passes the write end's descriptor in
+RESULT_CHANNEL_FD. The scraper writes one JSON record per line to it:
+
+    {"type": "row", "output": <file>, "row": {...}}        a row appended to <file> (ResultSink)
+    {"type": "snapshot", "output": <file>, "rows": [...]}  the complete contents just written to <file>
+    {"type": "done", "output": <file>}                     <file> on disk now holds every row sent
+    {"type": "progress", "done": 12, "total": 40}
+
+so the runner keeps each source's rows in memory (Consolidator.following) and
+periodic combination no longer re-parses scraper Excel files. A scraper run on
+its own has no channel and only writes its files, which the runners still read
+as before.
+
+On Windows the pipe's write end is passed as an inheritable handle instead of
+a descriptor (STARTUPINFO handle_list), and since the proactor event loop
+cannot read an anonymous pipe, the runner reads it on a thread of its own.
+"""
+import os
+import json
+import stat
+import asyncio
+import logging
+import threading
+import subprocess
+
+if os.name == "nt":
+    import msvcrt
+
+logger = logging.getLogger("scraper_manager")
+
+CHANNEL_ENV = "RESULT_CHANNEL_FD"
+
+# Longest record read from a scraper (a snapshot carries the whole output file)
+RECORD_LIMIT = 64 * 1024 * 1024
+
+_channel = None
+_channel_checked = False
+_channel_lock = threading.Lock()
+
+
+def _get_channel():
+    global _channel, _channel_checked
+    with _channel_lock:
+        if not _channel_checked:
+            _channel_checked = True
+            # Processes this scraper starts must not write to whatever reuses the descriptor number
+            fd = os.environ.pop(CHANNEL_ENV, "")
+            if fd.isdigit():
+                try:
+                    fd = msvcrt.open_osfhandle(int(fd), os.O_WRONLY) if os.name == "nt" else int(fd)
+                    if stat.S_ISFIFO(os.fstat(fd).st_mode):
+                        _channel = os.fdopen(fd, "w", encoding="utf-8")
+                except OSError:
+                    _channel = None
+        return _channel
+
+
+def channel_enabled():
+    """True if this process was started by a runner listening on a result channel."""
+    return _get_channel() is not None
+
+
+def emit(record):
+    """Write one record to the channel; returns False if there is no channel."""
+    global _channel
+    channel = _get_channel()
+    if channel is None:
+        return False
+    line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+    with _channel_lock:
+        if _channel is None:
+            return False
+        try:
+            _channel.write(line)
+            _channel.flush()
+        except (OSError, ValueError):
+            # The runner went away; keep scraping into the output files
+            _channel = None
+            return False
+    return True
+
+
+def send_row(output_file, row):
+    """Stream one row appended to output_file."""
+    return emit({"type": "row", "output": os.path.abspath(output_file), "row": row})
+
+
+def send_done(output_file):
+    """Tell the runner that output_file on disk holds every row sent for it."""
+    return emit({"type": "done", "output": os.path.abspath(output_file)})
+
+
+def send_reset(output_file):
+    """Tell the runner that output_file was deleted, so rows it read before the scraper started are dropped."""
+    return emit({"type": "snapshot", "output": os.path.abspath(output_file), "rows": []})
+
+
+def publish_frame(output_file, df):
+    """Send df as the complete contents of output_file."""
+    if not channel_enabled():
+        return False
+    return emit({"type": "snapshot", "output": os.path.abspath(output_file), "rows": df.to_dict("records")})
+
+
+def report_progress(done, total=None):
+    """Report work items done (of total); returns False if there is no channel to report to."""
+    return emit({"type": "progress", "done": done, "total": total})
+
+
+def write_excel(df, output_file, **kwargs):
+    """df.to_excel(output_file, index=False) that also publishes the written frame."""
+    df.to_excel(output_file, index=False, **kwargs)
+    publish_frame(output_file, df)
+
+
+def write_excel_rows(df, output_file, start, **kwargs):
+    """write_excel() for a frame that only grew since it held start rows; streams just the new rows.
+
+    A start of 0 means the file is written from scratch, so the frame is
+    published as a snapshot once. Later saves send only df's rows from start
+    on, instead of the whole frame again.
+    """
+    df.to_excel(output_file, index=False, **kwargs)
+    if start <= 0 or start > len(df):
+        publish_frame(output_file, df)
+    elif channel_enabled():
+        for row in df.iloc[start:].to_dict("records"):
+            send_row(output_file, row)
+    return len(df)
+
+
+def open_channel(env):
+    """Create the pipe for one scraper and set RESULT_CHANNEL_FD in its env.
+
+    Returns (read_fd, write_fd, popen_kwargs); popen_kwargs make the scraper
+    inherit the write end (pass_fds, or a handle_list on Windows). The runner
+    closes its own copy of write_fd once the scraper has started.
+    """
+    read_fd, write_fd = os.pipe()
+    if os.name == "nt":
+        handle = msvcrt.get_osfhandle(write_fd)
+        os.set_handle_inheritable(handle, True)
+        env[CHANNEL_ENV] = str(handle)
+        startupinfo = subprocess.STARTUPINFO(lpAttributeList={"handle_list": [handle]})
+        return read_fd, write_fd, {"startupinfo": startupinfo}
+    env[CHANNEL_ENV] = str(write_fd)
+    return read_fd, write_fd, {"pass_fds": (write_fd,)}
+
+
+async def _pipe_lines(read_fd):
+    """Lines of the channel read by the event loop."""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=RECORD_LIMIT)
+    transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader),
+                                                os.fdopen(read_fd, "rb", buffering=0))
+    try:
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError as e:
+                logger.error(f"Skipping oversized result record: {e}")
+                continue
+            if not line:
+                break
+            yield line
+    finally:
+        transport.close()
+
+
+async def _thread_lines(read_fd):
+    """Lines of the channel read by a thread, for event loops that cannot read an anonymous pipe."""
+    loop = asyncio.get_running_loop()
+    lines = asyncio.Queue()
+
+    def read():
+        with os.fdopen(read_fd, "rb") as f:
+            while True:
+                line = f.readline(RECORD_LIMIT + 1)
+                if len(line) > RECORD_LIMIT:
+                    logger.error(f"Skipping oversized result record ({len(line)}+ bytes)")
+                    # Discard the rest of the record
+                    while line and not line.endswith(b"\n"):
+                        line = f.readline(RECORD_LIMIT)
+                    continue
+                try:
+                    loop.call_soon_threadsafe(lines.put_nowait, line)
+                except RuntimeError:
+                    # The runner's event loop is gone; nobody reads the rest
+                    break
+                if not line:
+                    break
+
+    threading.Thread(target=read, name="result-channel", daemon=True).start()
+    while True:
+        line = await lines.get()
+        if not line:
+            break
+        yield line
+
+
+async def read_channel(read_fd, on_record):
+    """Call on_record(record) for each record until every writer closed the channel."""
+    lines = _thread_lines(read_fd) if os.name == "nt" else _pipe_lines(read_fd)
+    try:
+        async for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            try:
+                on_record(record)
+            except Exception as e:
+                logger.error(f"Error handling result record {record.get('type')}: {e}")
+    finally:
+        await lines.aclose()
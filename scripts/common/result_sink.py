@@ -0,0 +1,210 @@
+import os
+import json
+import atexit
+import threading
+
+import openpyxl
+import pandas as pd
+
+from common.result_channel import send_done, send_row
+
+# Standard output schema shared by every scraper
+COLUMNS = ["Country", "Device Type", "Brand", "Model", "Capacity", "Color",
+           "Launch RRP", "Condition", "Value Type", "Currency", "Value",
+           "Source", "Updated on", "Updated by", "Comments"]
+
+# Open sinks, one per output file
+_sinks = {}
+_sinks_lock = threading.Lock()
+
+
+def journal_path(output_file):
+    """Return the path of the append-only journal that backs an .xlsx output file."""
+    base, _ = os.path.splitext(output_file)
+    return base + ".jsonl"
+
+
+def materializing_path(output_file):
+    """Return the path the journal is moved to while materialize() swaps in the new .xlsx."""
+    return journal_path(output_file) + ".materializing"
+
+
+def _read_rows(path):
+    rows = []
+    if not os.path.exists(path):
+        return rows
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            rows.append([record.get(column, "") for column in COLUMNS])
+    return rows
+
+
+def read_journal(output_file):
+    """Read the rows pending in the journal for output_file.
+
+    A truncated last line (e.g. the scraper was killed mid-write) is skipped,
+    so this is safe to call while a scraper is still running. Rows of a
+    materialize() whose new workbook is saved but not yet swapped in are
+    included too.
+    """
+    rows = []
+    if os.path.exists(output_file + ".tmp"):
+        rows.extend(_read_rows(materializing_path(output_file)))
+    rows.extend(_read_rows(journal_path(output_file)))
+    return rows
+
+
+def read_source_file(file):
+    """Read a scraper output file together with any rows still pending in its journal."""
+    frames = []
+    if os.path.exists(file):
+        frames.append(pd.read_excel(file))
+    pending = read_journal(file)
+    if pending:
+        frames.append(pd.DataFrame(pending, columns=COLUMNS))
+    if not frames:
+        return None
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+
+def recover(output_file):
+    """Finish a materialize() that was interrupted after it set its journal aside.
+
+    The journal is only moved aside once the new workbook is saved to .tmp, so
+    a .tmp that is still there holds those rows and is swapped in; without it
+    the swap already happened and the set-aside journal is just removed.
+    """
+    pending = materializing_path(output_file)
+    if not os.path.exists(pending):
+        return
+    tmp_file = output_file + ".tmp"
+    if os.path.exists(tmp_file):
+        os.replace(tmp_file, output_file)
+        print(f"Completed an interrupted save of {output_file}")
+    os.remove(pending)
+
+
+class ResultSink:
+    """Append-only row store for one scraper output file.
+
+    Rows are streamed to a JSON-lines journal next to the .xlsx in O(1) per
+    row and flushed immediately, so a crash never loses more than the row
+    being written. The .xlsx is only rewritten once, by materialize(). Under a
+    runner, each row is also streamed over the result channel.
+    """
+
+    def __init__(self, output_file):
+        self.output_file = output_file
+        self.path = journal_path(output_file)
+        self.rows_written = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(output_file) if os.path.dirname(output_file) else ".", exist_ok=True)
+        recover(output_file)
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def append(self, data):
+        """Append one row given as a dict keyed by the standard column names."""
+        record = {column: data.get(column, "") for column in COLUMNS}
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self.rows_written += 1
+            send_row(self.output_file, record)
+
+    def materialize(self):
+        """Fold the journal into the .xlsx in a single load/save and clear it."""
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+            pending = read_journal(self.output_file)
+            if not pending:
+                send_done(self.output_file)
+                return self.output_file
+
+            workbook = None
+            if os.path.exists(self.output_file):
+                try:
+                    workbook = openpyxl.load_workbook(self.output_file)
+                except Exception as e:
+                    print(f"Error opening existing file: {e}. Creating new file.")
+            if workbook is None:
+                workbook = openpyxl.Workbook()
+                workbook.active.append(COLUMNS)
+            sheet = workbook.active
+            for row in pending:
+                sheet.append(row)
+
+            # Write to a temporary file first so a failed save never corrupts the existing workbook
+            tmp_file = self.output_file + ".tmp"
+            try:
+                workbook.save(tmp_file)
+            except Exception as e:
+                print(f"Error saving Excel file: {e}")
+                return None
+
+            # Set the journal aside before the swap, so a crash at any point neither
+            # loses its rows nor appends them twice on the next run (see recover())
+            set_aside = materializing_path(self.output_file)
+            self._file.close()
+            try:
+                os.replace(self.path, set_aside)
+                os.replace(tmp_file, self.output_file)
+            except Exception as e:
+                print(f"Error saving Excel file: {e}")
+                if os.path.exists(set_aside):
+                    os.replace(set_aside, self.path)
+                self._file = open(self.path, 'a', encoding='utf-8')
+                return None
+            os.remove(set_aside)
+
+            # The rows are now in the workbook, so start a fresh journal
+            self._file = open(self.path, 'w', encoding='utf-8')
+            print(f"Saved {len(pending)} rows to {self.output_file}")
+            send_done(self.output_file)
+            return self.output_file
+
+    def close(self):
+        """Materialize pending rows and release the journal."""
+        if self._file.closed:
+            return
+        self.materialize()
+        with self._lock:
+            self._file.close()
+        if os.path.exists(self.path) and os.path.getsize(self.path) == 0:
+            os.remove(self.path)
+
+
+def get_sink(output_file):
+    """Return the shared sink for output_file, opening it on first use."""
+    key = os.path.abspath(output_file)
+    with _sinks_lock:
+        sink = _sinks.get(key)
+        if sink is None:
+            sink = ResultSink(output_file)
+            _sinks[key] = sink
+        return sink
+
+
+def close_sink(output_file):
+    """Materialize and close the sink for output_file if one is open."""
+    with _sinks_lock:
+        sink = _sinks.pop(os.path.abspath(output_file), None)
+    if sink is not None:
+        sink.close()
+
+
+def _close_all_sinks():
+    for output_file in list(_sinks):
+        close_sink(output_file)
+
+
+# Materialize anything still open when the scraper exits normally
+atexit.register(_close_all_sinks)
@@ -0,0 +1,165 @@
+"""Work-stealing scheduler for the parallel runners.
+
+Instead of fixed batches that wait for their slowest member, every script is
+queued up front and a bounded pool of worker slots starts the next script as
+soon as any slot frees. Scripts are started longest-expected-first (using the
+runtimes recorded in earlier scraper_runtime_*.csv files), which keeps the
+long tail short: a slow scraper starts immediately rather than last.
+
+run_pool is a coroutine: each script runs as an asyncio task (the runners'
+run_scraper coroutines, which drive the scraper subprocess), so one event loop
+supervises every scraper without a Python process or pipe thread per script.
+It can additionally hold a global memory budget (each script weighted by the
+Chrome instances it opens) and per-domain limits, which is what lets the
+cross-country orchestrator share one machine between all registries.
+"""
+import os
+import csv
+import glob
+import time
+import asyncio
+import logging
+import statistics
+
+try:
+    import psutil
+except ImportError:
+    # Memory-based sizing is skipped without psutil
+    psutil = None
+
+logger = logging.getLogger("scraper_manager")
+
+# Expected peak memory of one scraper (Python plus its Chrome) when sizing the pool
+DEFAULT_SCRAPER_MEMORY_MB = 1024
+
+
+def parse_runtime(text):
+    """Parse a runtime as written by run_scraper ("12.34 seconds" / "5.67 minutes") into seconds."""
+    try:
+        value, unit = text.strip().split()[:2]
+        seconds = float(value)
+    except (ValueError, AttributeError):
+        return None
+    if unit.startswith("minute"):
+        seconds *= 60
+    elif unit.startswith("hour"):
+        seconds *= 3600
+    return seconds
+
+
+def load_runtime_history(output_dir, max_files=10):
+    """Return {script_name: expected seconds}, the median over the most recent runtime logs."""
+    files = sorted(glob.glob(os.path.join(output_dir, "scraper_runtime_*.csv")), reverse=True)[:max_files]
+    samples = {}
+    for path in files:
+        try:
+            with open(path, newline="") as f:
+                for row in csv.DictReader(f):
+                    seconds = parse_runtime(row.get("runtime", ""))
+                    if row.get("script_name") and seconds is not None:
+                        samples.setdefault(row["script_name"], []).append(seconds)
+        except (OSError, csv.Error) as e:
+            logger.warning(f"Could not read runtime history {path}: {e}")
+    return {script: statistics.median(values) for script, values in samples.items()}
+
+
+def order_longest_first(scripts, history):
+    """Sort scripts by expected runtime, longest first; scripts without history go first."""
+    return sorted(scripts, key=lambda script: -history.get(script, float("inf")))
+
+
+def default_worker_count(n_scripts):
+    """Number of concurrent scrapers the machine can take, bounded by cores and available RAM.
+
+    MAX_PARALLEL_SCRAPERS overrides the computed value; SCRAPER_MEMORY_MB sets the
+    per-scraper memory estimate.
+    """
+    override = os.environ.get("MAX_PARALLEL_SCRAPERS")
+    if override and override.isdigit():
+        return max(1, min(int(override), n_scripts))
+
+    workers = os.cpu_count() or 1
+    if psutil is not None:
+        available_mb = psutil.virtual_memory().available / (1024 * 1024)
+        workers = min(workers, int(available_mb // scraper_memory_mb()))
+    return max(1, min(workers, n_scripts))
+
+
+def memory_budget_mb():
+    """Memory the scrapers may use together: SCRAPER_MEMORY_BUDGET_MB, else 80% of available RAM.
+
+    Returns None (no budget) when neither is known.
+    """
+    override = os.environ.get("SCRAPER_MEMORY_BUDGET_MB")
+    if override and override.isdigit():
+        return int(override)
+    if psutil is not None:
+        return int(psutil.virtual_memory().available / (1024 * 1024) * 0.8)
+    return None
+
+
+def scraper_memory_mb(browsers=1):
+    """Expected peak memory of a scraper that runs the given number of Chrome instances."""
+    return browsers * int(os.environ.get("SCRAPER_MEMORY_MB", DEFAULT_SCRAPER_MEMORY_MB))
+
+
+async def run_pool(scripts, run, max_workers, memory_of=None, memory_budget=None, domain_of=None, domain_limit=None):
+    """Await run(script) for each script with at most max_workers running at once.
+
+    scripts are started in the given order; a new one is started the moment any
+    running one finishes. With memory_of/memory_budget the running scripts'
+    memory must stay within the budget, and with domain_of/domain_limit at most
+    domain_limit(domain) scripts of one domain run together. A script that does
+    not fit is passed over for the next one in order; when nothing is running the
+    first pending script always starts, so an oversized script cannot stall the
+    pool. Returns {script: result of run(script)}, None for a script whose run raised.
+    """
+    pending = list(scripts)
+    running = {}
+    results = {}
+    memory_in_use = 0
+    domain_counts = {}
+
+    def fits(script):
+        if memory_of is not None and memory_budget is not None and running:
+            if memory_in_use + memory_of(script) > memory_budget:
+                return False
+        if domain_of is not None and domain_limit is not None:
+            domain = domain_of(script)
+            if domain and domain_counts.get(domain, 0) >= domain_limit(domain):
+                return False
+        return True
+
+    while pending or running:
+        while pending and len(running) < max_workers:
+            script = next((s for s in pending if fits(s)), None)
+            if script is None:
+                if running:
+                    break
+                script = pending[0]
+            pending.remove(script)
+            task = asyncio.ensure_future(run(script))
+            memory = memory_of(script) if memory_of is not None else 0
+            domain = domain_of(script) if domain_of is not None else None
+            memory_in_use += memory
+            if domain:
+                domain_counts[domain] = domain_counts.get(domain, 0) + 1
+            running[task] = (script, time.time(), memory, domain)
+            budget = f", {memory_in_use}/{memory_budget} MB" if memory_budget is not None and memory_of is not None else ""
+            logger.info(f"Started {script} ({len(running)}/{max_workers} slots busy{budget}, {len(pending)} queued)")
+
+        # Wait until at least one running script finishes
+        done, _ = await asyncio.wait(list(running), return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            script, started, memory, domain = running.pop(task)
+            if task.exception() is not None:
+                logger.error(f"{script} failed: {task.exception()!r}")
+                results[script] = None
+            else:
+                results[script] = task.result()
+            memory_in_use -= memory
+            if domain:
+                domain_counts[domain] -= 1
+            logger.info(f"{script} finished after {time.time() - started:.0f} seconds, freeing a slot")
+
+    return results
@@ -0,0 +1,239 @@
+"""HTTP-only price extraction for Shopify storefronts (the CompAsia sell-off shops).
+
+Shopify serves every collection as structured JSON at
+/collections/<handle>/products.json?limit=250&page=N, including each product's
+option names and all of its variants with prices, so a whole catalogue can be
+read with a handful of requests instead of clicking through every swatch in a
+browser. If a store stops returning that shape, ShopifyShapeError is raised
+and the scrapers fall back to their Selenium crawl.
+
+For offline testing, pass fetch=fixture_fetcher(directory) to read saved
+responses; recording_fetcher(directory) saves live responses under the same
+file names.
+"""
+import os
+import re
+import json
+import hashlib
+import time
+import urllib.request
+from urllib.parse import urlparse, urlencode
+
+PAGE_LIMIT = 250
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+CAPACITY_OPTION_NAMES = ("capacity", "storage")
+CONDITION_OPTION_NAMES = ("condition", "grading", "cosmetic")
+COLOR_OPTION_NAMES = ("color", "colour")
+KNOWN_CONDITIONS = ("Excellent", "Good", "Fair")
+CAPACITY_PATTERN = re.compile(r'(\d+\s*[GT]B)', re.IGNORECASE)
+
+
+class ShopifyShapeError(Exception):
+    """The storefront did not return the expected products.json structure."""
+
+
+def fetch_json(url, timeout=30, retries=3, backoff=2):
+    """GET url and decode the JSON body, retrying transient failures."""
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT, "Accept": "application/json"})
+    for attempt in range(retries):
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                return json.loads(response.read().decode("utf-8"))
+        except ValueError as e:
+            raise ShopifyShapeError(f"{url} did not return JSON: {e}")
+        except Exception as e:
+            if attempt == retries - 1:
+                raise
+            print(f"Request to {url} failed ({e}), retrying...")
+            time.sleep(backoff * (attempt + 1))
+
+
+def fixture_name(url):
+    """File name a response for url is stored under in a fixture directory."""
+    parsed = urlparse(url)
+    key = f"{parsed.netloc}{parsed.path}"
+    if parsed.query:
+        key += f"_{parsed.query}"
+    return re.sub(r'[^A-Za-z0-9.=-]+', '_', key).strip('_') + ".json"
+
+
+def fixture_fetcher(directory):
+    """Return a fetch function that reads saved responses from directory instead of the network."""
+    def fetch(url):
+        path = os.path.join(directory, fixture_name(url))
+        if not os.path.exists(path):
+            # A missing page behaves like the end of the collection
+            return {"products": []}
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return fetch
+
+
+def recording_fetcher(directory, fetch=fetch_json):
+    """Return a fetch function that saves every response to directory as a fixture."""
+    os.makedirs(directory, exist_ok=True)
+
+    def record(url):
+        data = fetch(url)
+        with open(os.path.join(directory, fixture_name(url)), "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        return data
+    return record
+
+
+def product_fingerprint(product_url, fetch=fetch_json):
+    """Hash of a product's title and variant prices/availability from its /products/<handle>.js endpoint."""
+    data = fetch(product_url.split("?")[0].rstrip("/") + ".js")
+    if not isinstance(data, dict) or not isinstance(data.get("variants"), list):
+        raise ShopifyShapeError(f"{product_url}.js has no variants")
+    variants = sorted((str(v.get("id")), v.get("title"), v.get("price"), v.get("available")) for v in data["variants"])
+    text = json.dumps([data.get("title"), variants], sort_keys=True)
+    return "shopify:" + hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def collection_products(collection_url, fetch=fetch_json, max_products=None, delay=0):
+    """Return every product in a collection, following products.json pagination."""
+    base_url = collection_url.split("?")[0].rstrip("/")
+    products = []
+    page = 1
+    while True:
+        url = f"{base_url}/products.json?{urlencode({'limit': PAGE_LIMIT, 'page': page})}"
+        data = fetch(url)
+        if not isinstance(data, dict) or not isinstance(data.get("products"), list):
+            raise ShopifyShapeError(f"{url} has no products list")
+
+        batch = data["products"]
+        for product in batch:
+            if not isinstance(product.get("variants"), list) or "title" not in product:
+                raise ShopifyShapeError(f"Product without title/variants in {url}")
+        products.extend(batch)
+        print(f"Fetched page {page} of {base_url}: {len(batch)} products")
+
+        if max_products is not None and len(products) >= max_products:
+            return products[:max_products]
+        if len(batch) < PAGE_LIMIT:
+            return products
+        page += 1
+        if delay:
+            time.sleep(delay)
+
+
+def _option_position(product, names):
+    """1-based position of the first option whose name contains one of names, or None."""
+    for index, option in enumerate(product.get("options") or []):
+        option_name = option.get("name", "") if isinstance(option, dict) else str(option)
+        if any(name in option_name.lower() for name in names):
+            return option.get("position", index + 1) if isinstance(option, dict) else index + 1
+    return None
+
+
+def _variant_options(variant):
+    return [variant.get(f"option{i}") for i in (1, 2, 3) if variant.get(f"option{i}")]
+
+
+def normalize_capacity(text):
+    match = CAPACITY_PATTERN.search(text or "")
+    return match.group(1).replace(" ", "").upper() if match else ""
+
+
+def normalize_condition(text, condition_map=None):
+    """Map a condition option value to the labels the browser scrapers produce."""
+    text = (text or "").strip()
+    if condition_map:
+        mapped = condition_map.get(text.lower())
+        if mapped:
+            return mapped
+    for condition in KNOWN_CONDITIONS:
+        if condition.lower() in text.lower():
+            return condition
+    return text
+
+
+def product_brand(product):
+    """Brand from the product vendor, falling back to its first non-capacity tag."""
+    vendor = (product.get("vendor") or "").strip()
+    if vendor and "compasia" not in vendor.lower():
+        return vendor
+    tags = product.get("tags") or []
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    for tag in tags:
+        tag = tag.strip()
+        if tag and not CAPACITY_PATTERN.search(tag):
+            return tag
+    return ""
+
+
+def variant_prices(product, condition_map=None):
+    """Return {(capacity, condition): price} for one product.
+
+    Colour variants of the same capacity and condition collapse to one entry,
+    preferring the lowest in-stock price like the storefront's default swatch.
+    """
+    capacity_position = _option_position(product, CAPACITY_OPTION_NAMES)
+    condition_position = _option_position(product, CONDITION_OPTION_NAMES)
+    color_position = _option_position(product, COLOR_OPTION_NAMES)
+
+    prices = {}
+    for variant in product["variants"]:
+        options = _variant_options(variant)
+        if capacity_position:
+            capacity = normalize_capacity(variant.get(f"option{capacity_position}"))
+        else:
+            capacity = next((normalize_capacity(o) for o in options if normalize_capacity(o)), "")
+        if not capacity:
+            capacity = normalize_capacity(product["title"])
+
+        if condition_position:
+            condition = normalize_condition(variant.get(f"option{condition_position}"), condition_map)
+        else:
+            # Any option that is neither colour nor capacity is taken as the condition
+            remaining = [o for i, o in enumerate(options, 1)
+                         if i != color_position and not normalize_capacity(o)]
+            condition = normalize_condition(remaining[0], condition_map) if remaining else "Unknown"
+
+        try:
+            price = float(variant.get("price"))
+        except (TypeError, ValueError):
+            continue
+        available = variant.get("available", True)
+
+        key = (capacity, condition)
+        best = prices.get(key)
+        if best is None or (available, -price) > (best[1], -best[0]):
+            prices[key] = (price, available)
+
+    return {key: int(price) if price.is_integer() else price for key, (price, _) in prices.items()}
+
+
+def collection_rows(collection_urls, defaults, n_scrape=None, fetch=fetch_json, condition_map=None, delay=0):
+    """Build result rows (dicts in the standard column layout) for every product in the collections.
+
+    n_scrape limits the number of products per collection. Raises
+    ShopifyShapeError if the store does not expose usable products.json data.
+    """
+    rows = []
+    for collection_url in collection_urls:
+        device_type = "SmartPhone" if "smartphone" in collection_url else "Tablet"
+        products = collection_products(collection_url, fetch, max_products=n_scrape, delay=delay)
+        print(f"{len(products)} {device_type} products in {collection_url}")
+
+        for product in products:
+            model = re.sub(r'\s+', ' ', product["title"]).strip()
+            brand = product_brand(product)
+            for (capacity, condition), price in variant_prices(product, condition_map).items():
+                row = defaults.copy()
+                row.update({
+                    "Device Type": device_type,
+                    "Brand": brand,
+                    "Model": model,
+                    "Capacity": capacity,
+                    "Condition": condition,
+                    "Value": price
+                })
+                rows.append(row)
+
+    if not rows:
+        raise ShopifyShapeError("No variant prices found in any collection")
+    return rows
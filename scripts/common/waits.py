@@ -0,0 +1,247 @@
+"""Event-driven wait primitives and the per-run sleep budget.
+
+A fixed time.sleep() always costs its full duration, even when the page was
+ready long before. The waits here poll the browser (through WebDriverWait)
+for the condition the sleep was standing in for and return as soon as it
+holds:
+
+    wait_for_page_ready            document.readyState is complete
+    wait_for_network_idle          no fetch/XHR in flight and no new resources for idle_ms
+    wait_for_dom_quiet             no DOM mutations for quiet_ms
+    wait_for_element_count_stable  the number of matches for a selector stopped changing
+    wait_for_text_change           an element's text differs from a previous value
+
+A timeout is never an error: every wait returns a falsy value and the caller
+carries on, exactly as it would have after the old sleep.
+
+enable_sleep_budget() additionally accounts every remaining time.sleep() made
+from the scraper scripts and reports, at exit, how much of the run was spent
+sleeping versus waiting. Set SLEEP_BUDGET_FILE to also write the report as JSON.
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+from collections import defaultdict
+
+from selenium.webdriver.support.ui import WebDriverWait
+
+COMMON_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.dirname(COMMON_DIR)
+
+_real_sleep = time.sleep
+_lock = threading.Lock()
+_started = time.time()
+_stats = {
+    "sleep_seconds": 0.0,
+    "sleep_calls": 0,
+    "wait_seconds": 0.0,
+    "wait_calls": 0,
+    "wait_timeouts": 0,
+}
+_sleep_sites = defaultdict(lambda: [0, 0.0])
+_wait_kinds = defaultdict(lambda: [0, 0.0, 0])
+_enabled = False
+
+DOM_QUIET_SCRIPT = """
+if (!window.__domQuiet) {
+    var state = window.__domQuiet = {last: Date.now()};
+    new MutationObserver(function() { state.last = Date.now(); })
+        .observe(document.documentElement || document, {childList: true, subtree: true, attributes: true, characterData: true});
+}
+return Date.now() - window.__domQuiet.last;
+"""
+
+NETWORK_IDLE_SCRIPT = """
+var state = window.__networkIdle;
+if (!state) {
+    state = window.__networkIdle = {pending: 0, last: Date.now(), resources: 0};
+    var send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function() {
+        state.pending++;
+        state.last = Date.now();
+        this.addEventListener('loadend', function() { state.pending--; state.last = Date.now(); });
+        return send.apply(this, arguments);
+    };
+    if (window.fetch) {
+        var fetch = window.fetch;
+        window.fetch = function() {
+            state.pending++;
+            state.last = Date.now();
+            return fetch.apply(this, arguments).finally(function() { state.pending--; state.last = Date.now(); });
+        };
+    }
+}
+var resources = performance.getEntriesByType('resource').length;
+if (resources !== state.resources) {
+    state.resources = resources;
+    state.last = Date.now();
+}
+if (document.readyState !== 'complete' || state.pending > 0) {
+    return 0;
+}
+return Date.now() - state.last;
+"""
+
+TEXT_SCRIPT = """
+var element = document.querySelector(arguments[0]);
+return element ? (element.innerText || element.textContent || '').trim() : '';
+"""
+
+
+def _record_wait(kind, seconds, timed_out):
+    with _lock:
+        _stats["wait_seconds"] += seconds
+        _stats["wait_calls"] += 1
+        _stats["wait_timeouts"] += int(timed_out)
+        entry = _wait_kinds[kind]
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] += int(timed_out)
+
+
+def _wait(kind, driver, condition, timeout, poll=0.1):
+    """Run WebDriverWait(condition) and return its value, or None on timeout."""
+    start = time.time()
+    try:
+        result = WebDriverWait(driver, timeout, poll).until(condition)
+        _record_wait(kind, time.time() - start, False)
+        return result
+    except Exception:
+        _record_wait(kind, time.time() - start, True)
+        return None
+
+
+def wait_for_page_ready(driver, timeout=15):
+    """Wait until document.readyState is complete."""
+    return bool(_wait("page_ready", driver,
+                      lambda d: d.execute_script("return document.readyState") == "complete",
+                      timeout))
+
+
+def wait_for_network_idle(driver, idle_ms=500, timeout=15):
+    """Wait until the page is loaded, no fetch/XHR is pending and no resource was fetched for idle_ms.
+
+    Requests are tracked from the first call on a page, so call it right after
+    the action that triggers them.
+    """
+    return bool(_wait("network_idle", driver,
+                      lambda d: (d.execute_script(NETWORK_IDLE_SCRIPT) or 0) >= idle_ms,
+                      timeout))
+
+
+def wait_for_dom_quiet(driver, quiet_ms=500, timeout=10):
+    """Wait until the DOM has not changed for quiet_ms."""
+    return bool(_wait("dom_quiet", driver,
+                      lambda d: (d.execute_script(DOM_QUIET_SCRIPT) or 0) >= quiet_ms,
+                      timeout))
+
+
+def wait_for_element_count_stable(driver, selector, stable_ms=1000, timeout=15, min_count=1):
+    """Wait until at least min_count elements match selector and the count held for stable_ms.
+
+    Returns the final count, or None on timeout.
+    """
+    state = {"count": None, "since": time.time()}
+
+    def stable(d):
+        count = d.execute_script("return document.querySelectorAll(arguments[0]).length;", selector)
+        now = time.time()
+        if count != state["count"]:
+            state["count"] = count
+            state["since"] = now
+            return False
+        if count >= min_count and (now - state["since"]) * 1000 >= stable_ms:
+            return count
+        return False
+
+    return _wait("element_count_stable", driver, stable, timeout, poll=0.25)
+
+
+def read_text(driver, selector):
+    """Visible text of the first element matching selector, or '' if there is none."""
+    try:
+        return driver.execute_script(TEXT_SCRIPT, selector) or ""
+    except Exception:
+        return ""
+
+
+def wait_for_text_change(driver, selector, previous_text, timeout=5):
+    """Wait until the text of selector is non-empty and differs from previous_text.
+
+    Two states can legitimately show the same text, so callers should treat a
+    timeout as "unchanged" rather than as a failure.
+    """
+    return bool(_wait("text_change", driver,
+                      lambda d: read_text(d, selector) not in ("", previous_text),
+                      timeout, poll=0.25))
+
+
+def _accounted_sleep(seconds):
+    start = time.time()
+    try:
+        _real_sleep(seconds)
+    finally:
+        caller = sys._getframe(1)
+        filename = caller.f_code.co_filename
+        # Only fixed sleeps written in the scrapers count, not library polling (common/ included)
+        path = os.path.abspath(filename)
+        if path.startswith(SCRIPTS_DIR + os.sep) and not path.startswith(COMMON_DIR + os.sep):
+            elapsed = time.time() - start
+            site = f"{os.path.basename(filename)}:{caller.f_lineno}"
+            with _lock:
+                _stats["sleep_seconds"] += elapsed
+                _stats["sleep_calls"] += 1
+                _sleep_sites[site][0] += 1
+                _sleep_sites[site][1] += elapsed
+
+
+def sleep_budget():
+    """Snapshot of the sleep and wait accounting for this run."""
+    with _lock:
+        runtime = time.time() - _started
+        report = dict(_stats)
+        report["runtime_seconds"] = runtime
+        report["sleep_share"] = report["sleep_seconds"] / runtime if runtime else 0.0
+        report["top_sleep_sites"] = sorted(
+            ({"site": site, "calls": calls, "seconds": seconds} for site, (calls, seconds) in _sleep_sites.items()),
+            key=lambda entry: entry["seconds"], reverse=True
+        )[:10]
+        report["waits"] = {kind: {"calls": calls, "seconds": seconds, "timeouts": timeouts}
+                           for kind, (calls, seconds, timeouts) in _wait_kinds.items()}
+    return report
+
+
+def report_sleep_budget():
+    """Print the sleep budget and write it to SLEEP_BUDGET_FILE if that is set."""
+    report = sleep_budget()
+    print(f"Sleep budget: {report['sleep_seconds']:.1f}s in {report['sleep_calls']} fixed sleeps "
+          f"({report['sleep_share']:.0%} of {report['runtime_seconds']:.1f}s runtime), "
+          f"{report['wait_seconds']:.1f}s in {report['wait_calls']} event waits "
+          f"({report['wait_timeouts']} timed out)")
+    for entry in report["top_sleep_sites"][:5]:
+        print(f"  {entry['site']}: {entry['seconds']:.1f}s over {entry['calls']} sleeps")
+
+    path = os.environ.get("SLEEP_BUDGET_FILE")
+    if path:
+        try:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+        except OSError as e:
+            print(f"Could not write sleep budget to {path}: {e}")
+    return report
+
+
+def enable_sleep_budget():
+    """Account every time.sleep() made from the scraper scripts and report the budget at exit.
+
+    With threads the sleep total can exceed the wall-clock runtime.
+    """
+    global _enabled
+    if _enabled:
+        return
+    _enabled = True
+    time.sleep = _accounted_sleep
+    atexit.register(report_sleep_budget)
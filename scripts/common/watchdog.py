@@ -0,0 +1,142 @@
+"""Deadlines for WebDriver operations, enforced by one monitor thread per watchdog.
+
+    watchdog = Watchdog(on_timeout=kill_browser, timeout=30)
+    with watchdog.operation("navigate"):
+        driver.get(url)
+
+An operation still running at its deadline triggers its on_timeout callback
+once (typically killing the browser process tree, which makes the blocked
+WebDriver call fail) and the watchdog keeps monitoring later operations, so a
+run stays protected after any number of freezes. Several threads can have
+operations running under the same watchdog at once.
+
+Every operation's duration is recorded per name in a process-wide histogram:
+operation_stats() returns it, format_operation_stats() renders it for the
+end-of-run summary and benchmark runs include it in their metrics.
+"""
+import time
+import threading
+from contextlib import contextmanager
+
+DEFAULT_TIMEOUT = 30
+
+# Upper bounds (seconds) of the histogram buckets; the last bucket is open-ended
+BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 30, 60)
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _bucket_label(index):
+    if index < len(BUCKETS):
+        return f"<={BUCKETS[index]:g}s"
+    return f">{BUCKETS[-1]:g}s"
+
+
+def record_timing(name, seconds, timed_out=False):
+    """Add one operation duration to the process-wide histogram."""
+    index = next((i for i, bound in enumerate(BUCKETS) if seconds <= bound), len(BUCKETS))
+    with _stats_lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = {"count": 0, "timeouts": 0, "seconds": 0.0, "max": 0.0,
+                                    "buckets": [0] * (len(BUCKETS) + 1)}
+        stats["count"] += 1
+        stats["timeouts"] += int(timed_out)
+        stats["seconds"] += seconds
+        stats["max"] = max(stats["max"], seconds)
+        stats["buckets"][index] += 1
+
+
+def operation_stats():
+    """{operation: {count, timeouts, mean_seconds, max_seconds, histogram}} for this process."""
+    with _stats_lock:
+        return {
+            name: {
+                "count": stats["count"],
+                "timeouts": stats["timeouts"],
+                "mean_seconds": round(stats["seconds"] / stats["count"], 3),
+                "max_seconds": round(stats["max"], 3),
+                "histogram": {_bucket_label(i): n for i, n in enumerate(stats["buckets"]) if n},
+            }
+            for name, stats in sorted(_stats.items())
+        }
+
+
+def format_operation_stats():
+    """One line per operation name, slowest total first."""
+    stats = operation_stats()
+    if not stats:
+        return "No timed operations"
+    lines = ["Operation timings:"]
+    for name, s in sorted(stats.items(), key=lambda item: -item[1]["mean_seconds"] * item[1]["count"]):
+        histogram = " ".join(f"{label}:{n}" for label, n in s["histogram"].items())
+        lines.append(f"  {name}: {s['count']} calls, mean {s['mean_seconds']:.2f}s, "
+                     f"max {s['max_seconds']:.2f}s, {s['timeouts']} timeouts [{histogram}]")
+    return "\n".join(lines)
+
+
+class Watchdog:
+    """Monitor thread that calls on_timeout(name, elapsed) for operations past their deadline."""
+
+    def __init__(self, on_timeout=None, timeout=DEFAULT_TIMEOUT, interval=0.5):
+        self.on_timeout = on_timeout
+        self.timeout = timeout
+        self.interval = interval
+        self.triggered = 0
+        self._active = {}
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+        self._thread.start()
+
+    def start(self, name, timeout=None, on_timeout=None):
+        """Start timing an operation; returns the token to pass to end()."""
+        token = object()
+        started = time.time()
+        deadline = started + (timeout if timeout is not None else self.timeout)
+        with self._lock:
+            self._active[token] = [name, started, deadline, on_timeout or self.on_timeout, False]
+        return token
+
+    def end(self, token):
+        """Finish an operation and record its duration; returns the elapsed seconds."""
+        with self._lock:
+            entry = self._active.pop(token, None)
+        if entry is None:
+            return None
+        name, started, _, _, timed_out = entry
+        elapsed = time.time() - started
+        record_timing(name, elapsed, timed_out)
+        return elapsed
+
+    @contextmanager
+    def operation(self, name, timeout=None, on_timeout=None):
+        """Context manager form of start()/end()."""
+        token = self.start(name, timeout, on_timeout)
+        try:
+            yield
+        finally:
+            self.end(token)
+
+    def _watch(self):
+        while not self._closed.wait(self.interval):
+            now = time.time()
+            expired = []
+            with self._lock:
+                for entry in self._active.values():
+                    if not entry[4] and now >= entry[2]:
+                        # Each operation triggers once; the watchdog keeps running for later ones
+                        entry[4] = True
+                        expired.append((entry[0], now - entry[1], entry[3]))
+            for name, elapsed, callback in expired:
+                self.triggered += 1
+                if callback is None:
+                    continue
+                try:
+                    callback(name, elapsed)
+                except Exception as e:
+                    print(f"Watchdog handler for '{name}' failed: {e}")
+
+    def close(self):
+        self._closed.set()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+"""Record a scraper run's HTTP traffic, or replay it offline.
+
+    python replay_scraper.py record Singapore/SG_SO_Source3.py -n 3
+    python replay_scraper.py replay Singapore/SG_SO_Source3.py -n 3
+
+Recording runs the scraper against the live sites through a local proxy and
+saves every response to replay_archives/<script>.har; replaying runs it again
+with the proxy answering from that archive only. Arguments after the script
+name are passed to it unchanged. Outputs go to replay_archives/output so the
+production output folders are not touched.
+
+Only traffic from the Chrome drivers is proxied; the Shopify JSON readers have
+their own --fixtures/--save-fixtures options.
+"""
+import os
+import sys
+import argparse
+
+from common.replay import run_with_proxy
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ARCHIVE_DIR = os.path.join(SCRIPTS_DIR, "replay_archives")
+
+
+def default_archive(script):
+    return os.path.join(ARCHIVE_DIR, os.path.splitext(os.path.basename(script))[0] + ".har")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record or replay the HTTP traffic of a scraper run')
+    parser.add_argument('mode', choices=['record', 'replay'])
+    parser.add_argument('script', help='Scraper script, e.g. Singapore/SG_SO_Source3.py')
+    parser.add_argument('-a', '--archive', help='HAR archive (default: replay_archives/<script>.har)', default=None)
+    parser.add_argument('--output-dir', help='OUTPUT_DIR for the scraper (default: replay_archives/output)',
+                        default=os.path.join(ARCHIVE_DIR, "output"))
+    parser.add_argument('script_args', nargs=argparse.REMAINDER, help='Arguments passed to the scraper')
+    args = parser.parse_args()
+
+    script = args.script if os.path.isabs(args.script) else os.path.join(SCRIPTS_DIR, args.script)
+    archive = args.archive or default_archive(script)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    env = os.environ.copy()
+    env["PYTHONUNBUFFERED"] = "1"
+    env["OUTPUT_DIR"] = args.output_dir
+
+    returncode, stats = run_with_proxy(args.mode, archive, [sys.executable, script] + args.script_args, env)
+    sys.exit(returncode)
+
+
+if __name__ == "__main__":
+    main()
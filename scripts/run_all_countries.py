@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+"""Run the scrapers of every country on one machine under a shared resource budget.
+
+The country runners each size their own pool, so starting all three at once
+oversubscribes memory. This entry point loads the per-country registries from
+common.registry and schedules every scraper in one pool, bounded by a global
+concurrency limit, a memory budget (each scraper weighted by the Chrome
+instances it opens) and per-host limits. Outputs, runtime logs and combined
+files go to each country's own output directory, as with the country runners.
+"""
+import os
+import time
+import logging
+from datetime import datetime
+import argparse
+import asyncio
+import threading
+import glob
+
+from common.consolidation import Consolidator, find_source_files, write_delta
+from common.price_store import record_run
+from common.process_guard import run_scraper
+from common.registry import REGISTRIES, country_output_dir, domain_limit, scraper_spec, scrapers
+from common.scheduler import load_runtime_history, memory_budget_mb, order_longest_first, run_pool, scraper_memory_mb
+
+# Configure logging
+timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+log_filename = f"regional_log_{timestamp}.log"
+runtime_log_filename = f"scraper_runtime_{timestamp}.csv"
+
+# Orchestrator logs; scraper outputs stay in each country's output folder
+output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "output")
+os.makedirs(output_dir, exist_ok=True)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler(os.path.join(output_dir, log_filename)),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger("scraper_manager")
+
+# Global flag to control the periodic combination thread
+stop_combining = False
+
+# One consolidator per country, shared by the periodic and the final combination
+consolidators = {country: Consolidator() for country in REGISTRIES}
+
+
+def job_name(country, script):
+    return f"{country}/{script}"
+
+
+def split_job(job):
+    country, script = job.split("/", 1)
+    return country, script
+
+
+def runtime_log_path(country):
+    return os.path.join(country_output_dir(country), runtime_log_filename)
+
+
+def run_job(job, n_scrape=None, expected_seconds=None, requeue=False, follow=True):
+    """run_scraper() for a "Country/script" job, feeding its country's consolidator."""
+    country, script_name = split_job(job)
+    return run_scraper(country, script_name, runtime_log_path(country), consolidators[country], label=job,
+                       n_scrape=n_scrape, expected_seconds=expected_seconds, requeue=requeue, follow=follow)
+
+
+def cleanup_intermediate_files(directory, keep_files=()):
+    """Remove old intermediate combined files."""
+    keep_names = {os.path.basename(f) for f in keep_files}
+    for file in glob.glob(os.path.join(directory, "Combined_*_*.xlsx")):
+        if os.path.basename(file) in keep_names:
+            continue
+        try:
+            os.remove(file)
+            logger.info(f"Removed old intermediate file: {file}")
+        except Exception as e:
+            logger.error(f"Failed to remove intermediate file {file}: {e}")
+
+
+def combine_country(country, snapshot=False):
+    """Combine one country's output files into its combined file; returns the path or None."""
+    directory = country_output_dir(country)
+    output_file = REGISTRIES[country]["combined"]
+    files = find_source_files(directory)
+    if not files:
+        logger.info(f"{country}: No Excel files found to combine")
+        return None
+
+    main_combined_path = os.path.join(directory, output_file)
+    snapshot_name = f"Combined_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{output_file}" if snapshot else None
+    snapshot_path = os.path.join(directory, snapshot_name) if snapshot else None
+
+    rows = consolidators[country].write(files, main_combined_path, snapshot_path)
+    if rows is None:
+        logger.info(f"{country}: No changes since last combination, {output_file} is up to date")
+        return main_combined_path
+    if not rows:
+        logger.warning(f"{country}: No data to combine")
+        return None
+
+    logger.info(f"{country}: Saved {rows} rows from {len(files)} files to {main_combined_path}")
+    cleanup_intermediate_files(directory, [snapshot_name or output_file, output_file])
+    return main_combined_path
+
+
+def periodic_combine(interval_minutes, countries):
+    """Periodically combine each country's output files."""
+    logger.info(f"Starting periodic file combination every {interval_minutes} minutes")
+
+    while not stop_combining:
+        time.sleep(interval_minutes * 60)
+        if stop_combining:
+            break
+
+        for country in countries:
+            try:
+                combine_country(country, snapshot=True)
+            except Exception as e:
+                logger.error(f"Error in periodic file combination for {country}: {e}")
+
+
+def build_jobs(countries):
+    """All enabled scrapers of the given countries, longest expected runtime first."""
+    jobs = []
+    history = {}
+    for country in countries:
+        os.makedirs(country_output_dir(country), exist_ok=True)
+        with open(runtime_log_path(country), 'w') as f:
+            f.write("script_name,start_time,end_time,runtime\n")
+        for script, seconds in load_runtime_history(country_output_dir(country)).items():
+            history[job_name(country, script)] = seconds
+        jobs.extend(job_name(country, script) for script in scrapers(country))
+    return order_longest_first(jobs, history), history
+
+
+def job_memory(job):
+    return scraper_memory_mb(scraper_spec(*split_job(job)).get("browsers", 1))
+
+
+def job_domain(job):
+    return scraper_spec(*split_job(job)).get("domain")
+
+
+def main():
+    """Run the scrapers of all selected countries through one budgeted pool."""
+    global stop_combining
+
+    start_time = datetime.now()
+    logger.info(f"Starting regional scraping job at {start_time}")
+
+    parser = argparse.ArgumentParser(description='Run the scrapers of several countries under one resource budget')
+    parser.add_argument('--countries', nargs='+', choices=list(REGISTRIES), default=list(REGISTRIES),
+                        help='Countries to run (default: all)')
+    parser.add_argument('-n', type=int, help='Number of items to scrape (for testing)', default=None)
+    parser.add_argument('--no-combine', action='store_true', help='Do not combine results per country')
+    parser.add_argument('-i', '--interval', type=int, help='Interval in minutes for periodic file combination',
+                        default=10)
+    parser.add_argument('-w', '--workers', type=int, help='Maximum number of scrapers running at once (default: CPU cores)',
+                        default=None)
+    parser.add_argument('-m', '--memory-mb', type=int, help='Memory budget in MB shared by all scrapers '
+                        '(default: SCRAPER_MEMORY_BUDGET_MB or 80%% of available RAM)', default=None)
+    parser.add_argument('--requeue', action='store_true',
+                        help='Restart a stalled or timed-out scraper once in resume mode if it supports it')
+    args = parser.parse_args()
+
+    jobs, history = build_jobs(args.countries)
+    workers = max(1, min(args.workers or os.cpu_count() or 1, len(jobs)))
+    budget = args.memory_mb or memory_budget_mb()
+    logger.info(f"{len(jobs)} scrapers from {', '.join(args.countries)} on {workers} worker slots, "
+                f"memory budget {budget if budget is not None else 'unlimited'} MB")
+    logger.info("Start order (expected runtime): " + ", ".join(
+        f"{job} ({history[job] / 60:.1f} min)" if job in history else f"{job} (unknown)"
+        for job in jobs
+    ))
+
+    combine_thread = None
+    if not args.no_combine:
+        stop_combining = False
+        combine_thread = threading.Thread(target=periodic_combine, args=(args.interval, args.countries))
+        combine_thread.daemon = True
+        combine_thread.start()
+
+    # Every scraper is driven from this one event loop
+    finished = asyncio.run(run_pool(
+        jobs,
+        lambda job: run_job(job, args.n, history.get(job), args.requeue, not args.no_combine),
+        workers,
+        memory_of=job_memory,
+        memory_budget=budget,
+        domain_of=job_domain,
+        domain_limit=domain_limit,
+    ))
+
+    results = {}
+    runtimes = {}
+    for result in finished.values():
+        if result is not None:
+            job, success, runtime = result
+            results[job] = success
+            runtimes[job] = runtime
+    logger.info(f"Runtimes: {runtimes}")
+
+    failed = [job for job in jobs if not results.get(job)]
+    if failed:
+        logger.warning(f"{len(failed)} scrapers failed: {', '.join(failed)}")
+
+    if combine_thread is not None:
+        stop_combining = True
+        combine_thread.join(timeout=5)
+        logger.info("Stopped periodic file combination thread")
+
+    if not args.no_combine:
+        for country in args.countries:
+            try:
+                combined_file = combine_country(country)
+                if combined_file:
+                    cleanup_intermediate_files(country_output_dir(country), [combined_file])
+                    combined_df = consolidators[country].combine(find_source_files(country_output_dir(country)))
+                    write_delta(combined_df, combined_file)
+                    record_run(combined_df)
+            except Exception as e:
+                logger.error(f"Error combining files for {country}: {e}")
+
+    end_time = datetime.now()
+    logger.info(f"Completed regional scraping job at {end_time}. Total runtime: {end_time - start_time}")
+
+
+if __name__ == "__main__":
+    main()